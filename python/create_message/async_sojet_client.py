@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+asyncio counterpart of SojetClient, built on StreamReader/StreamWriter.
+
+AsyncSojetClient inherits every protocol method from SojetClient; because its
+send() is a coroutine, each method returns an awaitable:
+
+    client = AsyncSojetClient("172.16.0.55")
+    await client.connect()
+    status = await client.get_print_status()
+
+Concurrent awaits on one client are pipelined on its socket (responses are
+matched FIFO, at most `window` in flight), and one event loop can drive any
+number of printers. `async with client.pipeline() as p:` collects requests as
+futures and sends them together on exit.
+
+Usage: python async_sojet_client.py <ip> [<ip> ...] [--interval 2]
+       (polls /engine/real on every printer concurrently)
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+
+from framing import MAX_LINE, encode_request
+from pacing import response_ok
+from sojet_client import SojetClient
+
+DEFAULT_PORT = 9944
+
+
+class AsyncSojetClient(SojetClient):
+    """Client for all Sojet printer TCP-JSON protocol actions, asyncio flavour."""
+
+    def __init__(self, host: str = "172.16.0.55", port: int = DEFAULT_PORT, timeout: int = 10, window: int = 8):
+        super().__init__(host, port, timeout)
+        self.window = max(1, window)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._inflight = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> bool:
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, limit=MAX_LINE), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"Connection error ({self.host}:{self.port}): {e}")
+            return False
+        self._slots = asyncio.Semaphore(self.window)
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        return True
+
+    async def disconnect(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = self.reader = None
+        self._fail_all()
+
+    def _fail_all(self):
+        while self._inflight:
+            fut = self._inflight.popleft()
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readuntil(b"\r\n")
+                if not self._inflight:
+                    continue  # unsolicited line; nothing is waiting for it
+                fut = self._inflight.popleft()
+                s = line.decode("utf-8").strip()
+                try:
+                    response = json.loads(s) if s else None
+                except ValueError as e:
+                    print(f"Receive error ({self.host}): {e}")
+                    response = None
+                if not fut.done():
+                    fut.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            if self._inflight:
+                print(f"Receive error ({self.host}): {e}")
+        finally:
+            self._fail_all()
+
+    async def send(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not self.writer or not self._reader_task or self._reader_task.done():
+            return None
+        async with self._slots:
+            if self.pacer.delay:
+                await asyncio.sleep(self.pacer.delay)
+            fut = asyncio.get_running_loop().create_future()
+            self._inflight.append(fut)
+            t0 = time.perf_counter()
+            try:
+                self.writer.write(encode_request(request))
+                await self.writer.drain()
+                r = await asyncio.wait_for(asyncio.shield(fut), self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                # The stream is out of step with the FIFO now; drop the connection
+                print(f"Send error ({self.host}): {e or 'timeout'}")
+                self.pacer.record(None, False)
+                await self.disconnect()
+                return None
+            self.pacer.record(time.perf_counter() - t0, response_ok(r))
+            return r
+
+    def pipeline(self, window: int = 8) -> "AsyncPipeline":
+        """
+        Batch of requests on this connection: protocol methods return an asyncio.Future
+        immediately and the batch is sent with asyncio.gather when the `async with` exits.
+        """
+        return AsyncPipeline(self, window)
+
+    async def get_message_with_sources(self, message_id: int) -> Optional[Dict]:
+        """
+        Get message (detail=1) and resolve all sources from object_list concurrently.
+        Returns: {"message": msg, "objects": [...], "sources": [...]} or None
+        """
+        msg = await self.find_message(message_id, detail=1)
+        if not msg or msg.get("status") == "Error":
+            return None
+        objects = msg.get("object_list", [])
+        refs = []
+        seen = set()
+        for obj in objects:
+            for s in obj.get("source_list", []):
+                sid, styp = s.get("id"), s.get("type")
+                if sid is None or not styp or (sid, styp) in seen:
+                    continue
+                seen.add((sid, styp))
+                refs.append((sid, styp))
+        found = await asyncio.gather(*(self.find_source(sid, styp) for sid, styp in refs))
+        sources = [
+            src if src and src.get("status") != "Error" else {"id": sid, "type": styp, "error": "not found"}
+            for (sid, styp), src in zip(refs, found)
+        ]
+        return {"message": msg, "objects": objects, "sources": sources}
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
+
+
+class AsyncPipeline(SojetClient):
+    """
+    Requests collected on an AsyncSojetClient and sent together on exit:
+
+        async with client.pipeline() as p:
+            status = p.get_print_status()
+            msg = p.find_message(12, detail=1)
+        print(status.result(), msg.result())
+
+    The coroutines run under asyncio.gather, at most `window` of them at once
+    (the client's own window still bounds what is in flight on the socket).
+    If the block raises, nothing is sent and the futures are cancelled.
+    """
+
+    def __init__(self, client: AsyncSojetClient, window: int = 8):
+        super().__init__(client.host, client.port, client.timeout, client.pacer)
+        self.client = client
+        self.window = max(1, window)
+        self._pending: List[Tuple[asyncio.Future, Awaitable]] = []
+
+    def _hash(self) -> int:
+        return self.client._hash()
+
+    def send(self, request: Dict[str, Any]) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((fut, self.client.send(request)))
+        return fut
+
+    def get_message_with_sources(self, message_id: int) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((fut, self.client.get_message_with_sources(message_id)))
+        return fut
+
+    async def flush(self):
+        """Send every collected request and resolve its future."""
+        pending, self._pending = self._pending, []
+        slots = asyncio.Semaphore(self.window)
+
+        async def run(fut: asyncio.Future, coro: Awaitable):
+            async with slots:
+                r = await coro
+            if not fut.done():
+                fut.set_result(r)
+
+        await asyncio.gather(*(run(fut, coro) for fut, coro in pending))
+
+    def cancel(self):
+        for fut, coro in self._pending:
+            coro.close()
+            fut.cancel()
+        self._pending = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.cancel()
+        else:
+            await self.flush()
+
+
+async def fetch_print_status(clients: Iterable[AsyncSojetClient]) -> Dict[Tuple[str, int], Optional[Dict]]:
+    """Query /engine/real on every client concurrently; keyed by (host, port)."""
+    clients = list(clients)
+    results = await asyncio.gather(*(c.get_print_status() for c in clients))
+    return {(c.host, c.port): r for c, r in zip(clients, results)}
+
+
+async def poll_print_status(hosts: List[str], port: int = DEFAULT_PORT, interval: float = 2.0):
+    clients = [AsyncSojetClient(h, port) for h in hosts]
+    connected = await asyncio.gather(*(c.connect() for c in clients))
+    clients = [c for c, ok in zip(clients, connected) if ok]
+    if not clients:
+        return
+    try:
+        while True:
+            for (host, _), r in (await fetch_print_status(clients)).items():
+                if r:
+                    print(f"{host}: state={r.get('state')} message={r.get('data_name')} output={r.get('output')}")
+                else:
+                    print(f"{host}: no response")
+            await asyncio.sleep(interval)
+    finally:
+        await asyncio.gather(*(c.disconnect() for c in clients))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Poll /engine/real on several Sojet printers from one event loop")
+    ap.add_argument("hosts", nargs="+", help="Printer IPs")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--interval", type=float, default=2.0, help="Seconds between polls")
+    args = ap.parse_args()
+    try:
+        asyncio.run(poll_print_status(args.hosts, args.port, args.interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Write-ahead journal for message builds.
+
+A label is a dozen creates (sources, objects, then the message); a failure part
+way used to leave the earlier ones on the printer, and a retry made a new set.
+MessageBuilder.execute(journal=...) logs every step to a JSONL file per
+(printer, message name) in state/journals/:
+
+  {"op": "begin", "message": ..., "printer": "host:port"}
+  {"op": "intent", "kind", "key", "type", "digest"}    synced before the level is sent
+  {"op": "created", "kind", "key", "type", "id", "digest", "hash", "interned"}
+  {"op": "failed", "kind", "key", "response"}           the printer refused the create
+  {"op": "reused", "kind", "key", "id"}                 registry hit, not ours
+  {"op": "gone", "kind", "key"}                         deleted / no longer on the printer
+  {"op": "commit", "message_id"}                        the journal is then removed
+
+A retry with the same name and printer opens the same journal: entities it
+records as created with an unchanged definition digest (and still present on
+the printer) are reused instead of created again. `rollback` deletes what an
+aborted build created - message, then objects, then sources, pipelined -
+leaving registry-reused and interned (registry-owned, shared) entities alone.
+An intent without a "created" line means the request may have been applied
+with the reply lost; those are reported, not guessed at.
+
+Usage: python build_journal.py list
+       python build_journal.py show <message_name>
+       python build_journal.py rollback <message_name> | --all [--host IP] [--port N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+JOURNAL_DIR = os.path.join(STATE_DIR, "journals")
+
+Printer = Tuple[str, int]
+
+
+def journal_path(printer: Printer, message_name: str, root: str = JOURNAL_DIR) -> str:
+    """state/journals/<host>_<port>/<safe name>-<name hash>.jsonl"""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", message_name)[:60]
+    tag = hashlib.sha256(message_name.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(root, f"{printer[0]}_{printer[1]}", f"{safe}-{tag}.jsonl")
+
+
+class BuildJournal:
+    """Append-only log of one message build; replayed on open."""
+
+    def __init__(self, path: str, printer: Printer, message_name: str):
+        self.path = path
+        self.printer = printer
+        self.message_name = message_name
+        self.created: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.reused_ids: Dict[Tuple[str, str], int] = {}
+        self.intended: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.committed = False
+        self._buffer: List[str] = []
+        self._file = None
+        if os.path.exists(path):
+            self._replay()
+
+    @classmethod
+    def open(cls, printer: Printer, message_name: str, root: str = JOURNAL_DIR) -> "BuildJournal":
+        return cls(journal_path(printer, message_name, root), printer, message_name)
+
+    # --- log ---
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash mid-write
+                op = rec.get("op")
+                if op == "begin":
+                    self.message_name = rec.get("message", self.message_name)
+                elif op == "intent":
+                    self.intended[(rec["kind"], rec["key"])] = rec
+                elif op == "created":
+                    self.created[(rec["kind"], rec["key"])] = rec
+                elif op == "reused":
+                    self.reused_ids[(rec["kind"], rec["key"])] = rec["id"]
+                elif op in ("gone", "failed"):
+                    self.created.pop((rec["kind"], rec["key"]), None)
+                    self.intended.pop((rec["kind"], rec["key"]), None)
+                elif op == "commit":
+                    self.committed = True
+
+    def _write(self, *records: Dict[str, Any], sync: bool = True):
+        self._buffer.extend(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+        if not sync:
+            return
+        if self._file is None:
+            new = not os.path.exists(self.path)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if new:
+                self._buffer.insert(0, json.dumps({"op": "begin", "message": self.message_name,
+                                                   "printer": f"{self.printer[0]}:{self.printer[1]}",
+                                                   "time": int(time.time())}) + "\n")
+        self._file.write("".join(self._buffer))
+        self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def intents(self, items: List[Tuple[str, str, str, Optional[str]]]):
+        """Log (kind, key, type, digest) for a level about to be sent; synced before returning."""
+        records = [{"op": "intent", "kind": k, "key": key, "type": t, "digest": d} for k, key, t, d in items]
+        for rec in records:
+            self.intended[(rec["kind"], rec["key"])] = rec
+        self._write(*records)
+
+    def results(self, created: List[Tuple[str, str, str, int, Optional[str], Any, bool]],
+                failed: List[Tuple[str, str, Any]] = ()):
+        """
+        Log a level's responses: created (kind, key, type, id, digest, request hash, interned)
+        and refused (kind, key, response) creates.
+        """
+        records = [{"op": "created", "kind": k, "key": key, "type": t, "id": i, "digest": d, "hash": h,
+                    "interned": interned} for k, key, t, i, d, h, interned in created]
+        for rec in records:
+            self.created[(rec["kind"], rec["key"])] = rec
+        for kind, key, response in failed:
+            self.intended.pop((kind, key), None)
+            records.append({"op": "failed", "kind": kind, "key": key, "response": response})
+        self._write(*records)
+
+    def _forget(self, kind: str, key: str):
+        self.created.pop((kind, key), None)
+        self.intended.pop((kind, key), None)
+
+    def reused(self, kind: str, key: str, entity_id: int):
+        self.reused_ids[(kind, key)] = entity_id
+        self._write({"op": "reused", "kind": kind, "key": key, "id": entity_id}, sync=False)
+
+    def commit(self, message_id: Optional[int]):
+        """The message exists: log it and drop the journal."""
+        self._write({"op": "commit", "message_id": message_id})
+        self.committed = True
+        self.discard()
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # --- resume ---
+    def resumable_id(self, kind: str, key: str, digest: Optional[str]) -> Optional[int]:
+        """Id a previous attempt created for key, if its definition is unchanged."""
+        rec = self.created.get((kind, key))
+        if rec and rec.get("digest") == digest:
+            return rec["id"]
+        return None
+
+    def lost(self) -> List[Dict[str, Any]]:
+        """Intents with no recorded outcome (the create may or may not have happened)."""
+        return [rec for k, rec in self.intended.items() if k not in self.created]
+
+    def verify(self, client, window: int = 8) -> int:
+        """Probe the created entities with pipelined finds; forget the ones the printer no longer has."""
+        with client.pipeline(window) as p:
+            probes = []
+            for (kind, key), rec in self.created.items():
+                if kind == "source":
+                    probes.append(((kind, key), p.find_source(rec["id"], rec["type"])))
+                elif kind == "object":
+                    probes.append(((kind, key), p.find_object(rec["id"])))
+                else:
+                    probes.append(((kind, key), p.find_message(rec["id"], detail=0)))
+        gone = [k for k, fut in probes if (fut.result() or {}).get("status") not in (None, "ok")]
+        for kind, key in gone:
+            self._forget(kind, key)
+        if gone:
+            self._write(*({"op": "gone", "kind": kind, "key": key} for kind, key in gone))
+        return len(gone)
+
+    # --- rollback ---
+    def rollback(self, client, window: int = 8) -> Dict[str, Any]:
+        """
+        Delete what this build created: the message first, then objects, then sources,
+        each as one pipelined burst. Interned and reused entities are kept. The journal
+        is removed when every delete succeeded.
+        Returns {"deleted", "kept", "failed", "lost"}.
+        """
+        deleted, failed = [], []
+        lost = self.lost()
+        kept = [{"kind": k, "key": key, "id": i} for (k, key), i in self.reused_ids.items()]
+        for kind in ("message", "object", "source"):
+            batch = [(key, rec) for (k, key), rec in self.created.items() if k == kind]
+            kept += [{"kind": kind, "key": key, "id": rec["id"]} for key, rec in batch if rec.get("interned")]
+            batch = [(key, rec) for key, rec in batch if not rec.get("interned")]
+            with client.pipeline(window) as p:
+                futs = []
+                for key, rec in batch:
+                    if kind == "source":
+                        futs.append((key, rec, p.delete_source(rec["id"], rec["type"])))
+                    elif kind == "object":
+                        futs.append((key, rec, p.delete_object(rec["id"])))
+                    else:
+                        futs.append((key, rec, p.delete_message(rec["id"])))
+            for key, rec, fut in futs:
+                r = fut.result()
+                item = {"kind": kind, "key": key, "id": rec["id"]}
+                if r and r.get("status") == "ok":
+                    deleted.append(item)
+                    self._forget(kind, key)
+                else:
+                    failed.append({**item, "response": r})
+            if deleted:
+                self._write(*({"op": "gone", "kind": d["kind"], "key": d["key"]} for d in deleted if d["kind"] == kind))
+        if not failed:
+            self.discard()
+        return {"deleted": deleted, "kept": kept, "failed": failed, "lost": lost}
+
+
+def list_journals(root: str = JOURNAL_DIR) -> List[BuildJournal]:
+    """Every open (uncommitted) journal under root."""
+    journals = []
+    if not os.path.isdir(root):
+        return journals
+    for printer_dir in sorted(os.listdir(root)):
+        host, _, port = printer_dir.rpartition("_")
+        if not port.isdigit():
+            continue
+        for name in sorted(os.listdir(os.path.join(root, printer_dir))):
+            if name.endswith(".jsonl"):
+                j = BuildJournal(os.path.join(root, printer_dir, name), (host, int(port)), "")
+                if not j.committed:
+                    journals.append(j)
+    return journals
+
+
+def main():
+    from sojet_client import SojetClient
+
+    ap = argparse.ArgumentParser(description="Inspect / roll back interrupted message builds")
+    ap.add_argument("command", choices=("list", "show", "rollback"))
+    ap.add_argument("message_name", nargs="?")
+    ap.add_argument("--all", action="store_true", help="rollback: every open journal for the printer")
+    ap.add_argument("--host", default="172.16.0.55")
+    ap.add_argument("--port", type=int, default=9944)
+    ap.add_argument("--window", type=int, default=8)
+    args = ap.parse_args()
+    printer = (args.host, args.port)
+
+    if args.command == "list":
+        for j in list_journals():
+            print(f"{j.printer[0]}:{j.printer[1]}  {j.message_name:<30} created={len(j.created)} "
+                  f"reused={len(j.reused_ids)} lost={len(j.lost())}")
+        return
+    if args.command == "show" or not args.all:
+        if not args.message_name:
+            print(f"Usage: build_journal.py {args.command} <message_name>", file=sys.stderr)
+            sys.exit(1)
+        journals = [BuildJournal.open(printer, args.message_name)]
+        if not os.path.exists(journals[0].path):
+            print(f"No journal for '{args.message_name}' on {args.host}:{args.port}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        journals = [j for j in list_journals() if j.printer == printer]
+
+    if args.command == "show":
+        j = journals[0]
+        for (kind, key), rec in j.created.items():
+            print(f"created {kind:<7} {key:<14} id={rec['id']:<6} hash={rec.get('hash')}"
+                  f"{' (interned)' if rec.get('interned') else ''}")
+        for (kind, key), entity_id in j.reused_ids.items():
+            print(f"reused  {kind:<7} {key:<14} id={entity_id}")
+        for rec in j.lost():
+            print(f"lost    {rec['kind']:<7} {rec['key']:<14} (sent, no reply recorded)")
+        return
+
+    client = SojetClient(args.host, args.port)
+    if not client.connect():
+        sys.exit(1)
+    failures = 0
+    try:
+        for j in journals:
+            r = j.rollback(client, args.window)
+            print(f"{j.message_name}: deleted {len(r['deleted'])}, kept {len(r['kept'])}, failed {len(r['failed'])}")
+            for item in r["failed"]:
+                print(f"  [FAIL] {item['kind']} {item['key']} id={item['id']}: {item['response']}")
+            for rec in r["lost"]:
+                print(f"  [WARN] {rec['kind']} {rec['key']} may exist on the printer (reply never recorded)")
+            failures += len(r["failed"])
+    finally:
+        client.disconnect()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Create many product labels from a CSV or JSONL file on one connection.
+
+Each row carries the create_product_label fields (gtin, mfg, exp, batch, sn,
+tmda_reg) and optionally "name" and "barcode_source". With --serial-secret, a
+row without an sn gets the next serial_generator serial for its GTIN/batch
+(the index is kept in the checkpoint; serials already in the ledger are
+skipped). Rows are streamed in
+chunks: a chunk is validated with build_qr_strings() in one pass, checked
+against the printed-serial ledger, and the valid rows are built together with
+execute_many() - one pipelined burst per level (sources, objects, messages)
+for the whole chunk, at most `window` requests in flight.
+
+After every chunk a checkpoint (next row, counts, failures) is written
+atomically next to the input, so an interrupted run resumes where it stopped.
+Created labels are appended to <input>.results.jsonl as they are built.
+Every label of a chunk has a build journal that is committed only after the
+checkpoint, so rerunning an interrupted chunk reuses what it had created
+instead of making duplicates; a label that fails is rolled back.
+
+Usage: python bulk_labels.py labels.csv [--barcode-source dynamic] [--chunk 50]
+       python bulk_labels.py labels.jsonl --name-prefix Launch --restart
+       python bulk_labels.py labels.csv --serial-secret KEY   (or SOJET_SERIAL_SECRET)
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from build_journal import BuildJournal
+from create_product_label import (
+    BARCODE_SOURCE_PRESETS, FIELDS, LEDGER_PRESETS, describe_label, label_barcode_style, validate_barcode_source,
+)
+from entity_registry import get_registry
+from generate_label_config import build_qr_strings
+from message_builder import BuildError, execute_many
+from orphan_gc import list_messages
+from serial_generator import SerialGenerator
+from serial_ledger import get_ledger
+from sojet_client import SojetClient
+
+PRINTER_IP = "172.16.0.55"
+PRINTER_PORT = 9944
+
+FIELD_KEYS = [key for key, _, _ in FIELDS]
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Rows of a CSV (header = field names) or JSONL file, as dicts of stripped strings."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield {k: str(v).strip() for k, v in json.loads(line).items() if v is not None}
+        else:
+            for row in csv.DictReader(f):
+                yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+
+
+def _atomic_write_json(path: str, data: Dict):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, input_path: str) -> Dict[str, Any]:
+    checkpoint = {"input": os.path.abspath(input_path), "next_row": 1, "created": 0, "failed": [],
+                  "serial_index": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return checkpoint
+    if saved.get("input") != checkpoint["input"]:
+        raise ValueError(f"Checkpoint {path} belongs to {saved.get('input')}; use --restart")
+    checkpoint.update(saved)
+    return checkpoint
+
+
+class BulkLabelRun:
+    """Streams rows into labels chunk by chunk; state lives in the checkpoint dict."""
+
+    def __init__(self, client, checkpoint: Dict[str, Any], checkpoint_path: str, results_path: str,
+                 barcode_source: str = "dynamic", sn_date: bool = True, name_prefix: str = "PharmaLabel",
+                 chunk: int = 50, window: int = 8, registry=None, ledger=None, journal: bool = True,
+                 serial_secret: Optional[str] = None, serial_digits: int = 13):
+        self.client = client
+        self.checkpoint = checkpoint
+        self.checkpoint_path = checkpoint_path
+        self.results_path = results_path
+        self.barcode_source = barcode_source
+        self.sn_date = sn_date
+        self.name_prefix = name_prefix
+        self.chunk = max(1, chunk)
+        self.window = window
+        self.registry = registry
+        self.ledger = ledger
+        self.journal = journal
+        self.seeded = registry is None
+        self.journals: Dict[str, BuildJournal] = {}
+        self.existing: Optional[Dict[str, int]] = None
+        self.serial_secret = serial_secret
+        self.serial_digits = serial_digits
+        self.generators: Dict[str, SerialGenerator] = {}
+
+    def _fail(self, row: int, error: str):
+        self.checkpoint["failed"].append({"row": row, "error": error})
+        print(f"[FAIL] row {row}: {error}", file=sys.stderr)
+
+    def _name(self, row: int, r: Dict[str, str]) -> str:
+        return r.get("name") or f"{self.name_prefix}_{row:05d}"
+
+    def _with_serial(self, row: int, r: Dict[str, str], preset: str) -> Dict[str, str]:
+        """r with a generated sn if it has none and serials are generated for its preset."""
+        if not self.serial_secret or r.get("sn") or preset not in LEDGER_PRESETS:
+            return r
+        gtin, batch = r.get("gtin", ""), r.get("batch", "")
+        key = f"{gtin}|{batch}"
+        if key not in self.generators:
+            self.generators[key] = SerialGenerator(self.serial_secret, gtin, batch, self.serial_digits)
+        gen, indexes = self.generators[key], self.checkpoint["serial_index"]
+        # An interrupted row gets its serial again (same index), even though the ledger may hold it
+        journal = self._journal(self._name(row, r))
+        resuming = journal is not None and (journal.created or journal.intended)
+        index = indexes.get(key, 0)
+        sn = gen.serial(index)
+        while self.ledger is not None and not resuming and self.ledger.contains(gtin, sn):
+            index += 1
+            sn = gen.serial(index)
+        indexes[key] = index + 1
+        return {**r, "sn": sn}
+
+    def _prepare(self, rows: List[Tuple[int, Dict[str, str]]]) -> Tuple[List[Tuple[int, Dict, Any, str]], List[Dict]]:
+        """
+        Validate a chunk; returns (row number, values, builder, preset) for the rows to build,
+        and the results of rows an interrupted run had already built.
+        """
+        presets = [r.get("barcode_source") or self.barcode_source for _, r in rows]
+        rows = [(row, self._with_serial(row, r, p)) for (row, r), p in zip(rows, presets)]
+        _, errors = build_qr_strings(
+            [r.get("gtin", "") for _, r in rows],
+            # highrate/counter serials are completed by the printer: validate the SN base, if any
+            [r.get("sn") or ("0" if p not in LEDGER_PRESETS else "") for (_, r), p in zip(rows, presets)],
+            [r.get("exp", "") for _, r in rows],
+            [r.get("batch", "") for _, r in rows],
+        )
+        ready, built, seen, names = [], [], set(), set()
+        for i, ((row, r), preset) in enumerate(zip(rows, presets)):
+            if i in errors:
+                self._fail(row, "; ".join(errors[i]))
+                continue
+            values = {k: r.get(k, "") for k in FIELD_KEYS}
+            name = self._name(row, r)
+            try:
+                preset = validate_barcode_source(preset)
+                builder, _ = describe_label(values, name, preset, self.sn_date,
+                                            barcode_style=label_barcode_style(values, preset))
+            except ValueError as e:
+                self._fail(row, str(e))
+                continue
+            if self.journal and name in names:
+                self._fail(row, f"Message name '{name}' repeats an earlier row of this chunk")
+                continue
+            names.add(name)
+            journal = self._journal(name)
+            message_id = self._sent_message(journal)
+            if message_id:
+                built.append({"row": row, "name": name, "message_id": message_id, "values": values, "preset": preset})
+                continue
+            key = (values["gtin"], values["sn"])
+            # A journaled row passed this check before it was interrupted; its serial may be ours
+            resumed = journal is not None and (journal.created or journal.intended)
+            if preset in LEDGER_PRESETS and self.ledger is not None and not resumed:
+                if key in seen or self.ledger.contains(*key):
+                    self._fail(row, f"SN {values['sn']} was already printed for GTIN {values['gtin']}")
+                    continue
+                seen.add(key)
+            ready.append((row, values, builder, preset))
+        return ready, built
+
+    def _journal(self, name: str) -> Optional[BuildJournal]:
+        """The row's journal, kept open until its chunk is checkpointed."""
+        if not self.journal:
+            return None
+        if name not in self.journals:
+            self.journals[name] = BuildJournal.open((self.client.host, self.client.port), name)
+        return self.journals[name]
+
+    def _sent_message(self, journal: Optional[BuildJournal]) -> Optional[int]:
+        """
+        Id of the message an interrupted run sent for this journal without logging the reply
+        (looked up by name on the printer), or None.
+        """
+        if journal is None or journal.intended.get(("message", journal.message_name)) is None:
+            return None
+        if ("message", journal.message_name) in journal.created:
+            return None  # logged: execute_many() resumes it
+        if self.existing is None:
+            self.existing = {m["name"]: m["id"] for m in list_messages(self.client)}
+        return self.existing.get(journal.message_name)
+
+    def _fail_build(self, row: int, name: str, error: str):
+        """Record a failed row and delete what its build created."""
+        journal = self.journals.pop(name, None)
+        if journal is not None:
+            lost = len(journal.lost())
+            if journal.created and journal.rollback(self.client, self.window)["failed"]:
+                error += f" (partial build kept: python build_journal.py rollback '{name}')"
+            else:
+                journal.discard()
+            if lost:
+                error += f" ({lost} create(s) got no reply; python orphan_gc.py finds them)"
+        self._fail(row, error)
+
+    def _execute(self, ready: List[Tuple[int, Dict, Any, str]]) -> List[Dict]:
+        results = []
+        builders = [b for _, _, b, _ in ready]
+        outcomes = execute_many(builders, self.client, self.window, self.registry,
+                                [self._journal(b.name) for b in builders], commit=False)
+        for (row, values, builder, preset), outcome in zip(ready, outcomes):
+            if isinstance(outcome, BuildError):
+                self._fail_build(row, builder.name, str(outcome))
+            else:
+                results.append({"row": row, "name": builder.name, "message_id": outcome["message_id"],
+                                "values": values, "preset": preset})
+        return results
+
+    def _build(self, ready: List[Tuple[int, Dict, Any, str]]) -> List[Dict]:
+        results = []
+        if not self.seeded and ready:
+            # One label on its own first, so the shared SN-DATE entities land in the registry
+            results = self._execute(ready[:1])
+            ready = ready[1:]
+            self.seeded = True
+        return results + self._execute(ready)
+
+    def _commit(self, results: List[Dict], next_row: int):
+        """Record a finished chunk: ledger, results log, then the checkpoint."""
+        if self.ledger is not None:
+            by_gtin: Dict[str, List[str]] = {}
+            for r in results:
+                if r["preset"] in LEDGER_PRESETS and r["values"]["sn"]:
+                    by_gtin.setdefault(r["values"]["gtin"], []).append(r["values"]["sn"])
+            for gtin, serials in by_gtin.items():
+                self.ledger.add_many(gtin, serials)
+        if results:
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                for r in results:
+                    f.write(json.dumps({"row": r["row"], "name": r["name"], "message_id": r["message_id"]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.checkpoint["created"] += len(results)
+        self.checkpoint["next_row"] = next_row
+        _atomic_write_json(self.checkpoint_path, self.checkpoint)
+        for r in results:
+            journal = self.journals.pop(r["name"], None)
+            if journal is not None:
+                journal.commit(r["message_id"])
+        for journal in self.journals.values():
+            if not (journal.created or journal.intended):
+                journal.discard()  # rows that failed validation before anything was sent
+        self.journals = {}
+        self.existing = None
+
+    def _trim_results(self, next_row: int):
+        """Drop result lines an interrupted chunk wrote after the checkpoint; the chunk logs them again."""
+        if not os.path.exists(self.results_path):
+            return
+        with open(self.results_path, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip() and json.loads(line)["row"] < next_row]
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.results_path)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.results_path)
+
+    def run(self, rows: Iterator[Dict[str, str]], limit: Optional[int] = None) -> Dict[str, Any]:
+        start_row = self.checkpoint["next_row"]
+        self._trim_results(start_row)
+        started = time.perf_counter()
+        done = 0
+        chunk: List[Tuple[int, Dict[str, str]]] = []
+        for row, r in enumerate(rows, start=1):
+            if row < start_row:
+                continue
+            if limit is not None and done + len(chunk) >= limit:
+                break
+            chunk.append((row, r))
+            if len(chunk) >= self.chunk:
+                done += self._run_chunk(chunk, started, done)
+                chunk = []
+        if chunk:
+            done += self._run_chunk(chunk, started, done)
+        elapsed = time.perf_counter() - started
+        return {"rows": done, "created": self.checkpoint["created"], "failed": len(self.checkpoint["failed"]),
+                "next_row": self.checkpoint["next_row"], "seconds": round(elapsed, 2),
+                "rate": round(done / elapsed, 1) if elapsed else 0.0}
+
+    def _run_chunk(self, chunk: List[Tuple[int, Dict[str, str]]], started: float, done: int) -> int:
+        ready, results = self._prepare(chunk)
+        results += self._build(ready)
+        results.sort(key=lambda r: r["row"])
+        self._commit(results, chunk[-1][0] + 1)
+        done += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"row {chunk[-1][0]}: {self.checkpoint['created']} created, {len(self.checkpoint['failed'])} failed"
+              f", {done / elapsed if elapsed else 0:.1f} rows/s")
+        return len(chunk)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Create product labels in bulk from CSV / JSONL, resumable")
+    ap.add_argument("input", help="CSV with a header row, or JSONL (.jsonl); columns: " + ", ".join(FIELD_KEYS)
+                                  + " [, name, barcode_source]")
+    ap.add_argument("--host", default=PRINTER_IP)
+    ap.add_argument("--port", type=int, default=PRINTER_PORT)
+    ap.add_argument("--barcode-source", default="dynamic", choices=BARCODE_SOURCE_PRESETS,
+                    help="Preset for rows without a barcode_source column")
+    ap.add_argument("--no-sn-date", action="store_false", dest="sn_date", help="Omit the SN-DATE field")
+    ap.add_argument("--name-prefix", default="PharmaLabel", help="Message name for rows without a name: PREFIX_<row>")
+    ap.add_argument("--chunk", type=int, default=50, help="Rows validated, built and checkpointed together")
+    ap.add_argument("--window", type=int, default=8, help="Requests in flight on the connection")
+    ap.add_argument("--limit", type=int, help="Stop after this many rows (resume later)")
+    ap.add_argument("--checkpoint", help="Checkpoint file (default: <input>.checkpoint.json)")
+    ap.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start at row 1")
+    ap.add_argument("--no-intern", action="store_true", help="Do not reuse SN-DATE entities from the registry")
+    ap.add_argument("--no-ledger", action="store_true", help="Skip the printed-serial ledger")
+    ap.add_argument("--no-journal", action="store_true",
+                    help="Do not journal builds (an interrupted chunk is then rebuilt from scratch)")
+    ap.add_argument("--serial-secret", default=os.environ.get("SOJET_SERIAL_SECRET"),
+                    help="Generate serials (serial_generator.py) for rows without an sn, keyed by this secret")
+    ap.add_argument("--serial-digits", type=int, default=13, help="Length of generated serials (default 13)")
+    args = ap.parse_args()
+
+    checkpoint_path = args.checkpoint or args.input + ".checkpoint.json"
+    results_path = args.input + ".results.jsonl"
+    if args.restart:
+        for path in (checkpoint_path, results_path):
+            if os.path.exists(path):
+                os.remove(path)
+    try:
+        checkpoint = load_checkpoint(checkpoint_path, args.input)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if checkpoint["next_row"] > 1:
+        print(f"Resuming at row {checkpoint['next_row']} ({checkpoint['created']} created so far)")
+
+    client = SojetClient(args.host, args.port)
+    if not client.connect():
+        print(f"Error: cannot connect to {args.host}:{args.port}", file=sys.stderr)
+        sys.exit(1)
+
+    ledger = None if args.no_ledger else get_ledger()
+    run = BulkLabelRun(client, checkpoint, checkpoint_path, results_path, args.barcode_source, args.sn_date,
+                       args.name_prefix, args.chunk, args.window,
+                       registry=None if args.no_intern else get_registry(), ledger=ledger,
+                       journal=not args.no_journal, serial_secret=args.serial_secret,
+                       serial_digits=args.serial_digits)
+    try:
+        stats = run.run(iter_rows(args.input), args.limit)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun to resume at row {checkpoint['next_row']}")
+        sys.exit(1)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        client.disconnect()
+        sys.exit(1)
+    finally:
+        if ledger is not None:
+            ledger.close()
+    client.disconnect()
+
+    print(f"\n[OK] {stats['rows']} rows in {stats['seconds']}s ({stats['rate']} rows/s): "
+          f"{stats['created']} created, {stats['failed']} failed; next row {stats['next_row']}")
+    print(f"     Results: {results_path}")
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
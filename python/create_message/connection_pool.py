@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Pool of warm printer connections keyed by (host, port).
+
+    pool = get_pool()
+    with pool.connection("172.16.0.55", 9944) as client:
+        client.start_print("Msg")
+
+A connection that has sat idle longer than `validate_after` seconds is checked
+with /info/heart_beat before it is handed out; dead ones are replaced with a
+fresh connection. At most `max_per_printer` connections exist per printer;
+further checkouts wait for one to be returned.
+
+Only long-lived processes gain from this (the Electron print worker,
+dynamic_feeder.py); one-shot CLIs connect a plain SojetClient.
+"""
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sojet_client import SojetClient
+
+Key = Tuple[str, int]
+
+
+class ConnectionPool:
+    """Thread-safe pool of connected clients, one bucket per printer."""
+
+    def __init__(
+        self,
+        max_per_printer: int = 2,
+        validate_after: float = 5.0,
+        max_idle: float = 300.0,
+        timeout: int = 10,
+        client_factory: Callable[..., SojetClient] = SojetClient,
+    ):
+        self.max_per_printer = max(1, max_per_printer)
+        self.validate_after = validate_after
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.client_factory = client_factory
+        self._idle: Dict[Key, List[Tuple[SojetClient, float]]] = {}
+        self._open: Dict[Key, int] = {}
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _is_alive(client) -> bool:
+        r = client.get_heartbeat()
+        return bool(r) and str(r.get("status", "ok")).lower() != "error"
+
+    def _close(self, key: Key, client):
+        client.disconnect()
+        with self._cond:
+            self._open[key] -= 1
+            self._cond.notify()
+
+    def acquire(self, host: str, port: int = 9944, wait: Optional[float] = None):
+        """
+        Check out a connected client for (host, port).
+        Blocks up to `wait` seconds (forever if None) when the printer is at its limit.
+        Raises ConnectionError if no connection can be made or the wait times out.
+        """
+        key = (host, port)
+        deadline = None if wait is None else time.monotonic() + wait
+        while True:
+            with self._cond:
+                idle = self._idle.setdefault(key, [])
+                while not idle and self._open.get(key, 0) >= self.max_per_printer:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise ConnectionError(f"No free connection to {host}:{port} "
+                                              f"({self.max_per_printer} in use)")
+                    self._cond.wait(remaining)
+                if idle:
+                    client, last_used = idle.pop()
+                else:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    client, last_used = None, None
+
+            if client is None:
+                client = self.client_factory(host, port, self.timeout)
+                if not client.connect():
+                    with self._cond:
+                        self._open[key] -= 1
+                        self._cond.notify()
+                    raise ConnectionError(f"Could not connect to {host}:{port}")
+                return client
+
+            idle_for = time.monotonic() - last_used
+            if idle_for > self.max_idle or (idle_for > self.validate_after and not self._is_alive(client)):
+                self._close(key, client)
+                continue
+            return client
+
+    def release(self, client, discard: bool = False):
+        """Return a client to the pool (or close it if discard / its socket is gone)."""
+        key = (client.host, client.port)
+        if discard or not client.socket:
+            self._close(key, client)
+            return
+        with self._cond:
+            self._idle.setdefault(key, []).append((client, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, host: str, port: int = 9944, wait: Optional[float] = None):
+        client = self.acquire(host, port, wait)
+        try:
+            yield client
+        except BaseException:
+            # The request/response stream may be half-way through; don't reuse it
+            self.release(client, discard=True)
+            raise
+        self.release(client)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, {}
+        for key, clients in idle.items():
+            for client, _ in clients:
+                self._close(key, client)
+
+    def stats(self) -> Dict[Key, Dict[str, int]]:
+        with self._cond:
+            return {
+                key: {"open": n, "idle": len(self._idle.get(key, []))}
+                for key, n in self._open.items()
+            }
+
+
+_pools: Dict[Callable, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(client_factory: Callable[..., SojetClient] = SojetClient) -> ConnectionPool:
+    """Process-wide pool for the given client class (closed at interpreter exit)."""
+    with _pools_lock:
+        pool = _pools.get(client_factory)
+        if pool is None:
+            pool = _pools[client_factory] = ConnectionPool(client_factory=client_factory)
+            atexit.register(pool.close_all)
+        return pool
@@ -2,6 +2,9 @@ import socket
 import json
 import time
 
+from framing import framer_for
+from pacing import paced
+
 printer_ip = "172.16.0.55"
 port = 9944
 
@@ -29,6 +32,7 @@ print(f"[INFO] Connecting to {printer_ip}:{port} ...")
 s.connect((printer_ip, port))
 print("[INFO] Connected.")
 
+@paced
 def send_command(socket_obj, command_dict):
     """Send a command and wait for response"""
     cmd_str = json.dumps(command_dict) + '\r\n'
@@ -37,7 +41,7 @@ def send_command(socket_obj, command_dict):
     
     try:
         socket_obj.settimeout(5)
-        response = socket_obj.recv(4096)
+        response = framer_for(socket_obj).read_line() or b''
         response_str = response.decode(errors='ignore')
         print(f"[INFO] Response: {response_str}")
         return json.loads(response_str.strip())
@@ -71,7 +75,6 @@ try:
     
     source_id = source_response.get("id")
     print(f"[SUCCESS] Source created with ID: {source_id}")
-    time.sleep(1)
     
     # Step 2: Create a text object
     print("\n[STEP 2] Creating text object...")
@@ -115,7 +118,6 @@ try:
     
     object_id = object_response.get("id")
     print(f"[SUCCESS] Object created with ID: {object_id}")
-    time.sleep(1)
     
     # Step 3: Create a message
     print("\n[STEP 3] Creating message...")
@@ -10,15 +10,20 @@ import json
 import time
 import sys
 
+from framing import framer_for
+from pacing import paced
+from symbol_capacity import estimate_for_style, fitted_style
+
 PRINTER_IP = "172.16.0.55"
 PRINTER_PORT = 9944
 
 
+@paced
 def send_command(s, cmd):
     s.sendall((json.dumps(cmd, separators=(',', ':')) + '\r\n').encode())
     try:
         s.settimeout(5)
-        r = s.recv(65536).decode().strip()
+        r = (framer_for(s).read_line() or b'').decode().strip()
         return json.loads(r)
     finally:
         s.settimeout(None)
@@ -116,6 +121,13 @@ def main():
     text_y = code_h + 15
     text_style = {"x": 0, "y": text_y, "w": code_style["w"] + 100, "h": 80, **TEXT_STYLE_BASE}
 
+    if use_qrcode:
+        fit = estimate_for_style(data, code_style)
+        if not fit["fits"]:
+            print(f"QR data does not fit: {fit['reason']}")
+            sys.exit(1)
+        code_style = fitted_style(code_style, fit)
+
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect((PRINTER_IP, PRINTER_PORT))
 
@@ -130,7 +142,6 @@ def main():
             print("Failed text source:", r)
             sys.exit(1)
         text_src_id = r["id"]
-        time.sleep(0.3)
 
         # 2. Text source (barcode/QR data - barcode object uses text source)
         r = send_command(s, {
@@ -142,7 +153,6 @@ def main():
             print("Failed data source:", r)
             sys.exit(1)
         data_src_id = r["id"]
-        time.sleep(0.3)
 
         # 3. Text object (right of barcode/QR, no overlap)
         r = send_command(s, {
@@ -155,7 +165,6 @@ def main():
             print("Failed text object:", r)
             sys.exit(1)
         text_obj_id = r["id"]
-        time.sleep(0.3)
 
         # 4. Barcode/QR object (type=barcode, format=code128|qr_code)
         r = send_command(s, {
@@ -168,7 +177,6 @@ def main():
             print("Failed barcode object:", r)
             sys.exit(1)
         code_obj_id = r["id"]
-        time.sleep(0.3)
 
         # 5. New message
         prefs = [{"ff_margin": 60, "fr_margin": 0, "bf_margin": 0, "br_margin": 0, "continuous_print": False}] * 4
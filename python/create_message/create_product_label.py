@@ -8,6 +8,9 @@ Features:
 - Data Matrix format (GS1-compatible)
 - Barcode sources: "dynamic" (default), "single", "multi"
 - dynamic: SN (user input) + SN-DATE (date) in Data Matrix - SN-DATE changes on every print
+- highrate: SN + day-of-year/HHmmss + printer counter inside AI(21) - unique at up to 100 units/s
+- counter: SN base + printer counter as the serial; one message prints a whole batch, changeover
+  is an in-place update plus one parm_modify to reseed the counter
 - SN-DATE: printer variable filled at print time, positioned adjacent to SN
 
 Example usage:
@@ -17,16 +20,29 @@ Example usage:
   # Static (single) or multi:
   python create_product_label.py --barcode-source single --gtin ... --sn 02750082604216564872
   python create_product_label.py --no-sn-date --gtin ... --batch 153A26
+
+  # High-rate line (10+ units/s): short SN base, printer date + counter make each code unique
+  python create_product_label.py --barcode-source highrate --gtin ... --sn 0275008
+
+  # Printer-side serials: counter starts at 1; next batch reseeds it in place
+  python create_product_label.py --barcode-source counter --gtin ... --batch 153A26 --counter-start 1
+  python create_product_label.py --update 412 --batch 154A26 --counter-start 1
+
+  # Batch changeover on an existing label (only the changed sources are modified):
+  python create_product_label.py --update 412 --batch 154A26 --exp 022029
 """
 
 import argparse
-import random
-import socket
-import json
 import time
 import sys
 
-from generate_label_config import build_qr_string, build_qr_parts, mmyyyy_to_display
+from build_journal import BuildJournal
+from entity_registry import get_registry
+from serial_ledger import get_ledger
+from sojet_client import SojetClient
+from symbol_capacity import estimate_for_style, fitted_style
+from generate_label_config import build_qr_string, build_qr_parts, mmyyyy_to_display, validate_label_fields
+from message_builder import BuildError, MessageBuilder
 
 PRINTER_IP = "172.16.0.55"
 PRINTER_PORT = 9944
@@ -35,7 +51,10 @@ PRINTER_PORT = 9944
 # "single":  one text source with full GS1 string (static)
 # "multi":   GS1 text + date source (SN-DATE in barcode, SN static)
 # "dynamic": prefix + SN(user input) + suffix + date(SN-DATE) - SN-DATE changes on every print
-BARCODE_SOURCE_PRESETS = ("single", "multi", "dynamic")
+# "highrate": prefix + SN + date(DDDHHmmss) + counter + suffix - the counter separates units printed
+#             within the same second, so codes stay unique above 1 unit/s
+# "counter":  prefix + SN base + counter + suffix - the printer counts the serial, reseeded per batch
+BARCODE_SOURCE_PRESETS = ("single", "multi", "dynamic", "highrate", "counter")
 
 FIELDS = [
     ("gtin", "GTIN", "14"),
@@ -45,9 +64,14 @@ FIELDS = [
     ("sn", "SN", None),
     ("tmda_reg", "TMDA REG. NO.", None),
 ]
+FIELD_LABELS = frozenset(label for _, label, _ in FIELDS)
 REQUIRED_KEYS = frozenset({"gtin", "mfg", "exp", "batch", "sn"})
 
 
+# build_label() raises this; kept under the label-specific name for callers
+LabelBuildError = BuildError
+
+
 def build_field_contents(values):
     """Build content for each field in exact label-config-example format. All from user input; only SN-DATE is dynamic (printer variable)."""
     return {
@@ -59,6 +83,29 @@ def build_field_contents(values):
     }
 
 
+def parse_field_contents(contents):
+    """Inverse of build_field_contents: {"GTIN": "GTIN: 0896..", ..} -> {"gtin": "0896..", ..}."""
+    values = {}
+    for key, label, _ in FIELDS:
+        text = contents.get(label)
+        if text is None:
+            continue
+        value = text.split(":", 1)[1].strip() if ":" in text else text.strip()
+        values[key] = value.replace(" ", "") if key in ("mfg", "exp") else value
+    return values
+
+
+def build_barcode_contents(values, field_contents=None):
+    """GS1 barcode text for the label: (qr_content, qr_prefix, qr_suffix)."""
+    qr_content = build_qr_string(
+        values.get("gtin", ""), values.get("sn") or "0", values.get("exp", ""), values.get("batch", "")
+    )
+    qr_prefix, qr_suffix = build_qr_parts(values.get("gtin", ""), values.get("exp", ""), values.get("batch", ""))
+    if not qr_content:
+        qr_content = " ".join((field_contents or build_field_contents(values)).values())
+    return qr_content, qr_prefix, qr_suffix
+
+
 def validate_barcode_source(source: str) -> str:
     """Validate --barcode-source; return normalized value or raise."""
     norm = source.strip().lower() if source else "single"
@@ -69,16 +116,6 @@ def validate_barcode_source(source: str) -> str:
     return norm
 
 
-def send_command(s, cmd):
-    s.sendall((json.dumps(cmd, separators=(',', ':')) + '\r\n').encode())
-    try:
-        s.settimeout(5)
-        r = s.recv(65536).decode().strip()
-        return json.loads(r)
-    finally:
-        s.settimeout(None)
-
-
 # Data matrix barcode - match label-config-example sizing
 BARCODE_STYLE = {
     "x": 10, "y": 0, "w": 294, "h": 294,
@@ -145,6 +182,378 @@ SN_DATE_SOURCE_ATTR = {
 }
 
 
+# --- highrate preset: serial (AI 21) = SN base + day-of-year + HHmmss + per-print counter ---
+AI21_MAX_LEN = 20  # GS1 serial number, an..20
+HIGHRATE_DATE_DIGITS = 9  # DDD HH mm ss
+HIGHRATE_COUNTER_DIGITS = 2  # 00-99, wraps: up to 100 unique codes per second
+HIGHRATE_DATE_SOURCE_ATTR = {
+    **SN_DATE_SOURCE_ATTR,
+    "format": {
+        **SN_DATE_SOURCE_ATTR["format"],
+        "name": "DDDHHmmss",
+        "items": [
+            {"type": "date", "content": "DST"},
+            {"type": "date", "content": "HH"},
+            {"type": "date", "content": "mm"},
+            {"type": "date", "content": "ss"},
+        ],
+    },
+}
+
+
+def counter_source_attr(start=0, digits=HIGHRATE_COUNTER_DIGITS):
+    """Counter source: zero-padded decimal, +1 per print, wraps after `digits` digits."""
+    return {
+        "initial_value": start,
+        "min_value": 0,
+        "max_value": 10 ** digits - 1,
+        "step": 1,
+        "repeat": 1,
+        "digits": digits,
+        "leading_zero": "leading_zeros",
+        "radix": {"name": "dec", "radix_digits": "0123456789"},
+        "page": 0,
+    }
+
+
+def validate_highrate_sn(sn):
+    """The SN base must leave room for date + counter inside AI(21)."""
+    room = AI21_MAX_LEN - HIGHRATE_DATE_DIGITS - HIGHRATE_COUNTER_DIGITS
+    if len(sn) > room:
+        raise ValueError(f"SN '{sn}' too long for highrate: max {room} characters (AI 21 is limited to {AI21_MAX_LEN})")
+    return sn
+
+
+# --- counter preset: serial (AI 21) = SN base + printer counter ---
+COUNTER_SERIAL_DIGITS = 8
+
+
+def validate_counter_sn(sn, digits=COUNTER_SERIAL_DIGITS):
+    room = AI21_MAX_LEN - digits
+    if len(sn) > room:
+        raise ValueError(f"SN '{sn}' too long for counter: max {room} characters before the {digits}-digit counter")
+    return sn
+
+
+def describe_label(values, msg_name, barcode_source="dynamic", sn_date=True, counter_start=1,
+                   barcode_style=BARCODE_STYLE):
+    """
+    Describe the label as a MessageBuilder (nothing is sent); returns (builder, qr_content).
+    barcode_style: style of the Barcode object, e.g. label_barcode_style(values, barcode_source).
+    Source keys: field names, QRData / QRPrefix / QRSN / QRSuffix / QRDate / QRCounter / QRSerial, SN-DATE.
+    Object keys: field names, Barcode, SN-DATE.
+    """
+    barcode_source = validate_barcode_source(barcode_source)
+    field_contents = build_field_contents(values)
+    qr_content, qr_prefix, qr_suffix = build_barcode_contents(values, field_contents)
+
+    prefs = [{"ff_margin": 60, "fr_margin": 0, "bf_margin": 0, "br_margin": 0, "continuous_print": False}] * 4
+    b = MessageBuilder(msg_name, prefs)
+
+    # 1. Text sources (one per field - GTIN, MFG, EXP, BATCH, SN)
+    for field_name, *_ in TEXT_FIELD_LAYOUT:
+        b.source(field_name, "text", field_name, {"content": field_contents[field_name]})
+
+    # 2. Barcode source(s) - single, multi, or dynamic (SN + SN-DATE in Data Matrix)
+    if barcode_source == "single":
+        barcode_sources = [b.source("QRData", "text", f"{msg_name}_QRData", {"content": qr_content})]
+    elif barcode_source == "multi":
+        # multi: GS1 text source + date source; barcode concatenates both
+        barcode_sources = [
+            b.source("QRData", "text", f"{msg_name}_QRData", {"content": qr_content}),
+            b.source("QRDate", "date", f"{msg_name}_QRDate", SN_DATE_SOURCE_ATTR, intern=True),
+        ]
+    elif barcode_source == "highrate":
+        # highrate: prefix + SN + DDDHHmmss + counter + suffix - the whole unique part stays inside AI(21)
+        barcode_sources = [
+            b.source("QRPrefix", "text", f"{msg_name}_QRPrefix", {"content": qr_prefix}),
+            b.source("QRSN", "text", f"{msg_name}_SN", {"content": validate_highrate_sn(values.get("sn", ""))}),
+            b.source("QRDate", "date", f"{msg_name}_QRDate", HIGHRATE_DATE_SOURCE_ATTR, intern=True),
+            b.source("QRCounter", "counter", f"{msg_name}_QRCounter", counter_source_attr()),
+            b.source("QRSuffix", "text", f"{msg_name}_QRSuffix", {"content": qr_suffix}),
+        ]
+    elif barcode_source == "counter":
+        # counter: prefix + SN base + counter + suffix - the printer increments the serial on every print
+        barcode_sources = [
+            b.source("QRPrefix", "text", f"{msg_name}_QRPrefix", {"content": qr_prefix}),
+            b.source("QRSN", "text", f"{msg_name}_SN", {"content": validate_counter_sn(values.get("sn", ""))}),
+            b.source("QRSerial", "counter", f"{msg_name}_QRSerial",
+                     counter_source_attr(counter_start, COUNTER_SERIAL_DIGITS)),
+            b.source("QRSuffix", "text", f"{msg_name}_QRSuffix", {"content": qr_suffix}),
+        ]
+    else:
+        # dynamic: prefix + SN(user input) + suffix + date(SN-DATE) - SN-DATE changes on every print
+        barcode_sources = [
+            b.source("QRPrefix", "text", f"{msg_name}_QRPrefix", {"content": qr_prefix}),
+            b.source("QRSN", "text", f"{msg_name}_SN", {"content": values.get("sn", "")}),
+            b.source("QRSuffix", "text", f"{msg_name}_QRSuffix", {"content": qr_suffix}),
+            b.source("QRDate", "date", f"{msg_name}_QRDate", SN_DATE_SOURCE_ATTR, intern=True),
+        ]
+
+    # 3. SN-DATE source (printer variable, injected at print time) - reuse the barcode date if there is one.
+    #    Date sources and the SN-DATE object are constant, so they are interned (shared across labels).
+    #    highrate prints date + counter on the SN line itself, so it has no separate SN-DATE object.
+    sn_date_key = None
+    field_sources = {name: [name] for name, *_ in TEXT_FIELD_LAYOUT}
+    if barcode_source == "highrate":
+        field_sources["SN"] = ["SN", "QRDate", "QRCounter"]
+    elif barcode_source == "counter":
+        field_sources["SN"] = ["SN", "QRSerial"]
+    if sn_date and barcode_source != "highrate":
+        sn_date_key = "QRDate" if "QRDate" in b.sources else b.source(
+            "SN-DATE", "date", "SN-DATE", SN_DATE_SOURCE_ATTR, intern=True
+        )
+
+    # 4. Text objects (one per field, each on its own line), then barcode, then SN-DATE
+    for field_name, x, y, w, h in TEXT_FIELD_LAYOUT:
+        style = {"x": x, "y": y, "w": w, "h": h, **TEXT_FIELD_STYLE}
+        b.object(field_name, "text", field_name, style, field_sources[field_name])
+
+    # 5. Barcode object (left side, data_matrix) - source_list from selected barcode preset
+    b.object("Barcode", "barcode", "Barcode", barcode_style, barcode_sources)
+
+    # 6. SN-DATE object (adjacent to SN - printer fills at print time)
+    if sn_date_key:
+        dx, dy, dw, dh = SN_DATE_LAYOUT
+        sn_date_style = {"x": dx, "y": dy, "w": dw, "h": dh, **TEXT_FIELD_STYLE}
+        b.object("SN-DATE", "text", "SN-DATE", sn_date_style, [sn_date_key], intern=True)
+    return b, qr_content
+
+
+def worst_case_payload(values, barcode_source):
+    """Longest barcode text a preset can print (printer-filled parts as their full width)."""
+    qr_content, qr_prefix, qr_suffix = build_barcode_contents(values)
+    sn = values.get("sn", "")
+    if barcode_source == "single":
+        return qr_content
+    if barcode_source == "multi":
+        return qr_content + "0" * 6
+    if barcode_source == "highrate":
+        return qr_prefix + sn + "0" * (HIGHRATE_DATE_DIGITS + HIGHRATE_COUNTER_DIGITS) + qr_suffix
+    if barcode_source == "counter":
+        return qr_prefix + sn + "0" * COUNTER_SERIAL_DIGITS + qr_suffix
+    return qr_prefix + sn + qr_suffix + "0" * 6
+
+
+def check_barcode_fit(values, barcode_source, style=BARCODE_STYLE, resize=True):
+    """
+    Raise ValueError if the barcode would not fit its box legibly; returns the estimate,
+    whose x_dimension / dm_size fit the box (see label_barcode_style). resize=False: the
+    style's own x_dimension must fit as it is (a label already on the printer).
+    """
+    fit = estimate_for_style(worst_case_payload(values, barcode_source), style)
+    if fit["fits"] and fit["resized"] and not resize:
+        fit["fits"] = False
+        fit["reason"] = (f"{fit['rows']}x{fit['cols']} modules at x_dimension {style.get('x_dimension')} "
+                         f"exceed the {style.get('w')}x{style.get('h')} box")
+    if not fit["fits"]:
+        raise ValueError(f"Barcode does not fit: {fit['reason']}")
+    return fit
+
+
+def label_barcode_style(values, barcode_source, style=BARCODE_STYLE):
+    """style with the x_dimension and dm_size that fit the preset's longest payload (ValueError if none does)."""
+    return fitted_style(style, check_barcode_fit(values, barcode_source, style))
+
+
+def default_message_name(prefix="PharmaLabel"):
+    """Timestamped name (to the millisecond), so unnamed labels never collide."""
+    now = time.time()
+    return f"{prefix}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now * 1000) % 1000:03d}"
+
+
+# Presets whose barcode serial is the user SN as entered (highrate/counter serials are printer-generated)
+LEDGER_PRESETS = ("single", "multi", "dynamic")
+
+
+def check_label_fields(values, barcode_source="dynamic"):
+    """Raise ValueError listing every GS1 problem with the label fields."""
+    # highrate/counter serials are completed by the printer: validate the SN base, if any
+    sn = values.get("sn") or ("0" if barcode_source not in LEDGER_PRESETS else "")
+    errors = validate_label_fields(values.get("gtin", ""), sn, values.get("exp", ""), values.get("batch", ""))
+    if errors:
+        raise ValueError("Invalid label fields: " + "; ".join(errors))
+
+
+def record_serial(ledger, gtin, sn):
+    """Record a built label's (GTIN, SN); warn if another process recorded it since the check."""
+    if not ledger.add(gtin, sn):
+        print(f"[WARN] SN {sn} for GTIN {gtin} was recorded by another process meanwhile", file=sys.stderr)
+
+
+def build_label(client, values, msg_name, barcode_source="dynamic", sn_date=True, window=8, registry=None,
+                counter_start=1, ledger=None, journal=None):
+    """
+    Create the label message on the printer through a connected SojetClient.
+    values: field dict (gtin, mfg, exp, batch, sn, tmda_reg).
+    Creates are pipelined per dependency level (sources, objects, message).
+    registry: EntityRegistry to reuse the shared SN-DATE source/object from (None = always create).
+    counter_start: first serial for the "counter" preset.
+    ledger: SerialLedger; a (GTIN, SN) already in it raises ValueError, a new one is recorded once built
+    (with a warning if another process recorded it in the meantime - the check and the add are not atomic).
+    journal: BuildJournal; a failed build can then be resumed (same name) or rolled back.
+    Raises ValueError before sending anything if the GS1 fields are invalid (GTIN check digit,
+    AI lengths / character set, expiry) or the barcode payload would not fit BARCODE_STYLE's box;
+    the Barcode object gets the x_dimension / dm_size that fit (label_barcode_style).
+    Returns {"message_id", "message_name", "barcode_source", "qr_content",
+             "source_ids", "object_ids", "reused", "resumed", "timings"}; raises LabelBuildError.
+    """
+    barcode_source = validate_barcode_source(barcode_source)
+    check_label_fields(values, barcode_source)
+    b, qr_content = describe_label(values, msg_name, barcode_source, sn_date, counter_start,
+                                   label_barcode_style(values, barcode_source))
+    gtin, sn = values.get("gtin", ""), values.get("sn", "")
+    check_ledger = ledger is not None and sn and barcode_source in LEDGER_PRESETS
+    if check_ledger and ledger.contains(gtin, sn):
+        raise ValueError(f"SN {sn} was already printed for GTIN {gtin}")
+    result = b.execute(client, window, registry, journal)
+    if check_ledger:
+        record_serial(ledger, gtin, sn)
+    return {**result, "barcode_source": barcode_source, "qr_content": qr_content}
+
+
+def barcode_preset(source_refs):
+    """Barcode preset of an existing label, from the types in its Barcode object's source_list."""
+    types = [ref.get("type") for ref in source_refs]
+    if "counter" in types:
+        return "highrate" if "date" in types else "counter"
+    if types.count("text") == 1:
+        return "multi" if "date" in types else "single"
+    return "dynamic"
+
+
+def update_label(client, message_id, values, window=8, ledger=None):
+    """
+    Update an existing label message in place: diff the new field / barcode text against
+    the current sources and modify_source only the ones that changed (pipelined).
+    values may be partial - missing fields keep the value currently on the label.
+    Sources are located by object: text objects by field name, the Barcode object's
+    text sources as [QRData] (single/multi) or [prefix, SN, suffix] (dynamic/highrate).
+    Date sources are left alone. The merged fields are validated like on create (GS1 fields,
+    highrate / counter SN, barcode fit in the label's barcode box): ValueError before anything
+    is sent. ledger: SerialLedger; when the (GTIN, SN) of a single / multi / dynamic label
+    changes, it is checked and recorded as in build_label().
+    Returns {"message_id", "message_name", "modified", "unchanged", "qr_content"};
+    raises LabelBuildError.
+    """
+    info = client.get_message_with_sources(message_id)
+    if not info:
+        raise LabelBuildError(f"find message {message_id}", None)
+    sources = {(src.get("id"), src.get("type")): src for src in info["sources"] if "error" not in src}
+
+    def text_sources(obj):
+        return [sources.get((ref.get("id"), ref.get("type"))) for ref in obj.get("source_list", [])
+                if ref.get("type") == "text"]
+
+    field_sources = {}
+    barcode_texts = []
+    barcode_refs = []
+    barcode_style = None
+    for obj in info["objects"]:
+        texts = text_sources(obj)
+        if obj.get("type") == "barcode":
+            barcode_texts = texts
+            barcode_refs = obj.get("source_list", [])
+            barcode_style = obj.get("style")
+        elif obj.get("name") in FIELD_LABELS and texts and texts[0]:
+            field_sources[obj["name"]] = texts[0]
+
+    current = parse_field_contents({
+        name: (src.get("attribute") or {}).get("content", "") for name, src in field_sources.items()
+    })
+    merged = {**current, **{k: v for k, v in values.items() if v}}
+    preset = barcode_preset(barcode_refs)
+    if preset == "highrate":
+        validate_highrate_sn(merged.get("sn", ""))
+    elif preset == "counter":
+        # the counter's digit count is on the source
+        counter = next((sources.get((ref.get("id"), "counter")) for ref in barcode_refs
+                        if ref.get("type") == "counter"), None)
+        validate_counter_sn(merged.get("sn", ""), ((counter or {}).get("attribute") or {}).get(
+            "digits", COUNTER_SERIAL_DIGITS))
+    check_label_fields(merged, preset)
+    # Only sources are modified: the symbol must fit the label's barcode style as it is
+    check_barcode_fit(merged, preset, barcode_style or BARCODE_STYLE, resize=barcode_style is None)
+    gtin, sn = merged.get("gtin", ""), merged.get("sn", "")
+    check_ledger = (ledger is not None and sn and preset in LEDGER_PRESETS
+                    and (gtin, sn) != (current.get("gtin"), current.get("sn")))
+    if check_ledger and ledger.contains(gtin, sn):
+        raise ValueError(f"SN {sn} was already printed for GTIN {gtin}")
+    field_contents = build_field_contents(merged)
+    qr_content, qr_prefix, qr_suffix = build_barcode_contents(merged, field_contents)
+
+    wanted = [(src, field_contents[name]) for name, src in field_sources.items() if name in field_contents]
+    if len(barcode_texts) == 1:
+        wanted.append((barcode_texts[0], qr_content))
+    elif len(barcode_texts) == 3:
+        wanted += list(zip(barcode_texts, (qr_prefix, merged.get("sn", ""), qr_suffix)))
+
+    changes = [(src, content) for src, content in wanted
+               if src and (src.get("attribute") or {}).get("content") != content]
+    with client.pipeline(window) as p:
+        pending = [
+            (src, p.modify_source(src["id"], src["type"], src.get("name", ""),
+                                  {**(src.get("attribute") or {}), "content": content}))
+            for src, content in changes
+        ]
+    modified = []
+    for src, fut in pending:
+        r = fut.result()
+        if not r or r.get("status") != "ok":
+            raise LabelBuildError(f"modify source {src['id']}", r, created={"modified": modified})
+        modified.append(src.get("name") or src["id"])
+    if check_ledger:
+        record_serial(ledger, gtin, sn)
+    return {
+        "message_id": message_id,
+        "message_name": info["message"].get("name"),
+        "modified": modified,
+        "unchanged": len(wanted) - len(changes),
+        "qr_content": qr_content,
+    }
+
+
+def reseed_label_counter(client, message_id, value):
+    """
+    Rewind/reseed the counter source(s) of a label message to `value` with one
+    parm_modify call. Returns {"message_id", "counter_ids", "value"}; raises LabelBuildError.
+    """
+    info = client.get_message_with_sources(message_id)
+    if not info:
+        raise LabelBuildError(f"find message {message_id}", None)
+    counter_ids = [src["id"] for src in info["sources"] if src.get("type") == "counter" and "error" not in src]
+    if not counter_ids:
+        raise LabelBuildError(f"reseed message {message_id}", "message has no counter source")
+    r = client.modify_initial_value([{"type": "counter", "id": sid, "value": int(value)} for sid in counter_ids])
+    if not r or r.get("status") != "ok":
+        raise LabelBuildError(f"reseed counter {counter_ids}", r)
+    return {"message_id": message_id, "counter_ids": counter_ids, "value": int(value)}
+
+
+def run_update(message_id, values, counter_start=None, ledger=None):
+    client = SojetClient(PRINTER_IP, PRINTER_PORT)
+    if not client.connect():
+        print(f"Error: cannot connect to {PRINTER_IP}:{PRINTER_PORT}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        result = update_label(client, message_id, values, ledger=ledger)
+        if counter_start is not None:
+            reseed_label_counter(client, message_id, counter_start)
+    except (LabelBuildError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        client.disconnect()
+        # Sources were edited in place; the message's modified_time does not show it
+        from message_catalog import get_catalog
+        get_catalog().mark_stale((PRINTER_IP, PRINTER_PORT), message_id)
+    modified = ", ".join(str(m) for m in result["modified"]) or "nothing"
+    print(f"\n[OK] Message '{result['message_name']}' (id={message_id}) updated: {modified}"
+          f" ({result['unchanged']} unchanged)")
+    if counter_start is not None:
+        print(f"     Counter reseeded to {counter_start}")
+
+
 def main():
     ap = argparse.ArgumentParser(
         description="Create product label: QR (left) + GTIN/MFG/EXP/BATCH/SN/TMDA (right)"
@@ -157,7 +566,8 @@ def main():
         default="dynamic",
         choices=BARCODE_SOURCE_PRESETS,
         help="Barcode source: 'dynamic' (SN user input + SN-DATE in Data Matrix, default), "
-             "'single' (static GS1), 'multi' (GS1 + date)",
+             "'single' (static GS1), 'multi' (GS1 + date), 'highrate' (SN + date + counter, >1 unit/s), "
+             "'counter' (SN base + printer counter, serial increments every print)",
     )
     ap.add_argument(
         "--sn-date",
@@ -171,6 +581,33 @@ def main():
         dest="sn_date",
         help="Omit SN-DATE field.",
     )
+    ap.add_argument(
+        "--no-intern",
+        action="store_true",
+        help="Always create the SN-DATE source/object instead of reusing them from the entity registry.",
+    )
+    ap.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Do not keep a build journal (a failed build then cannot be resumed or rolled back).",
+    )
+    ap.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="Skip the printed-serial ledger (duplicate GTIN/SN check).",
+    )
+    ap.add_argument(
+        "--update",
+        type=int,
+        metavar="MESSAGE_ID",
+        help="Update an existing label in place (only changed sources are modified); omitted fields are kept.",
+    )
+    ap.add_argument(
+        "--counter-start",
+        type=int,
+        metavar="N",
+        help="First serial for the 'counter' preset; with --update, reseeds the label's counter to N.",
+    )
     args = ap.parse_args()
 
     # Validate barcode source (redundant with choices, but allows clearer errors)
@@ -185,14 +622,20 @@ def main():
         val = getattr(args, key, None)
         values[key] = (val or "").strip()
 
+    if args.update is not None:
+        run_update(args.update, values, args.counter_start, ledger=None if args.no_ledger else get_ledger())
+        return
+
     if args.msg_name:
         msg_name = args.msg_name
     else:
-        msg_name = f"PharmaLabel_{random.randint(1, 999):03d}"
+        msg_name = default_message_name()
         print("=" * 60)
         print("CREATE PRODUCT LABEL (QR + GTIN/MFG/EXP/BATCH/SN/TMDA)")
         print("=" * 60)
         for key, label, hint in FIELDS:
+            if key == "sn" and barcode_source == "counter":
+                continue  # the printer counts the serial; an SN base is optional
             if key in REQUIRED_KEYS and not values.get(key):
                 if sys.stdin.isatty():
                     prompt = f"{label}" + (f" ({hint} digits)" if hint else "") + ": "
@@ -201,13 +644,9 @@ def main():
                     print(f"Error: --{key} required when no message name given", file=sys.stderr)
                     sys.exit(1)
 
-    # GS1 encoding
     qr_content = build_qr_string(
         values["gtin"], values.get("sn") or "0", values["exp"], values["batch"]
     )
-    qr_prefix, qr_suffix = build_qr_parts(values["gtin"], values["exp"], values["batch"])
-    field_contents = build_field_contents(values)
-
     if not qr_content and not any(values.values()):
         ap.print_help()
         print("\nExample:")
@@ -218,210 +657,41 @@ def main():
         print('  python create_product_label.py --no-sn-date --gtin 08961101532710 ...')
         sys.exit(1)
 
-    if not qr_content:
-        qr_content = " ".join(field_contents.values())
-
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((PRINTER_IP, PRINTER_PORT))
+    client = SojetClient(PRINTER_IP, PRINTER_PORT)
+    if not client.connect():
+        print(f"Error: cannot connect to {PRINTER_IP}:{PRINTER_PORT}", file=sys.stderr)
+        sys.exit(1)
 
+    journal = None if args.no_journal else BuildJournal.open((client.host, client.port), msg_name)
     try:
-        # 1. Text sources (one per field - GTIN, MFG, EXP, BATCH, SN)
-        text_src_ids = {}
-        for field_name, x, y, w, h in TEXT_FIELD_LAYOUT:
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "text", "name": field_name,
-                "attribute": {"content": field_contents[field_name]}
-            })
-            if r.get("status") != "ok":
-                print(f"Failed text source {field_name}:", r)
-                sys.exit(1)
-            text_src_ids[field_name] = r["id"]
-            time.sleep(0.3)
-
-        # 2. Barcode source(s) - single, multi, or dynamic (SN counter + SN-DATE in Data Matrix)
-        if barcode_source == "single":
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "text", "name": f"{msg_name}_QRData",
-                "attribute": {"content": qr_content}
-            })
-            if r.get("status") != "ok":
-                print("Failed QR source:", r)
-                sys.exit(1)
-            barcode_source_list = [{"type": "text", "id": r["id"]}]
-            time.sleep(0.3)
-        elif barcode_source == "multi":
-            # multi: create GS1 text source + date source; barcode concatenates both
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "text", "name": f"{msg_name}_QRData",
-                "attribute": {"content": qr_content}
-            })
-            if r.get("status") != "ok":
-                print("Failed QR text source:", r)
-                sys.exit(1)
-            qr_text_id = r["id"]
-            time.sleep(0.3)
-
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "date", "name": f"{msg_name}_QRDate",
-                "attribute": SN_DATE_SOURCE_ATTR
-            })
-            if r.get("status") != "ok":
-                print("Failed QR date source:", r)
-                sys.exit(1)
-            qr_date_id = r["id"]
-            barcode_source_list = [
-                {"type": "text", "id": qr_text_id},
-                {"type": "date", "id": qr_date_id},
-            ]
-            time.sleep(0.3)
-        else:
-            # dynamic: prefix + SN(user input) + suffix + date(SN-DATE) - SN-DATE changes on every print
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "text", "name": f"{msg_name}_QRPrefix",
-                "attribute": {"content": qr_prefix}
-            })
-            if r.get("status") != "ok":
-                print("Failed QR prefix source:", r)
-                sys.exit(1)
-            qr_prefix_id = r["id"]
-            time.sleep(0.3)
-
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "text", "name": f"{msg_name}_SN",
-                "attribute": {"content": values["sn"]}
-            })
-            if r.get("status") != "ok":
-                print("Failed SN source:", r)
-                sys.exit(1)
-            sn_text_id = r["id"]
-            time.sleep(0.3)
-
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "text", "name": f"{msg_name}_QRSuffix",
-                "attribute": {"content": qr_suffix}
-            })
-            if r.get("status") != "ok":
-                print("Failed QR suffix source:", r)
-                sys.exit(1)
-            qr_suffix_id = r["id"]
-            time.sleep(0.3)
-
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                "type": "date", "name": f"{msg_name}_QRDate",
-                "attribute": SN_DATE_SOURCE_ATTR
-            })
-            if r.get("status") != "ok":
-                print("Failed QR date source:", r)
-                sys.exit(1)
-            qr_date_id = r["id"]
-            barcode_source_list = [
-                {"type": "text", "id": qr_prefix_id},
-                {"type": "text", "id": sn_text_id},
-                {"type": "text", "id": qr_suffix_id},
-                {"type": "date", "id": qr_date_id},
-            ]
-            time.sleep(0.3)
-
-        # 3. SN-DATE source (printer variable, injected at print time)
-        sn_date_src_id = None
-        if args.sn_date:
-            if barcode_source in ("multi", "dynamic"):
-                sn_date_src_id = qr_date_id  # reuse date from barcode
-            else:
-                r = send_command(s, {
-                    "request_type": "post", "path": "/data/source", "hash": int(time.time()),
-                    "type": "date", "name": "SN-DATE",
-                    "attribute": SN_DATE_SOURCE_ATTR
-                })
-                if r.get("status") != "ok":
-                    print("Failed SN-DATE source:", r)
-                    sys.exit(1)
-                sn_date_src_id = r["id"]
-                time.sleep(0.3)
-
-        # 4. Text objects (one per field, each on its own line)
-        text_obj_ids = []
-        for field_name, x, y, w, h in TEXT_FIELD_LAYOUT:
-            style = {"x": x, "y": y, "w": w, "h": h, **TEXT_FIELD_STYLE}
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/object", "hash": int(time.time()),
-                "type": "text", "name": field_name,
-                "style": style,
-                "attribute": {}, "source_list": [{"type": "text", "id": text_src_ids[field_name]}]
-            })
-            if r.get("status") != "ok":
-                print(f"Failed text object {field_name}:", r)
-                sys.exit(1)
-            text_obj_ids.append(r["id"])
-            time.sleep(0.3)
-
-        # 5. SN-DATE object (adjacent to SN - printer fills at print time)
-        sn_date_obj_id = None
-        if args.sn_date and sn_date_src_id is not None:
-            dx, dy, dw, dh = SN_DATE_LAYOUT
-            sn_date_style = {"x": dx, "y": dy, "w": dw, "h": dh, **TEXT_FIELD_STYLE}
-            r = send_command(s, {
-                "request_type": "post", "path": "/data/object", "hash": int(time.time()),
-                "type": "text", "name": "SN-DATE",
-                "style": sn_date_style,
-                "attribute": {},
-                "source_list": [{"type": "date", "id": sn_date_src_id}]
-            })
-            if r.get("status") != "ok":
-                print("Failed SN-DATE object:", r)
-                sys.exit(1)
-            sn_date_obj_id = r["id"]
-            time.sleep(0.3)
-
-        # 6. Barcode object (left side, data_matrix) - source_list from selected barcode preset
-        r = send_command(s, {
-            "request_type": "post", "path": "/data/object", "hash": int(time.time()),
-            "type": "barcode", "name": "Barcode",
-            "style": BARCODE_STYLE,
-            "attribute": {},
-            "source_list": barcode_source_list
-        })
-        if r.get("status") != "ok":
-            print("Failed barcode object:", r)
-            sys.exit(1)
-        qr_obj_id = r["id"]
-        time.sleep(0.3)
-
-        # 7. New message (order: text fields, barcode, sn-date)
-        prefs = [{"ff_margin": 60, "fr_margin": 0, "bf_margin": 0, "br_margin": 0, "continuous_print": False}] * 4
-        object_list = []
-        for oid in text_obj_ids:
-            object_list.append({"id": oid, "type": "text"})
-        object_list.append({"id": qr_obj_id, "type": "barcode"})
-        if sn_date_obj_id is not None:
-            object_list.append({"id": sn_date_obj_id, "type": "text"})
-        r = send_command(s, {
-            "request_type": "post", "path": "/data/data", "hash": int(time.time()),
-            "name": msg_name,
-            "attribute": {"printdata_pref": {"print_prefs": prefs}},
-            "object_list": object_list
-        })
-        if r.get("status") != "ok":
-            print("Failed message:", r)
-            sys.exit(1)
-
-        print(f"\n[OK] Message '{msg_name}' created (id={r['id']})")
-        if barcode_source == "dynamic":
-            print(f"     Data Matrix: SN-DATE dynamic (change on every print), SN from user input")
-        else:
-            print(f"     Barcode source: {barcode_source}, QR: {qr_content[:50]}{'...' if len(qr_content) > 50 else ''}")
-        if args.sn_date:
-            print(f"     SN-DATE: enabled (printer variable at print time)")
+        registry = None if args.no_intern else get_registry()
+        result = build_label(client, values, msg_name, barcode_source, args.sn_date, registry=registry,
+                             counter_start=1 if args.counter_start is None else args.counter_start,
+                             ledger=None if args.no_ledger else get_ledger(), journal=journal)
+    except LabelBuildError as e:
+        print(e)
+        if journal is not None and journal.created:
+            print(f"Partial build journaled: rerun with the same name to resume, or "
+                  f"python build_journal.py rollback '{msg_name}'")
+        sys.exit(1)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
     finally:
-        s.close()
+        client.disconnect()
+
+    print(f"\n[OK] Message '{msg_name}' created (id={result['message_id']})")
+    if barcode_source == "dynamic":
+        print(f"     Data Matrix: SN-DATE dynamic (change on every print), SN from user input")
+    elif barcode_source == "counter":
+        print(f"     Data Matrix: SN + printer counter (reseed with --update {result['message_id']} --counter-start N)")
+    elif barcode_source == "highrate":
+        print(f"     Data Matrix: SN + day/time + counter (unique up to {10 ** HIGHRATE_COUNTER_DIGITS} units/s)")
+    else:
+        qr_content = result["qr_content"]
+        print(f"     Barcode source: {barcode_source}, QR: {qr_content[:50]}{'...' if len(qr_content) > 50 else ''}")
+    if args.sn_date and barcode_source != "highrate":
+        print(f"     SN-DATE: enabled (printer variable at print time)")
 
 
 if __name__ == "__main__":
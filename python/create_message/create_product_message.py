@@ -4,6 +4,9 @@ import time
 import base64
 import io
 
+from framing import framer_for
+from pacing import paced
+
 try:
     import barcode
     from barcode.writer import ImageWriter
@@ -24,6 +27,7 @@ except ImportError:
 printer_ip = "172.16.0.55"
 port = 9944
 
+@paced
 def send_command(socket_obj, command_dict):
     """Send a command and wait for response"""
     cmd_str = json.dumps(command_dict) + '\r\n'
@@ -32,7 +36,7 @@ def send_command(socket_obj, command_dict):
     
     try:
         socket_obj.settimeout(5)
-        response = socket_obj.recv(4096)
+        response = framer_for(socket_obj).read_line() or b''
         response_str = response.decode(errors='ignore').strip()
         print(f"[INFO] Response: {response_str}")
         return json.loads(response_str)
@@ -140,7 +144,6 @@ try:
         exit(1)
     
     print(f"[SUCCESS] Barcode image uploaded: {barcode_image_name}")
-    time.sleep(1)
     
     # Step 2: Create text source for product description
     print("\n[STEP 2] Creating text source for product description...")
@@ -162,7 +165,6 @@ try:
     
     text_source_id = text_source_response.get("id")
     print(f"[SUCCESS] Text source created with ID: {text_source_id}")
-    time.sleep(1)
     
     # Step 3: Create image source for barcode
     print("\n[STEP 3] Creating image source for barcode...")
@@ -184,7 +186,6 @@ try:
     
     image_source_id = image_source_response.get("id")
     print(f"[SUCCESS] Image source created with ID: {image_source_id}")
-    time.sleep(1)
     
     # Step 4: Create text object
     print("\n[STEP 4] Creating text object...")
@@ -228,7 +229,6 @@ try:
     
     text_object_id = text_object_response.get("id")
     print(f"[SUCCESS] Text object created with ID: {text_object_id}")
-    time.sleep(1)
     
     # Step 5: Create image object for barcode
     print("\n[STEP 5] Creating image object for barcode...")
@@ -272,7 +272,6 @@ try:
     
     image_object_id = image_object_response.get("id")
     print(f"[SUCCESS] Image object created with ID: {image_object_id}")
-    time.sleep(1)
     
     # Step 6: Create message with both objects
     print("\n[STEP 6] Creating message...")
@@ -330,7 +329,6 @@ try:
     
     message_id = message_response.get("id")
     print(f"[SUCCESS] Message created with ID: {message_id}")
-    time.sleep(1)
     
     # Step 7: Start printing
     print("\n[STEP 7] Starting print job...")
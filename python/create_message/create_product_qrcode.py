@@ -9,6 +9,9 @@ import json
 import time
 import sys
 
+from framing import framer_for
+from pacing import paced
+
 PRINTER_IP = "172.16.0.55"
 PRINTER_PORT = 9944
 
@@ -28,6 +31,7 @@ def make_source_attribute(
     return attr
 
 
+@paced
 def send_command(socket_obj, command_dict):
     """Send a command and wait for response. Prints response for every command."""
     path = command_dict.get("path", "?")
@@ -35,7 +39,7 @@ def send_command(socket_obj, command_dict):
     socket_obj.sendall(cmd_str.encode('utf-8'))
     try:
         socket_obj.settimeout(5)
-        response = socket_obj.recv(65536)
+        response = framer_for(socket_obj).read_line() or b''
         response_str = response.decode(errors='ignore').strip()
         parsed = json.loads(response_str)
         resp_str = json.dumps(parsed)
@@ -106,7 +110,6 @@ def main():
             print("[ERROR] Failed to create text source:", r)
             sys.exit(1)
         text_source_id = r["id"]
-        time.sleep(0.5)
 
         # Step 2: Create QR source (same as text - type "text", content only)
         print("\n[STEP 2] Creating QR source (like text)...")
@@ -119,7 +122,6 @@ def main():
             print("[ERROR] Failed to create QR source:", r)
             sys.exit(1)
         qr_source_id = r["id"]
-        time.sleep(0.5)
 
         style_base = {
             "pivot_x": 0, "pivot_y": 0, "rotate": 0.0, "scale_x": 1.0, "scale_y": 1.0,
@@ -140,7 +142,6 @@ def main():
             print("[ERROR] Failed to create text object:", r)
             sys.exit(1)
         text_object_id = r["id"]
-        time.sleep(0.5)
 
         # Step 4: Create QR object (same as text object)
         print("\n[STEP 4] Creating QR object...")
@@ -154,7 +155,6 @@ def main():
             print("[ERROR] Failed to create QR object:", r)
             sys.exit(1)
         qr_object_id = r["id"]
-        time.sleep(0.5)
 
         # Step 5: Create message
         print("\n[STEP 5] Creating message...")
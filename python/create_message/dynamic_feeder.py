@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Stream per-unit records (serial numbers, ...) to the printer's dynamic buffer.
+
+send_dynamic_data() posts one payload to /engine/dynamic. DynamicFeeder keeps
+posting batches from a generator, file or queue so every printed unit gets its
+own record, without building a message per unit:
+  - backpressure comes from /engine/real: nothing is sent while trans_ready is
+    false, and no more than the target backlog (sent - printed, where printed
+    is the growth of the `output` counter) is kept queued on the printer
+  - the target backlog is `lead_time` seconds of the measured print rate, so
+    batch sizes grow with line speed and shrink when the line slows down
+
+Each record becomes one entry of the "data" list: dicts are sent as-is, anything
+else as {"content": str(record)}. With a SerialLedger and GTIN, records already
+printed (or repeated within a batch) are skipped, counted in
+stats()["duplicates"]; the rest are recorded once the printer accepts the batch.
+
+A poll that gets no reply at all is not backpressure: after `max_failed_polls`
+in a row (or at once if the connection is gone) the feeder raises RuntimeError
+instead of waiting forever.
+
+Usage: python dynamic_feeder.py serials.txt [--print-mode queue] [--lead-time 2]
+       seq 1000 2000 | python dynamic_feeder.py - --gtin 08961101532710   (ledger-checked)
+"""
+
+import argparse
+import itertools
+import json
+import queue
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from connection_pool import get_pool
+from serial_ledger import get_ledger
+
+PRINTER_IP = "172.16.0.55"
+PRINTER_PORT = 9944
+
+
+def default_entry(record: Any) -> Dict:
+    return record if isinstance(record, dict) else {"content": str(record)}
+
+
+def iter_file(path: str) -> Iterator[Any]:
+    """One record per line ('-' = stdin); JSON-object lines are decoded, blank lines skipped."""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    yield json.loads(line)
+                    continue
+                except ValueError:
+                    pass
+            yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def iter_queue(q: queue.Queue, sentinel: Any = None) -> Iterator[Any]:
+    """Records from a queue.Queue until `sentinel` is put on it."""
+    while True:
+        item = q.get()
+        if item is sentinel:
+            return
+        yield item
+
+
+class DynamicFeeder:
+    """Keeps the printer's dynamic buffer topped up from an iterable of records."""
+
+    def __init__(
+        self,
+        client,
+        records: Iterable[Any],
+        print_mode: str = "queue",
+        to_entry: Callable[[Any], Dict] = default_entry,
+        lead_time: float = 2.0,
+        min_batch: int = 8,
+        max_batch: int = 500,
+        max_backlog: int = 5000,
+        poll_interval: float = 0.05,
+        alpha: float = 0.3,
+        ledger=None,
+        gtin: str = "",
+        max_failed_polls: int = 5,
+    ):
+        self.client = client
+        self.records = iter(records)
+        self.print_mode = print_mode
+        self.to_entry = to_entry
+        self.lead_time = lead_time
+        self.min_batch = max(1, min_batch)
+        self.max_batch = max(self.min_batch, max_batch)
+        self.max_backlog = max(self.max_batch, max_backlog)
+        self.poll_interval = poll_interval
+        self.alpha = alpha
+        self.ledger = ledger
+        self.gtin = gtin
+        self.max_failed_polls = max(1, max_failed_polls)
+
+        self.sent = 0
+        self.printed = 0
+        self.rate = 0.0  # units/s, EWMA of output growth
+        self.batches = 0
+        self.duplicates = 0
+        self.exhausted = False
+        self._failed_polls = 0
+        self._base_output: Optional[int] = None
+        self._last_output = 0
+        self._last_time: Optional[float] = None
+
+    @property
+    def backlog(self) -> int:
+        return max(0, self.sent - self.printed)
+
+    def target_backlog(self) -> int:
+        return min(self.max_backlog, max(self.min_batch, int(self.rate * self.lead_time + 0.5)))
+
+    def _observe(self, status: Optional[Dict]) -> bool:
+        """Update printed count / rate from an /engine/real reply; returns trans_ready."""
+        if not status or status.get("status") not in (None, "ok"):
+            return False
+        now = time.monotonic()
+        output = int(status.get("output") or 0)
+        if self._base_output is None or output < self._last_output:
+            # First poll, or the counter was reset (print restarted): re-baseline
+            self._base_output = output - self.printed
+            self._last_output = output
+            self._last_time = now
+        elif now > self._last_time:
+            delta, dt = output - self._last_output, now - self._last_time
+            if delta or dt >= 1.0:
+                inst = delta / dt
+                self.rate = inst if not self.rate else self.alpha * inst + (1 - self.alpha) * self.rate
+                self._last_output, self._last_time = output, now
+        self.printed = output - self._base_output
+        return bool(status.get("trans_ready", True))
+
+    def _next_batch(self, size: int) -> Tuple[list, List[str]]:
+        """Up to `size` entries to send, and the serials to record once the printer has them."""
+        records = list(itertools.islice(self.records, size))
+        if len(records) < size:
+            self.exhausted = True
+        if self.ledger is None or not records:
+            return [self.to_entry(r) for r in records], []
+        serials = [r.get("content", "") if isinstance(r, dict) else str(r) for r in records]
+        keep, batch_serials, seen = [], [], set()
+        for r, sn, printed in zip(records, serials, self.ledger.contains_many(self.gtin, serials)):
+            if printed or sn in seen:
+                continue
+            seen.add(sn)
+            keep.append(r)
+            batch_serials.append(sn)
+        skipped = len(records) - len(keep)
+        if skipped:
+            self.duplicates += skipped
+            print(f"[WARN] Skipping {skipped} already printed / repeated serial(s)", file=sys.stderr)
+        return [self.to_entry(r) for r in keep], batch_serials
+
+    def step(self) -> int:
+        """One poll / send cycle; returns the number of records sent."""
+        status = self.client.get_print_status()
+        if status is None:
+            self._failed_polls += 1
+            if self.client.socket is None or self._failed_polls >= self.max_failed_polls:
+                raise RuntimeError(f"No reply from the printer to {self._failed_polls} status poll(s)")
+            return 0
+        self._failed_polls = 0
+        ready = self._observe(status)
+        if not ready or self.exhausted:
+            return 0
+        want = self.target_backlog() - self.backlog
+        if want < self.min_batch and self.backlog:
+            return 0
+        batch, serials = self._next_batch(min(self.max_batch, max(self.min_batch, want)))
+        if not batch:
+            return 0
+        r = self.client.send_dynamic_data(self.print_mode, batch)
+        if not r or r.get("status") not in (None, "ok"):
+            raise RuntimeError(f"Dynamic data rejected: {r}")
+        # Only serials the printer accepted are recorded; a failed send burns none
+        if serials:
+            raced = self.ledger.add_many(self.gtin, serials)
+            if raced:
+                print(f"[WARN] {len(raced)} serial(s) were recorded by another process meanwhile: {raced[:5]}",
+                      file=sys.stderr)
+        self.sent += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    def run(self, drain: bool = True, on_progress: Optional[Callable[["DynamicFeeder"], None]] = None):
+        """Feed until the records run out (and, with drain, until the printer has printed them)."""
+        while not self.exhausted or (drain and self.backlog):
+            sent = self.step()
+            if on_progress:
+                on_progress(self)
+            if not sent:
+                time.sleep(self.poll_interval)
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "printed": self.printed,
+            "backlog": self.backlog,
+            "rate": round(self.rate, 2),
+            "batches": self.batches,
+            "duplicates": self.duplicates,
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream records to /engine/dynamic with backpressure from /engine/real")
+    ap.add_argument("file", help="Records file, one per line (JSON objects allowed); '-' for stdin")
+    ap.add_argument("--host", default=PRINTER_IP)
+    ap.add_argument("--port", type=int, default=PRINTER_PORT)
+    ap.add_argument("--print-mode", default="queue", help="print_mode sent with each batch")
+    ap.add_argument("--lead-time", type=float, default=2.0, help="Seconds of printing to keep buffered")
+    ap.add_argument("--max-batch", type=int, default=500)
+    ap.add_argument("--no-drain", action="store_true", help="Exit once everything is sent")
+    ap.add_argument("--gtin", help="Check / record serials in the printed-serial ledger under this GTIN")
+    args = ap.parse_args()
+
+    try:
+        client = get_pool().acquire(args.host, args.port)
+    except ConnectionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    feeder = DynamicFeeder(client, iter_file(args.file), args.print_mode,
+                           lead_time=args.lead_time, max_batch=args.max_batch,
+                           ledger=get_ledger() if args.gtin else None, gtin=args.gtin or "")
+    last = [0.0]
+
+    def progress(f):
+        now = time.monotonic()
+        if now - last[0] >= 1.0:
+            last[0] = now
+            s = f.stats()
+            print(f"sent={s['sent']} printed={s['printed']} backlog={s['backlog']} rate={s['rate']}/s")
+
+    try:
+        stats = feeder.run(drain=not args.no_drain, on_progress=progress)
+    except KeyboardInterrupt:
+        stats = feeder.stats()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        get_pool().release(client, discard=True)
+        sys.exit(1)
+    finally:
+        if feeder.ledger is not None:
+            feeder.ledger.close()
+    get_pool().release(client)
+    print(f"\n[OK] {stats['sent']} records sent in {stats['batches']} batches, {stats['printed']} printed"
+          f", {stats['duplicates']} duplicates skipped")
+
+
+if __name__ == "__main__":
+    main()
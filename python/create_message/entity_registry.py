@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Content-addressed registry of printer-side sources and objects.
+
+Identical definitions (e.g. the SN-DATE date source and its styled object)
+used to be re-created for every label. The registry hashes the canonical JSON
+of a definition - type, attribute, style and resolved source_list; the name is
+not part of it - and maps it to the id already on the printer, so builders can
+reuse it instead of spending a round trip and a printer slot.
+
+Entries are per printer (host:port) and persisted to state/entity_registry.json.
+An entry is dropped when the printer reports the id is gone (invalidate(), or
+verify() which probes every entry with a pipelined find). save() merges into
+the file under state/entity_registry.json.lock, so processes sharing it only
+write their own changes.
+
+Usage: python entity_registry.py [list|verify|clear] [--host IP] [--port N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, Optional, Set, Tuple
+
+from file_lock import locked
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+DEFAULT_PATH = os.path.join(STATE_DIR, "entity_registry.json")
+
+Printer = Tuple[str, int]
+
+
+def definition_digest(kind: str, definition: Dict[str, Any]) -> str:
+    """sha256 of the canonical JSON of a source/object definition (kind included, name excluded)."""
+    canonical = json.dumps({"kind": kind, **definition}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def source_definition(stype: str, attribute: Dict) -> Dict[str, Any]:
+    return {"type": stype, "attribute": attribute}
+
+
+def object_definition(otype: str, style: Dict, attribute: Dict, source_list: list) -> Dict[str, Any]:
+    return {"type": otype, "style": style, "attribute": attribute or {}, "source_list": source_list}
+
+
+class EntityRegistry:
+    """
+    digest -> {"kind", "type", "id"} per printer, saved as JSON.
+
+    Several processes share the file (print worker, CLIs, orphan_gc, retention):
+    reads reload it when another process has replaced it, and save() re-reads it
+    under a file lock and applies only this process's own stores / removals, so a
+    long-lived holder never writes back entries someone else deleted.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._printers: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._pending: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}  # None = removed
+        self._cleared: Set[str] = set()
+        self._stamp = None
+        self._refresh()
+
+    @staticmethod
+    def _key(printer: Printer) -> str:
+        return f"{printer[0]}:{printer[1]}"
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _read(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            print(f"[WARN] Ignoring unreadable registry {self.path}: {e}", file=sys.stderr)
+            return {}
+
+    def _apply(self, printers: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """printers (as read from disk) with this process's unsaved changes on top."""
+        for pkey in self._cleared:
+            printers.pop(pkey, None)
+        for (pkey, digest), entry in self._pending.items():
+            if entry is None:
+                printers.get(pkey, {}).pop(digest, None)
+            else:
+                printers.setdefault(pkey, {})[digest] = entry
+        return printers
+
+    def _refresh(self):
+        """Reload if another process has written the file since we last read it."""
+        stamp = self._stat()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._printers = self._apply(self._read())
+
+    def entries(self, printer: Printer) -> Dict[str, Dict[str, Any]]:
+        """Current entries for printer (read-only view; use store / invalidate to change them)."""
+        self._refresh()
+        return self._printers.get(self._key(printer), {})
+
+    def lookup(self, printer: Printer, digest: str) -> Optional[int]:
+        entry = self.entries(printer).get(digest)
+        return entry["id"] if entry else None
+
+    def store(self, printer: Printer, digest: str, kind: str, etype: str, entity_id: int):
+        entry = {"kind": kind, "type": etype, "id": entity_id}
+        self._printers.setdefault(self._key(printer), {})[digest] = entry
+        self._pending[(self._key(printer), digest)] = entry
+
+    def invalidate(self, printer: Printer, kind: str, entity_id: int) -> int:
+        """Forget every entry pointing at (kind, id) - the printer no longer has it. Returns count removed."""
+        entries = self.entries(printer)
+        stale = [d for d, e in entries.items() if e["kind"] == kind and e["id"] == entity_id]
+        for d in stale:
+            del entries[d]
+            self._pending[(self._key(printer), d)] = None
+        return len(stale)
+
+    def verify(self, client) -> int:
+        """Probe every entry for client's printer with pipelined finds; drop the missing ones."""
+        printer = (client.host, client.port)
+        entries = list(self.entries(printer).values())
+        with client.pipeline() as p:
+            probes = [
+                (e, p.find_source(e["id"], e["type"]) if e["kind"] == "source" else p.find_object(e["id"]))
+                for e in entries
+            ]
+        removed = 0
+        for e, fut in probes:
+            r = fut.result()
+            # No reply, or a reply without a status, says nothing about the entity
+            if r and r.get("status") not in (None, "ok"):
+                removed += self.invalidate(printer, e["kind"], e["id"])
+        return removed
+
+    def clear(self, printer: Printer):
+        pkey = self._key(printer)
+        self._printers.pop(pkey, None)
+        self._pending = {k: v for k, v in self._pending.items() if k[0] != pkey}
+        self._cleared.add(pkey)
+
+    def save(self):
+        """Merge this process's changes into the file under its lock."""
+        if not self._pending and not self._cleared:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with locked(self.path + ".lock"):
+            printers = self._apply(self._read())
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(printers, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._stamp = self._stat()
+        self._printers = printers
+        self._pending = {}
+        self._cleared = set()
+
+
+_registries: Dict[str, EntityRegistry] = {}
+
+
+def get_registry(path: str = DEFAULT_PATH) -> EntityRegistry:
+    """Process-wide registry per file, so long-running callers keep it loaded."""
+    if path not in _registries:
+        _registries[path] = EntityRegistry(path)
+    return _registries[path]
+
+
+def main():
+    from sojet_client import SojetClient
+
+    ap = argparse.ArgumentParser(description="Inspect / verify the interned source & object registry")
+    ap.add_argument("command", nargs="?", default="list", choices=("list", "verify", "clear"))
+    ap.add_argument("--host", default="172.16.0.55")
+    ap.add_argument("--port", type=int, default=9944)
+    ap.add_argument("--path", default=DEFAULT_PATH)
+    args = ap.parse_args()
+
+    registry = EntityRegistry(args.path)
+    printer = (args.host, args.port)
+    if args.command == "list":
+        for digest, e in sorted(registry.entries(printer).items(), key=lambda kv: kv[1]["id"]):
+            print(f"{e['kind']:<7} {e['type']:<8} id={e['id']:<6} {digest[:16]}")
+        return
+    if args.command == "clear":
+        registry.clear(printer)
+    else:
+        client = SojetClient(args.host, args.port)
+        if not client.connect():
+            sys.exit(1)
+        try:
+            print(f"Removed {registry.verify(client)} stale entries")
+        finally:
+            client.disconnect()
+    registry.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Advisory inter-process locks on a lock file (fcntl.flock; msvcrt on Windows).
+
+The state/ files (entity registry, serial ledger) are shared by the Electron
+print worker and the CLIs, which run as separate processes:
+
+    with locked(path + ".lock"):
+        ... re-read, merge, write ...
+
+    lock = FileLock(os.path.join(ledger_dir, "LOCK"))   # kept, entered per operation
+    with lock:
+        ...
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock(f: IO):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock(f: IO):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """
+    Exclusive lock on a lock file, held for a `with` block. Re-entrant within the
+    process (nested blocks and threads share one OS lock), so a locked method may
+    call another. The lock file stays open between blocks; close() releases it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mutex = threading.RLock()
+        self._depth = 0
+        self._file: Optional[IO] = None
+
+    def __enter__(self):
+        self._mutex.acquire()
+        try:
+            if not self._depth:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a+b")
+                _lock(self._file)
+        except BaseException:
+            self._mutex.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if not self._depth:
+            _unlock(self._file)
+        self._mutex.release()
+
+    def close(self):
+        with self._mutex:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+@contextmanager
+def locked(path: str):
+    """Hold an exclusive lock on path for the block, waiting for other holders."""
+    lock = FileLock(path)
+    try:
+        with lock:
+            yield
+    finally:
+        lock.close()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+CRLF line framing for the Sojet TCP-JSON protocol (port 9944).
+
+Every request and response is one JSON document terminated by \\r\\n. A single
+recv() may return part of a response, or the tail of one response plus the
+head of the next (pipelined replies). LineFramer keeps one growable bytearray
+per socket, reads into it with recv_into() and hands out complete lines,
+keeping any leftover bytes for the next call.
+"""
+
+import json
+import socket
+import weakref
+from typing import Any, Dict, Optional
+
+CRLF = b"\r\n"
+DEFAULT_BUFSIZE = 65536
+MAX_LINE = 16 * 1024 * 1024
+
+
+class LineFramer:
+    """Splits a socket byte stream into CRLF-terminated lines."""
+
+    def __init__(self, sock: socket.socket, bufsize: int = DEFAULT_BUFSIZE, max_line: int = MAX_LINE):
+        self.sock = sock
+        self.max_line = max_line
+        self._buf = bytearray(bufsize)
+        self._start = 0   # first unread byte
+        self._end = 0     # one past the last received byte
+        self._scan = 0    # bytes before this offset are known to hold no CRLF
+
+    def pending(self) -> int:
+        """Number of buffered bytes not yet returned as a line."""
+        return self._end - self._start
+
+    def reset(self):
+        """Drop buffered bytes (e.g. after a timeout left a half-read response)."""
+        self._start = self._end = self._scan = 0
+
+    def _next_line(self) -> Optional[bytes]:
+        idx = self._buf.find(CRLF, max(self._scan, self._start), self._end)
+        if idx < 0:
+            # The last byte may be a lone \r whose \n has not arrived yet
+            self._scan = max(self._start, self._end - 1)
+            return None
+        line = bytes(memoryview(self._buf)[self._start:idx])
+        self._start = self._scan = idx + len(CRLF)
+        if self._start == self._end:
+            self._start = self._end = self._scan = 0
+        return line
+
+    def _reserve(self, min_free: int = 4096):
+        """Make room at the end of the buffer: compact first, grow if still short."""
+        if len(self._buf) - self._end >= min_free:
+            return
+        used = self._end - self._start
+        if self._start:
+            self._buf[:used] = self._buf[self._start:self._end]
+            self._scan -= self._start
+            self._start, self._end = 0, used
+        if len(self._buf) - self._end < min_free:
+            self._buf.extend(bytes(max(len(self._buf), min_free)))
+
+    def read_line(self) -> Optional[bytes]:
+        """
+        Return the next line without its CRLF, blocking on the socket as needed.
+        On EOF returns whatever partial data is buffered, or None if there is none.
+        Socket timeouts propagate to the caller; buffered bytes are kept.
+        """
+        while True:
+            line = self._next_line()
+            if line is not None:
+                return line
+            if self.pending() > self.max_line:
+                raise ValueError(f"Response exceeds {self.max_line} bytes without CRLF")
+            self._reserve()
+            n = self.sock.recv_into(memoryview(self._buf)[self._end:])
+            if n == 0:
+                if not self.pending():
+                    return None
+                line = bytes(memoryview(self._buf)[self._start:self._end])
+                self.reset()
+                return line
+            self._end += n
+
+    def read_json(self) -> Optional[Dict[str, Any]]:
+        """Read the next line and decode it as JSON (None on EOF / empty line)."""
+        line = self.read_line()
+        if line is None:
+            return None
+        s = line.decode("utf-8").strip()
+        return json.loads(s) if s else None
+
+
+_framers: "weakref.WeakKeyDictionary[socket.socket, LineFramer]" = weakref.WeakKeyDictionary()
+
+
+def framer_for(sock: socket.socket) -> LineFramer:
+    """Return the framer bound to sock, creating it on first use."""
+    framer = _framers.get(sock)
+    if framer is None:
+        framer = _framers[sock] = LineFramer(sock)
+    return framer
+
+
+def encode_request(request: Dict[str, Any]) -> bytes:
+    """Serialize one request as compact JSON + CRLF."""
+    return (json.dumps(request, separators=(',', ':')) + '\r\n').encode('utf-8')
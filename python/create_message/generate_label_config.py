@@ -7,7 +7,22 @@ Expiry: MMYYYY -> YYMMDD (Year=last2, Month=first2, Day=01)
 
 import json
 import argparse
+import os
+import re
 import sys
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: batch check digits are vectorized when available
+    np = None
+
+# GS1 AI limits used by the QR pattern
+GTIN_LEN = 14          # AI 01, n14 with mod-10 check digit
+AI21_MAX_LEN = 20      # AI 21 serial, an..20
+AI10_MAX_LEN = 20      # AI 10 batch/lot, an..20
+# GS1 AI encodable character set 82 (allowed in AI 21 / AI 10)
+GS1_CSET82 = re.compile(r"^[!\"%&'()*+,\-./0-9:;<=>?A-Z_a-z]*$")
 
 
 def expiry_mmyyyy_to_yymmdd(mmyyyy: str) -> str:
@@ -41,6 +56,175 @@ def mmyyyy_to_display(mmyyyy: str) -> str:
     return f"{mmyyyy[:2]} {mmyyyy[2:6]}"
 
 
+def gtin_check_digit(body: str) -> int:
+    """GS1 mod-10 check digit for the first 13 digits of a GTIN-14 (weights 3,1,3,... from the left)."""
+    total = sum(int(c) * (3 if i % 2 == 0 else 1) for i, c in enumerate(body[:13]))
+    return (10 - total % 10) % 10
+
+
+def _check_digits_ok(gtins: List[str]) -> List[bool]:
+    """Check-digit test for well-formed 14-digit GTINs, one matrix op with NumPy when available."""
+    if np is not None and gtins:
+        digits = np.frombuffer("".join(gtins).encode("ascii"), dtype=np.uint8).reshape(-1, GTIN_LEN) - 48
+        weights = np.array([3, 1] * 6 + [3], dtype=np.int64)
+        expected = (10 - (digits[:, :13] @ weights) % 10) % 10
+        return (expected == digits[:, 13]).tolist()
+    return [gtin_check_digit(g) == int(g[13]) for g in gtins]
+
+
+def validate_label_fields(gtin: str, serial_number: str, expiry: str, batch: str) -> List[str]:
+    """Errors for one record (empty list when it encodes to a valid GS1 string)."""
+    _, errors = build_qr_strings([gtin], [serial_number], [expiry], [batch])
+    return errors.get(0, [])
+
+
+def build_qr_strings(
+    gtins: Sequence[str],
+    serial_numbers: Sequence[str],
+    expiries: Sequence[str],
+    batches: Sequence[str],
+) -> Tuple[List[str], Dict[int, List[str]]]:
+    """
+    Batch build_qr_string over columns (lists or NumPy arrays) with GS1 validation in one pass.
+    Returns (codes, errors): codes[i] is the element string, or "" when row i is invalid;
+    errors maps row index -> list of messages (GTIN length/digits/check digit, AI 21 / AI 10
+    length and character set, expiry MMYYYY).
+    """
+    n = len(gtins)
+    if not (len(serial_numbers) == len(expiries) == len(batches) == n):
+        raise ValueError("build_qr_strings: columns must have the same length")
+    gtins = [str(g).strip() for g in gtins]
+    serials = [str(v).strip() for v in serial_numbers]
+    expiries = [str(v).strip() for v in expiries]
+    batches = [str(v).strip() for v in batches]
+
+    errors: Dict[int, List[str]] = {}
+
+    def fail(i, msg):
+        errors.setdefault(i, []).append(msg)
+
+    well_formed = []
+    for i, g in enumerate(gtins):
+        if len(g) != GTIN_LEN or not g.isdigit() or not g.isascii():
+            fail(i, f"GTIN '{g}' must be {GTIN_LEN} digits")
+        else:
+            well_formed.append(i)
+    for i, ok in zip(well_formed, _check_digits_ok([gtins[i] for i in well_formed])):
+        if not ok:
+            fail(i, f"GTIN '{gtins[i]}' check digit should be {gtin_check_digit(gtins[i])}")
+
+    cset = GS1_CSET82.match
+    for name, column, max_len in (("SN", serials, AI21_MAX_LEN), ("Batch", batches, AI10_MAX_LEN)):
+        for i, v in enumerate(column):
+            if not v:
+                fail(i, f"{name} is empty")
+            elif len(v) > max_len:
+                fail(i, f"{name} '{v}' longer than {max_len} characters")
+            elif not cset(v):
+                fail(i, f"{name} '{v}' has characters outside the GS1 set")
+
+    for i, e in enumerate(expiries):
+        if len(e) != 6 or not e.isdigit() or not 1 <= int(e[:2]) <= 12:
+            fail(i, f"Expiry '{e}' must be MMYYYY")
+
+    codes = [
+        "" if i in errors else f"01{gtins[i]}21{serials[i]}17{expiries[i][-2:]}{expiries[i][:2]}0010{batches[i]}"
+        for i in range(n)
+    ]
+    return codes, errors
+
+
+# Legacy template source ids -> field, used when a source has no recognisable name
+LEGACY_PATCH_IDS = {281: "qr", 282: "gtin", 283: "mfg", 284: "exp", 285: "batch", 286: "sn"}
+PATCH_NAMES = {"GTIN": "gtin", "MFG": "mfg", "EXP": "exp", "BATCH": "batch", "SN": "sn"}
+_SENTINEL = "\x00patch:{}\x00"
+
+
+def _patch_role(src: dict):
+    if src.get("type") != "text" or "content" not in (src.get("attribute") or {}):
+        return None
+    name = src.get("name", "")
+    if name in PATCH_NAMES:
+        return PATCH_NAMES[name]
+    if name.endswith("QRData"):
+        return "qr"
+    return LEGACY_PATCH_IDS.get(src.get("id"))
+
+
+class CompiledTemplate:
+    """
+    A label template parsed once: the compact JSON is pre-split around the text
+    source contents to patch, so emitting a config is one join of escaped values.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        sources = list(data.get("message", {}).get("source_list", [])) + list(data.get("sources", []))
+        originals = []
+        roles = []
+        for src in sources:
+            role = _patch_role(src)
+            if role:
+                originals.append((src, src["attribute"]["content"]))
+                src["attribute"]["content"] = _SENTINEL.format(len(roles))
+                roles.append(role)
+        encoded = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        for src, content in originals:
+            src["attribute"]["content"] = content
+        self.roles = roles
+        self._segments = re.split(r"\\u0000patch:\d+\\u0000", encoded)
+
+    def emit(self, fields: Dict[str, str]) -> str:
+        """Template JSON with each patch point set to fields[role]."""
+        escaped = [json.dumps(fields[role], ensure_ascii=False)[1:-1] for role in self.roles]
+        out = [self._segments[0]]
+        for value, segment in zip(escaped, self._segments[1:]):
+            out.append(value)
+            out.append(segment)
+        return "".join(out)
+
+
+_template_cache: Dict[str, Tuple[int, CompiledTemplate]] = {}
+
+
+def compile_template(template_path: str) -> CompiledTemplate:
+    """Compiled template for a path, re-read only when the file's mtime changes."""
+    key = os.path.abspath(template_path)
+    mtime = os.stat(key).st_mtime_ns
+    cached = _template_cache.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(key, "r", encoding="utf-8") as f:
+        compiled = CompiledTemplate(json.load(f))
+    _template_cache[key] = (mtime, compiled)
+    return compiled
+
+
+def label_fields(gtin: str, serial_number: str, expiry: str, batch: str, mfg: str) -> Dict[str, str]:
+    """Text for each patch point of a label template."""
+    return {
+        "qr": build_qr_string(gtin, serial_number, expiry, batch),
+        "gtin": f"GTIN: {gtin}",
+        "mfg": f"MFG: {mmyyyy_to_display(mfg)}",
+        "exp": f"EXP: {mmyyyy_to_display(expiry)}",
+        "batch": f"BATCH: {batch}",
+        "sn": f"SN: {serial_number}",
+    }
+
+
+def generate_label_config_json(
+    gtin: str,
+    serial_number: str,
+    expiry: str,
+    batch: str,
+    mfg: str,
+    tmda_reg: str = "",
+    template_path: str = "label-config-example.json",
+) -> str:
+    """Label config as compact JSON, straight from the compiled template (no dict walk)."""
+    return compile_template(template_path).emit(label_fields(gtin, serial_number, expiry, batch, mfg))
+
+
 def generate_label_config(
     gtin: str,
     serial_number: str,
@@ -51,36 +235,7 @@ def generate_label_config(
     template_path: str = "label-config-example.json",
 ) -> dict:
     """Generate label config JSON with dynamic values from user input."""
-
-    with open(template_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    qr_content = build_qr_string(gtin, serial_number, expiry, batch)
-    mfg_display = mmyyyy_to_display(mfg)
-    exp_display = mmyyyy_to_display(expiry)
-
-    replacements = {
-        281: qr_content,           # PharmaLabel_QRData
-        282: f"GTIN :{gtin}",      # GTIN
-        283: f"MFG: {mfg_display}",  # MFG
-        284: f"EXP: {exp_display}",   # EXP
-        285: f"BATCH: {batch}",    # BATCH
-        286: f"SN: {serial_number}", # SN
-    }
-
-    def replace_content_in_source(src: dict) -> None:
-        if src.get("type") == "text" and "attribute" in src and "content" in src["attribute"]:
-            sid = src.get("id")
-            if sid in replacements:
-                src["attribute"]["content"] = replacements[sid]
-
-    for src in data.get("message", {}).get("source_list", []):
-        replace_content_in_source(src)
-
-    for src in data.get("sources", []):
-        replace_content_in_source(src)
-
-    return data
+    return json.loads(generate_label_config_json(gtin, serial_number, expiry, batch, mfg, tmda_reg, template_path))
 
 
 def main():
@@ -95,7 +250,7 @@ def main():
     ap.add_argument("-o", "--output", help="Output file (default: stdout)")
     args = ap.parse_args()
 
-    config = generate_label_config(
+    output = generate_label_config_json(
         gtin=args.gtin,
         serial_number=args.serial,
         expiry=args.expiry,
@@ -105,8 +260,6 @@ def main():
         template_path=args.template,
     )
 
-    output = json.dumps(config, separators=(",", ":"), ensure_ascii=False)
-
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
             f.write(output)
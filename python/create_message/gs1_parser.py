@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Table-driven GS1 Application Identifier parser, for round-trip verification of
+printed / scanned codes against what build_qr_string() produced.
+
+Accepts:
+  - raw element strings: 0108961101532710210275...1729010010153A26
+  - GS (0x1D) or FNC1 separators after variable-length AIs (gs1_gs_separator)
+  - symbology identifiers from scanners: ]d2 (Data Matrix), ]Q3 (QR), ]C1 (GS1-128), ]e0
+  - the human-readable form: (01)08961101532710(21)...(17)290100(10)153A26
+
+The AI table is compiled once into {AI: (fixed length or None, max length)} plus
+the AI length for every two-digit prefix, so the common case is a dict lookup
+per field. Codes in the label layout build_qr_string() produces
+(01 GTIN, 21 SN, 17 date, 10 batch, no separators - BARCODE_STYLE prints them
+that way) are split by one compiled pattern: the fixed-length 01 and 17 anchor
+the variable 21 and 10, so nothing is enumerated. Any other code whose
+variable-length AI is not terminated by GS is parsed by backtracking over the
+possible end positions; verify() accepts the code if any parse matches the
+expected fields.
+
+Usage: python gs1_parser.py <code> [--gtin .. --sn .. --exp MMYYYY --batch ..]
+       python gs1_parser.py - < scans.txt        (one code per line)
+       python gs1_parser.py --benchmark 50000 [--gs]
+"""
+
+import argparse
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from generate_label_config import build_qr_string, expiry_mmyyyy_to_yymmdd, gtin_check_digit
+
+GS = "\x1d"
+SYMBOLOGY_PREFIXES = ("]d2", "]Q3", "]C1", "]e0", "]d1", "]Q1")
+
+# (AI, fixed length or None for variable, max data length, title)
+AI_DEFINITIONS = [
+    ("00", 18, 18, "SSCC"), ("01", 14, 14, "GTIN"), ("02", 14, 14, "CONTENT"),
+    ("10", None, 20, "BATCH/LOT"), ("11", 6, 6, "PROD DATE"), ("12", 6, 6, "DUE DATE"),
+    ("13", 6, 6, "PACK DATE"), ("15", 6, 6, "BEST BEFORE"), ("16", 6, 6, "SELL BY"),
+    ("17", 6, 6, "USE BY OR EXPIRY"), ("20", 2, 2, "VARIANT"), ("21", None, 20, "SERIAL"),
+    ("22", None, 20, "CPV"), ("235", None, 28, "TPX"), ("240", None, 30, "ADDITIONAL ID"),
+    ("241", None, 30, "CUST. PART No."), ("250", None, 30, "SECONDARY SERIAL"),
+    ("30", None, 8, "VAR. COUNT"), ("37", None, 8, "COUNT"), ("400", None, 30, "ORDER NUMBER"),
+    ("410", 13, 13, "SHIP TO LOC"), ("414", 13, 13, "LOC No."), ("420", None, 20, "SHIP TO POST"),
+    ("422", 3, 3, "ORIGIN"), ("7003", 10, 10, "EXPIRY TIME"), ("710", None, 20, "NHRN PZN"),
+    ("711", None, 20, "NHRN CIP"), ("712", None, 20, "NHRN CN"), ("713", None, 20, "NHRN DRN"),
+    ("714", None, 20, "NHRN AIM"), ("90", None, 30, "INTERNAL"),
+] + [(str(ai), None, 90, "INTERNAL") for ai in range(91, 100)] + [
+    (f"{p}{d}", 6, 6, "MEASURE") for p in ("310", "311", "312", "313", "320", "330") for d in range(10)
+]
+
+# Length of the AI itself, by its first two digits (GS1 General Specifications, figure 3.2-1)
+AI_PREFIX_LENGTH = {f"{i:02d}": 2 for i in range(100)}
+for _p in ("23", "24", "25", "40", "41", "42", "71"):
+    AI_PREFIX_LENGTH[_p] = 3
+for _p in ("31", "32", "33", "34", "35", "36", "39", "70", "72", "80", "81", "82"):
+    AI_PREFIX_LENGTH[_p] = 4
+
+AI_TABLE: Dict[str, Tuple[Optional[int], int]] = {ai: (fixed, max_len) for ai, fixed, max_len, _ in AI_DEFINITIONS}
+AI_TITLES = {ai: title for ai, _, _, title in AI_DEFINITIONS}
+LABEL_AIS = frozenset({"01", "21", "17", "10"})  # what build_qr_string() encodes
+MAX_AMBIGUOUS_PARSES = 64
+_PAREN = re.compile(r"\((\d{2,4})\)([^(]*)")
+# 01 + 14 digits, 21 + serial, 17 + 6 digits, 10 + batch; the greedy serial makes the
+# match the first 01/21/17/10 parse of the backtracking order (longest field first)
+_CSET82 = r"[!\"%&'()*+,\-./0-9:;<=>?A-Z_a-z]"  # GS1 character set 82
+LABEL_LAYOUT = re.compile(rf"01(\d{{14}})21({_CSET82}{{1,20}})17(\d{{6}})10({_CSET82}{{1,20}})")
+LABEL_LAYOUT_AIS = ("01", "21", "17", "10")
+
+
+class GS1ParseError(ValueError):
+    pass
+
+
+def normalize(code: str) -> str:
+    """Strip the symbology identifier / leading FNC1 and map separators to GS."""
+    code = code.strip("\r\n")
+    for prefix in SYMBOLOGY_PREFIXES:
+        if code.startswith(prefix):
+            code = code[len(prefix):]
+            break
+    code = code.replace("<GS>", GS).replace("{GS}", GS).replace("<FNC1>", GS)
+    return code.lstrip(GS)
+
+
+def _ai_at(code: str, pos: int) -> Tuple[str, Tuple[Optional[int], int]]:
+    ai = code[pos:pos + AI_PREFIX_LENGTH.get(code[pos:pos + 2], 2)]
+    spec = AI_TABLE.get(ai)
+    if spec is None:
+        raise GS1ParseError(f"Unknown AI '{ai}' at position {pos}")
+    return ai, spec
+
+
+def _parses(code: str, pos: int, seen: Tuple[str, ...]) -> Iterator[List[Tuple[str, str]]]:
+    """Every way to split code[pos:] into AIs; variable AIs without GS try longest first."""
+    if pos == len(code):
+        yield []
+        return
+    try:
+        ai, (fixed, max_len) = _ai_at(code, pos)
+    except GS1ParseError:
+        return
+    if ai in seen:
+        return
+    start = pos + len(ai)
+    if fixed is not None:
+        end = start + fixed
+        if end > len(code) or GS in code[start:end]:
+            return
+        nxt = end + 1 if code[end:end + 1] == GS else end
+        for rest in _parses(code, nxt, seen + (ai,)):
+            yield [(ai, code[start:end])] + rest
+        return
+    gs = code.find(GS, start)
+    if gs != -1 and gs - start <= max_len:
+        if gs > start:
+            for rest in _parses(code, gs + 1, seen + (ai,)):
+                yield [(ai, code[start:gs])] + rest
+        return
+    limit = min(len(code), start + max_len)
+    if gs != -1:
+        limit = min(limit, gs)
+    for end in range(limit, start, -1):
+        if end != len(code) and (end == gs or code[end:end + 2] not in AI_PREFIX_LENGTH):
+            continue
+        for rest in _parses(code, end, seen + (ai,)):
+            yield [(ai, code[start:end])] + rest
+
+
+def parse_all(code: str) -> Iterator[Dict[str, str]]:
+    """Every complete parse of code (longest variable fields first); usually exactly one."""
+    code = code.strip()
+    if code.startswith("("):
+        fields = _PAREN.findall(code)
+        if not fields or "".join(f"({a}){v}" for a, v in fields) != code:
+            raise GS1ParseError("Malformed parenthesized element string")
+        for ai, value in fields:
+            if ai not in AI_TABLE:
+                raise GS1ParseError(f"Unknown AI '{ai}'")
+        yield dict(fields)
+        return
+    for fields in _parses(normalize(code), 0, ()):
+        yield dict(fields)
+
+
+def _plausibility(fields: Dict[str, str]) -> int:
+    return sum(1 if ai in LABEL_AIS else -1 for ai in fields)
+
+
+def parse_label_layout(code: str) -> Optional[Dict[str, str]]:
+    """The 01/21/17/10 split of an unseparated label code, or None if it is not in that layout."""
+    if code.startswith("("):
+        return None
+    m = LABEL_LAYOUT.fullmatch(normalize(code.strip()))
+    return dict(zip(LABEL_LAYOUT_AIS, m.groups())) if m else None
+
+
+def parse(code: str) -> Dict[str, str]:
+    """
+    Parse code as {AI: value}; raises GS1ParseError if it does not parse. When missing
+    separators make it ambiguous, the parse using the most label AIs (01/21/17/10) wins.
+    """
+    fields = parse_label_layout(code)
+    if fields is not None:
+        return fields  # all four label AIs: no other parse can score higher
+    best = None
+    for n, fields in enumerate(parse_all(code)):
+        if best is None or _plausibility(fields) > _plausibility(best):
+            best = fields
+        if n >= MAX_AMBIGUOUS_PARSES or (n == 0 and GS in code):
+            break
+    if best is None:
+        raise GS1ParseError(f"Cannot parse '{code}'")
+    return best
+
+
+def field_errors(fields: Dict[str, str]) -> List[str]:
+    """Content checks beyond structure: GTIN check digit, date digits, max lengths."""
+    errors = []
+    gtin = fields.get("01")
+    if gtin is not None and (not gtin.isdigit() or gtin_check_digit(gtin) != int(gtin[13])):
+        errors.append(f"AI 01 '{gtin}' bad check digit")
+    for ai, value in fields.items():
+        fixed, max_len = AI_TABLE[ai]
+        if len(value) > max_len:
+            errors.append(f"AI {ai} longer than {max_len}")
+        if fixed is not None and not value.isdigit():
+            errors.append(f"AI {ai} '{value}' must be numeric")
+    return errors
+
+
+def expected_fields(gtin: str, sn: str, expiry_mmyyyy: str, batch: str) -> Dict[str, str]:
+    """The AIs build_qr_string() encodes for these label values."""
+    return {"01": gtin, "21": sn, "17": expiry_mmyyyy_to_yymmdd(expiry_mmyyyy), "10": batch}
+
+
+def verify(code: str, expected: Dict[str, str]) -> Tuple[bool, Dict[str, str], List[str]]:
+    """
+    Does code carry the expected {AI: value} fields? Returns (ok, fields, problems);
+    fields is the matching parse, else the first one.
+    """
+    fields = parse_label_layout(code)
+    if fields is not None and all(fields.get(ai) == v for ai, v in expected.items()):
+        problems = field_errors(fields)
+        return not problems, fields, problems
+    first = None
+    try:
+        for fields in parse_all(code):
+            first = first or fields
+            if all(fields.get(ai) == v for ai, v in expected.items()):
+                problems = field_errors(fields)
+                return not problems, fields, problems
+    except GS1ParseError as e:
+        return False, {}, [str(e)]
+    if first is None:
+        return False, {}, [f"Cannot parse '{code}'"]
+    problems = [f"AI {ai}: expected '{v}', got '{first.get(ai)}'" for ai, v in expected.items() if first.get(ai) != v]
+    return False, first, problems
+
+
+def benchmark(count: int, separated: bool = False) -> float:
+    """codes/s for label codes as printed (no GS; separated=True puts GS after the serial)."""
+    codes = [
+        "]d2" + build_qr_string("08961101532710", f"{i:012d}", "012029", "153A26")
+        for i in range(count)
+    ]
+    if separated:
+        codes = [c.replace("17290100", GS + "17290100") for c in codes]
+    t0 = time.perf_counter()
+    for c in codes:
+        parse(c)
+    return count / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parse / verify GS1 element strings")
+    ap.add_argument("code", nargs="?", help="Code to parse, or '-' to read one per line from stdin")
+    ap.add_argument("--gtin")
+    ap.add_argument("--sn")
+    ap.add_argument("--exp", help="Expected expiry MMYYYY")
+    ap.add_argument("--batch")
+    ap.add_argument("--benchmark", type=int, metavar="N", help="Parse N generated codes and report codes/second")
+    ap.add_argument("--gs", action="store_true", help="--benchmark: codes with a GS after the serial")
+    args = ap.parse_args()
+
+    if args.benchmark:
+        print(f"{benchmark(args.benchmark, args.gs):,.0f} codes/s")
+        return
+    if not args.code:
+        ap.print_help()
+        sys.exit(1)
+
+    expected = {}
+    if args.gtin:
+        expected["01"] = args.gtin
+    if args.sn:
+        expected["21"] = args.sn
+    if args.exp:
+        expected["17"] = expiry_mmyyyy_to_yymmdd(args.exp)
+    if args.batch:
+        expected["10"] = args.batch
+
+    codes = (line.rstrip("\r\n") for line in sys.stdin) if args.code == "-" else [args.code]
+    failures = 0
+    for code in codes:
+        ok, fields, problems = verify(code, expected)
+        shown = " ".join(f"({ai}){v}" for ai, v in fields.items())
+        print(f"{'OK  ' if ok else 'FAIL'} {shown}" + (f"  <- {'; '.join(problems)}" if problems else ""))
+        failures += not ok
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
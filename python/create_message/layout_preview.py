@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Offline preview and layout check for a message description.
+
+Takes a message the way the printer describes it (label-config-example.json:
+{"message": {..., "attribute": {fixed_width, fixed_height, ...}}, "objects": [...],
+"sources": [...]}) - or a MessageBuilder, e.g. from describe_label() - and:
+  - estimates each object's ink box (text: characters x font advance, clipped to
+    the object box; barcodes: the whole box)
+  - reports overlapping ink boxes, and objects outside fixed_height (and
+    fixed_width when fixed_boundary is set)
+  - rasterizes a 1-bit preview: PNG when Pillow is installed, else PBM. Text is
+    drawn as glyph blocks and barcodes as a module grid of the estimated size.
+Renders are cached in state/previews/ by a hash of the description.
+
+Usage: python layout_preview.py label-config-example.json [-o preview.png]
+       python layout_preview.py --label --gtin 08961101532710 --sn 02750082604216564872 ...
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from symbol_capacity import estimate_for_style
+
+try:
+    from PIL import Image
+except ImportError:  # optional: PBM output only
+    Image = None
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+CACHE_DIR = os.path.join(STATE_DIR, "previews")
+DEFAULT_HEIGHT = 300
+# Sample widths for printer-filled date items (DST = day of year)
+DATE_ITEM_SAMPLES = {"yyyy": "2026", "yy": "26", "MM": "01", "dd": "01", "DST": "001", "HH": "12", "mm": "00", "ss": "00"}
+_FONT_SIZE = re.compile(r"-(\d+)-(\d+)-[^-]*$")
+
+Box = Tuple[int, int, int, int]  # x, y, w, h
+
+
+def description_from_builder(builder, fixed_width: int = 0, fixed_height: int = DEFAULT_HEIGHT) -> Dict[str, Any]:
+    """A label-config-style description of a MessageBuilder (source/object keys stand in for ids)."""
+    sources = [{"type": s["type"], "id": key, "name": s["name"], "attribute": s["attribute"]}
+               for key, s in builder.sources.items()]
+    objects = [{"type": o["type"], "id": key, "name": o["name"], "style": o["style"], "attribute": o["attribute"],
+                "source_list": [{"type": builder.sources[k]["type"], "id": k} for k in o["sources"]]}
+               for key, o in builder.objects.items()]
+    return {
+        "message": {"name": builder.name, "attribute": {"fixed_width": fixed_width, "fixed_height": fixed_height,
+                                                        "fixed_boundary": bool(fixed_width)}},
+        "objects": objects,
+        "sources": sources,
+    }
+
+
+def sample_content(source: Optional[Dict]) -> str:
+    """What a source prints, with printer-filled values at their usual width."""
+    if not source:
+        return ""
+    attr = source.get("attribute") or {}
+    stype = source.get("type")
+    if stype == "text":
+        return attr.get("content", "")
+    if stype == "date":
+        items = (attr.get("format") or {}).get("items", [])
+        return "".join(DATE_ITEM_SAMPLES.get(i.get("content"), "00") for i in items) or "000000"
+    if stype == "counter":
+        return "0" * int(attr.get("digits") or len(str(attr.get("max_value", 9999))))
+    return ""
+
+
+def object_content(obj: Dict, sources: Dict[Any, Dict]) -> str:
+    return "".join(sample_content(sources.get((s.get("type"), s.get("id")))) for s in obj.get("source_list", []))
+
+
+def char_advance(style: Dict) -> float:
+    """Font size from font_style (...-40-40-UTF-8) x 0.6 plus letter_space (monospace estimate)."""
+    m = _FONT_SIZE.search(style.get("font_style", ""))
+    size = int(m.group(2)) if m else style.get("h", 40)
+    return size * 0.6 + style.get("letter_space", 0) + style.get("letter_spacing", 0)
+
+
+def ink_box(obj: Dict, content: str) -> Box:
+    style = obj.get("style", {})
+    x, y, w, h = style.get("x", 0), style.get("y", 0), style.get("w", 0), style.get("h", 0)
+    if obj.get("type") == "text":
+        w = min(w, int(len(content) * char_advance(style) + 0.5)) if w else int(len(content) * char_advance(style))
+    return x, y, w, h
+
+
+def _overlap(a: Box, b: Box) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def check_layout(desc: Dict) -> Dict[str, Any]:
+    """Ink boxes, overlaps and out-of-bounds for a description. {"boxes", "overlaps", "out_of_bounds", "size"}"""
+    sources = {(s.get("type"), s.get("id")): s for s in desc.get("sources", [])}
+    attr = desc.get("message", {}).get("attribute", {})
+    fixed_h = attr.get("fixed_height") or DEFAULT_HEIGHT
+    fixed_w = attr.get("fixed_width") if attr.get("fixed_boundary") else 0
+
+    boxes = []
+    for obj in desc.get("objects", []):
+        content = object_content(obj, sources)
+        boxes.append({"name": obj.get("name"), "type": obj.get("type"), "content": content,
+                      "box": ink_box(obj, content), "style": obj.get("style", {})})
+
+    overlaps = [(a["name"], b["name"]) for i, a in enumerate(boxes) for b in boxes[i + 1:] if _overlap(a["box"], b["box"])]
+    out_of_bounds = []
+    for b in boxes:
+        x, y, w, h = b["box"]
+        if x < 0 or y < 0 or y + h > fixed_h or (fixed_w and x + w > fixed_w):
+            out_of_bounds.append(b["name"])
+    width = max([fixed_w] + [b["box"][0] + b["box"][2] for b in boxes])
+    return {"boxes": boxes, "overlaps": overlaps, "out_of_bounds": out_of_bounds, "size": (width, fixed_h)}
+
+
+class Bitmap:
+    """1-bit canvas, row-major, 1 = ink."""
+
+    def __init__(self, width: int, height: int):
+        self.width, self.height = max(1, width), max(1, height)
+        self.stride = (self.width + 7) // 8
+        self.bits = bytearray(self.stride * self.height)
+
+    def fill(self, x: int, y: int, w: int, h: int):
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.width, x + w), min(self.height, y + h)
+        for row in range(y0, y1):
+            base = row * self.stride
+            for col in range(x0, x1):
+                self.bits[base + (col >> 3)] |= 0x80 >> (col & 7)
+
+    def to_pbm(self) -> bytes:
+        return f"P4\n{self.width} {self.height}\n".encode("ascii") + bytes(self.bits)
+
+    def save(self, path: str):
+        if Image is not None and path.lower().endswith(".png"):
+            Image.frombytes("1", (self.width, self.height), bytes(b ^ 0xFF for b in self.bits)).save(path)
+            return
+        with open(path, "wb") as f:
+            f.write(self.to_pbm())
+
+
+def _draw_text(bm: Bitmap, box: Box, content: str, style: Dict, scale: float):
+    x, y, _, h = box
+    advance = char_advance(style)
+    glyph_w = max(1, int(advance * 0.7 * scale))
+    glyph_h = max(1, int(h * 0.7 * scale))
+    top = int((y + h * 0.15) * scale)
+    for i, ch in enumerate(content):
+        left = int((x + i * advance) * scale)
+        if left >= (box[0] + box[2]) * scale:
+            break
+        if not ch.isspace():
+            bm.fill(left, top, glyph_w, glyph_h)
+
+
+def _draw_barcode(bm: Bitmap, box: Box, content: str, style: Dict, scale: float):
+    x, y, w, h = box
+    fit = estimate_for_style(content, style)
+    rows, cols = fit["rows"] or 10, fit["cols"] or 10
+    module = (fit.get("x_dimension") or min(w / cols, h / rows)) * scale
+    seed = hashlib.sha256(content.encode("utf-8")).digest()
+    for r in range(rows):
+        for c in range(cols):
+            finder = c == 0 or r == rows - 1  # Data Matrix "L"; alternating timing on the other edges
+            timing = (r == 0 and c % 2 == 0) or (c == cols - 1 and r % 2 == 1)
+            bit = (seed[(r * cols + c) // 8 % len(seed)] >> ((r * cols + c) % 8)) & 1
+            if finder or timing or (0 < r < rows - 1 and 0 < c < cols - 1 and bit):
+                bm.fill(int(x * scale + c * module), int(y * scale + r * module),
+                        max(1, int(module + 0.5)), max(1, int(module + 0.5)))
+
+
+def render(desc: Dict, scale: float = 1.0, layout: Optional[Dict] = None) -> Bitmap:
+    layout = layout or check_layout(desc)
+    width, height = layout["size"]
+    bm = Bitmap(int(width * scale) + 1, int(height * scale) + 1)
+    for b in layout["boxes"]:
+        if b["type"] == "barcode":
+            _draw_barcode(bm, b["box"], b["content"], b["style"], scale)
+        elif b["type"] == "text":
+            _draw_text(bm, b["box"], b["content"], b["style"], scale)
+    return bm
+
+
+def description_hash(desc: Dict, scale: float) -> str:
+    canonical = json.dumps({"desc": desc, "scale": scale}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def preview(desc: Dict, scale: float = 1.0, cache_dir: str = CACHE_DIR) -> Tuple[str, Dict[str, Any]]:
+    """Render desc once per content hash; returns (image path, layout check)."""
+    layout = check_layout(desc)
+    ext = ".png" if Image is not None else ".pbm"
+    path = os.path.join(cache_dir, description_hash(desc, scale) + ext)
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        render(desc, scale, layout).save(tmp if ext == ".pbm" else tmp + ext)
+        os.replace(tmp if ext == ".pbm" else tmp + ext, path)
+    return path, layout
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Preview a message layout offline and check overlaps / bounds")
+    ap.add_argument("description", nargs="?", help="Message description JSON (label-config-example format)")
+    ap.add_argument("--label", action="store_true", help="Preview create_product_label's layout for the given fields")
+    ap.add_argument("--barcode-source", default="dynamic")
+    for key in ("gtin", "mfg", "exp", "batch", "sn"):
+        ap.add_argument(f"--{key}", default="")
+    ap.add_argument("--scale", type=float, default=1.0)
+    ap.add_argument("-o", "--output", help="Also copy the preview here")
+    args = ap.parse_args()
+
+    if args.label:
+        from create_product_label import BARCODE_STYLE, describe_label, label_barcode_style
+        values = {k: getattr(args, k) for k in ("gtin", "mfg", "exp", "batch", "sn")}
+        try:
+            style = label_barcode_style(values, args.barcode_source)
+        except ValueError as e:
+            print(f"[WARN] {e}")
+            style = BARCODE_STYLE
+        builder, _ = describe_label(values, "Preview", args.barcode_source, barcode_style=style)
+        desc = description_from_builder(builder)
+    elif args.description:
+        with open(args.description, "r", encoding="utf-8") as f:
+            desc = json.load(f)
+    else:
+        ap.print_help()
+        sys.exit(1)
+
+    path, layout = preview(desc, args.scale)
+    if args.output:
+        output, ext = args.output, os.path.splitext(path)[1]
+        if os.path.splitext(output)[1].lower() != ext:
+            # Without Pillow the preview is PBM; don't write it under a .png name
+            output = os.path.splitext(output)[0] + ext
+            print(f"[WARN] Preview is {ext[1:].upper()}" + (" (Pillow not installed)" if Image is None else "")
+                  + f"; writing {output}")
+        with open(path, "rb") as src, open(output, "wb") as dst:
+            dst.write(src.read())
+        path = output
+    for b in layout["boxes"]:
+        x, y, w, h = b["box"]
+        print(f"  {b['name']:<10} {b['type']:<8} x={x:<4} y={y:<4} w={w:<4} h={h:<4} {b['content'][:40]}")
+    for a, b in layout["overlaps"]:
+        print(f"[WARN] Overlap: {a} / {b}")
+    for name in layout["out_of_bounds"]:
+        print(f"[WARN] Out of bounds: {name}")
+    print(f"Preview: {path}")
+    if layout["overlaps"] or layout["out_of_bounds"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
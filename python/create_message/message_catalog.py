@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of the printer's message catalogue.
+
+/data/list pages 10 messages at a time and start_print addresses messages by
+name, so "does this label exist" used to mean paging the whole list. The
+catalogue (state/catalog.sqlite3) keeps messages, their objects and sources
+keyed by printer + id, with the label fields (GTIN, MFG, EXP, batch, SN) read
+back from the text sources, so name -> id lookups, GTIN/batch queries and the
+print-history screen are local index reads.
+
+sync() is incremental: it pages /data/list (ids, names and modified_time
+only) and fetches details - pipelined find_message(detail=1), then one
+pipelined find_source burst - just for messages that are new or whose
+modified_time changed; messages gone from the list are dropped. Editing a
+source in place (update_label, counter reseed) does not touch the message's
+modified_time, so those callers mark_stale() the message and the next sync
+refetches it together with every message sharing one of its sources.
+
+Usage: python message_catalog.py sync [--full]
+       python message_catalog.py lookup <name>
+       python message_catalog.py find [--gtin ..] [--batch ..] [--sn ..]
+       python message_catalog.py history [--limit 20]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from create_product_label import parse_field_contents
+from orphan_gc import list_messages
+from sojet_client import SojetClient
+
+PRINTER_IP = "172.16.0.55"
+PRINTER_PORT = 9944
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+DEFAULT_PATH = os.path.join(STATE_DIR, "catalog.sqlite3")
+
+Printer = Tuple[str, int]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    printer TEXT NOT NULL, id INTEGER NOT NULL, name TEXT NOT NULL,
+    created_time INTEGER, modified_time INTEGER, last_print INTEGER NOT NULL DEFAULT 0,
+    gtin TEXT, mfg TEXT, exp TEXT, batch TEXT, sn TEXT,
+    PRIMARY KEY (printer, id)
+);
+CREATE INDEX IF NOT EXISTS messages_name ON messages (printer, name);
+CREATE INDEX IF NOT EXISTS messages_gtin_batch ON messages (printer, gtin, batch);
+CREATE INDEX IF NOT EXISTS messages_sn ON messages (printer, sn);
+CREATE TABLE IF NOT EXISTS objects (
+    printer TEXT NOT NULL, message_id INTEGER NOT NULL, id INTEGER NOT NULL, position INTEGER,
+    type TEXT, name TEXT,
+    PRIMARY KEY (printer, message_id, id)
+);
+CREATE TABLE IF NOT EXISTS object_sources (
+    printer TEXT NOT NULL, message_id INTEGER NOT NULL, object_id INTEGER NOT NULL, position INTEGER,
+    source_type TEXT NOT NULL, source_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS object_sources_message ON object_sources (printer, message_id);
+CREATE TABLE IF NOT EXISTS sources (
+    printer TEXT NOT NULL, type TEXT NOT NULL, id INTEGER NOT NULL, name TEXT, content TEXT,
+    PRIMARY KEY (printer, type, id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (printer TEXT PRIMARY KEY, last_sync REAL);
+"""
+
+MESSAGE_COLUMNS = ("id", "name", "created_time", "modified_time", "last_print", "gtin", "mfg", "exp", "batch", "sn")
+
+
+def _printer_key(printer: Printer) -> str:
+    return f"{printer[0]}:{printer[1]}"
+
+
+class MessageCatalog:
+    """Messages / objects / sources per printer in SQLite; refreshed by sync()."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    # --- sync ---
+    def sync(self, client, window: int = 8, full: bool = False, history=None) -> Dict[str, Any]:
+        """
+        Bring the printer's rows up to date. full=True refetches every message.
+        history: PrintHistory to copy last-print times from.
+        Returns {"listed", "fetched", "missing", "removed", "seconds"}; "missing" counts new /
+        changed messages whose details could not be read (their rows are not up to date).
+        """
+        started = time.perf_counter()
+        printer = (client.host, client.port)
+        pkey = _printer_key(printer)
+        listed = list_messages(client)
+        known = {row["id"]: row["modified_time"] for row in
+                 self.db.execute("SELECT id, modified_time FROM messages WHERE printer = ?", (pkey,))}
+        changed = [m for m in listed
+                   if full or known.get(m["id"]) != (m.get("attribute") or {}).get("modified_time")]
+        removed = set(known) - {m["id"] for m in listed}
+
+        details = self._fetch(client, changed, window)
+        with self.db:
+            for mid in removed:
+                self._delete_message(pkey, mid)
+            for m in changed:
+                if m["id"] in details:
+                    self._store(pkey, m, *details[m["id"]])
+            if history is not None:
+                self.db.executemany("UPDATE messages SET last_print = MAX(last_print, ?) WHERE printer = ? AND name = ?",
+                                    [(e["last_print"], pkey, name) for name, e in history.entries(printer).items()])
+            self._drop_unused_sources(pkey)
+            self.db.execute("INSERT OR REPLACE INTO sync_state (printer, last_sync) VALUES (?, ?)", (pkey, time.time()))
+        return {"listed": len(listed), "fetched": len(details), "missing": len(changed) - len(details),
+                "removed": len(removed), "seconds": round(time.perf_counter() - started, 3)}
+
+    def _fetch(self, client, messages: List[Dict], window: int) -> Dict[int, Tuple[Dict, Dict]]:
+        """message id -> (find_message detail=1 reply, {(type, id): source}); two pipelined bursts."""
+        with client.pipeline(window) as p:
+            futs = [(m["id"], p.find_message(m["id"], detail=1)) for m in messages]
+        replies = {}
+        for mid, fut in futs:
+            r = fut.result()
+            if r and r.get("status") in (None, "ok"):
+                replies[mid] = r
+        refs = {(s.get("type"), s.get("id")) for r in replies.values()
+                for obj in r.get("object_list", []) for s in obj.get("source_list", [])}
+        with client.pipeline(window) as p:
+            source_futs = [(ref, p.find_source(ref[1], ref[0])) for ref in sorted(refs, key=str)]
+        sources = {}
+        for ref, fut in source_futs:
+            r = fut.result()
+            if r and r.get("status") in (None, "ok"):
+                sources[ref] = r
+        return {mid: (r, sources) for mid, r in replies.items()}
+
+    def _store(self, pkey: str, listed: Dict, detail: Dict, sources: Dict):
+        mid = listed["id"]
+        attr = listed.get("attribute") or {}
+        self._delete_message(pkey, mid, keep_row=True)
+        contents = {}
+        for pos, obj in enumerate(detail.get("object_list", [])):
+            self.db.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+                            (pkey, mid, obj.get("id"), pos, obj.get("type"), obj.get("name")))
+            for spos, ref in enumerate(obj.get("source_list", [])):
+                stype, sid = ref.get("type"), ref.get("id")
+                self.db.execute("INSERT INTO object_sources VALUES (?, ?, ?, ?, ?, ?)",
+                                (pkey, mid, obj.get("id"), spos, stype, sid))
+                src = sources.get((stype, sid))
+                if src is None:
+                    continue
+                content = (src.get("attribute") or {}).get("content")
+                self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                                (pkey, stype, sid, src.get("name"), content))
+                if stype == "text" and src.get("name") and content is not None:
+                    contents[src["name"]] = content
+        fields = parse_field_contents(contents)
+        last_print = self.db.execute("SELECT last_print FROM messages WHERE printer = ? AND id = ?",
+                                     (pkey, mid)).fetchone()
+        self.db.execute(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (pkey, mid, listed.get("name", ""), attr.get("created_time"), attr.get("modified_time"),
+             last_print[0] if last_print else 0, fields.get("gtin"), fields.get("mfg"), fields.get("exp"),
+             fields.get("batch"), fields.get("sn")))
+
+    def _delete_message(self, pkey: str, mid: int, keep_row: bool = False):
+        self.db.execute("DELETE FROM objects WHERE printer = ? AND message_id = ?", (pkey, mid))
+        self.db.execute("DELETE FROM object_sources WHERE printer = ? AND message_id = ?", (pkey, mid))
+        if not keep_row:
+            self.db.execute("DELETE FROM messages WHERE printer = ? AND id = ?", (pkey, mid))
+
+    def _drop_unused_sources(self, pkey: str):
+        self.db.execute("DELETE FROM sources WHERE printer = ? AND NOT EXISTS (SELECT 1 FROM object_sources o "
+                        "WHERE o.printer = sources.printer AND o.source_type = sources.type "
+                        "AND o.source_id = sources.id)", (pkey,))
+
+    def last_sync(self, printer: Printer) -> float:
+        row = self.db.execute("SELECT last_sync FROM sync_state WHERE printer = ?", (_printer_key(printer),)).fetchone()
+        return row[0] if row else 0.0
+
+    # --- local updates (no round trip; the next sync confirms them) ---
+    def record_created(self, printer: Printer, message_id: int, name: str, values: Dict[str, str]):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO messages (printer, id, name, created_time, modified_time, gtin, mfg, exp, "
+                "batch, sn) VALUES (?, ?, ?, ?, NULL, ?, ?, ?, ?, ?)",
+                (_printer_key(printer), message_id, name, int(time.time()), values.get("gtin"), values.get("mfg"),
+                 values.get("exp"), values.get("batch"), values.get("sn")))
+
+    def mark_stale(self, printer: Printer, message_id: int):
+        """Refetch message_id, and every message sharing a source with it, on the next sync."""
+        pkey = _printer_key(printer)
+        with self.db:
+            self.db.execute(
+                "UPDATE messages SET modified_time = NULL WHERE printer = ? AND (id = ? OR id IN ("
+                "SELECT o.message_id FROM object_sources o JOIN object_sources m ON m.printer = o.printer "
+                "AND m.source_type = o.source_type AND m.source_id = o.source_id "
+                "WHERE m.printer = ? AND m.message_id = ?))", (pkey, message_id, pkey, message_id))
+
+    def record_deleted(self, printer: Printer, message_id: int):
+        with self.db:
+            self._delete_message(_printer_key(printer), message_id)
+            self._drop_unused_sources(_printer_key(printer))
+
+    def record_print(self, printer: Printer, name: str, when: Optional[float] = None):
+        with self.db:
+            self.db.execute("UPDATE messages SET last_print = ? WHERE printer = ? AND name = ?",
+                            (int(when or time.time()), _printer_key(printer), name))
+
+    # --- queries ---
+    def lookup(self, printer: Printer, name: str) -> Optional[int]:
+        """Message id for a name (the newest, if the name is used twice)."""
+        row = self.db.execute("SELECT id FROM messages WHERE printer = ? AND name = ? ORDER BY id DESC LIMIT 1",
+                              (_printer_key(printer), name)).fetchone()
+        return row[0] if row else None
+
+    def find(self, printer: Printer, gtin: Optional[str] = None, batch: Optional[str] = None,
+             sn: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Messages whose label fields match every given value."""
+        where, args = ["printer = ?"], [_printer_key(printer)]
+        for column, value in (("gtin", gtin), ("batch", batch), ("sn", sn)):
+            if value:
+                where.append(f"{column} = ?")
+                args.append(value)
+        rows = self.db.execute(f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages WHERE {' AND '.join(where)} "
+                               f"ORDER BY id DESC LIMIT ?", (*args, limit))
+        return [dict(r) for r in rows]
+
+    def history(self, printer: Printer, limit: int = 50) -> List[Dict[str, Any]]:
+        """Messages by last use (print, else modification), most recent first."""
+        rows = self.db.execute(
+            f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages WHERE printer = ? "
+            f"ORDER BY MAX(last_print, COALESCE(modified_time, 0), COALESCE(created_time, 0)) DESC, id DESC LIMIT ?",
+            (_printer_key(printer), limit))
+        return [dict(r) for r in rows]
+
+    def messages(self, printer: Printer) -> List[Dict[str, Any]]:
+        """Every catalogued message as a /data/list entry: {"id", "name", "attribute": {created/modified_time}}."""
+        rows = self.db.execute("SELECT id, name, created_time, modified_time FROM messages WHERE printer = ? "
+                               "ORDER BY id", (_printer_key(printer),))
+        return [{"id": r["id"], "name": r["name"],
+                 "attribute": {"created_time": r["created_time"], "modified_time": r["modified_time"]}} for r in rows]
+
+    def references(self, printer: Printer) -> Dict[int, Tuple[Set[int], Set[Tuple[str, int]]]]:
+        """message id -> (object ids, (source type, id)s) for every message, as orphan_gc.message_references."""
+        pkey = _printer_key(printer)
+        refs = {row[0]: (set(), set()) for row in
+                self.db.execute("SELECT id FROM messages WHERE printer = ?", (pkey,))}
+        for mid, oid in self.db.execute("SELECT message_id, id FROM objects WHERE printer = ?", (pkey,)):
+            refs.setdefault(mid, (set(), set()))[0].add(oid)
+        for mid, stype, sid in self.db.execute(
+                "SELECT message_id, source_type, source_id FROM object_sources WHERE printer = ?", (pkey,)):
+            refs.setdefault(mid, (set(), set()))[1].add((stype, sid))
+        return refs
+
+    def message_sources(self, printer: Printer, message_id: int) -> List[Dict[str, Any]]:
+        rows = self.db.execute(
+            "SELECT o.object_id, o.position, s.type, s.id, s.name, s.content FROM object_sources o "
+            "LEFT JOIN sources s ON s.printer = o.printer AND s.type = o.source_type AND s.id = o.source_id "
+            "WHERE o.printer = ? AND o.message_id = ? ORDER BY o.object_id, o.position",
+            (_printer_key(printer), message_id))
+        return [dict(r) for r in rows]
+
+    def close(self):
+        self.db.close()
+
+
+_catalogs: Dict[str, MessageCatalog] = {}
+
+
+def get_catalog(path: str = DEFAULT_PATH) -> MessageCatalog:
+    """Process-wide catalogue per file (kept open by the print worker)."""
+    if path not in _catalogs:
+        _catalogs[path] = MessageCatalog(path)
+    return _catalogs[path]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local SQLite mirror of the printer's messages")
+    ap.add_argument("command", choices=("sync", "lookup", "find", "history"))
+    ap.add_argument("name", nargs="?", help="Message name (lookup)")
+    ap.add_argument("--gtin")
+    ap.add_argument("--batch")
+    ap.add_argument("--sn")
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--full", action="store_true", help="sync: refetch every message")
+    ap.add_argument("--host", default=PRINTER_IP)
+    ap.add_argument("--port", type=int, default=PRINTER_PORT)
+    ap.add_argument("--path", default=DEFAULT_PATH)
+    args = ap.parse_args()
+
+    catalog = MessageCatalog(args.path)
+    printer = (args.host, args.port)
+    if args.command == "sync":
+        from message_retention import get_history
+        client = SojetClient(args.host, args.port)
+        if not client.connect():
+            print(f"Error: cannot connect to {args.host}:{args.port}", file=sys.stderr)
+            sys.exit(1)
+        try:
+            r = catalog.sync(client, full=args.full, history=get_history())
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            client.disconnect()
+        print(f"[OK] {r['listed']} messages listed, {r['fetched']} fetched, {r['removed']} removed in {r['seconds']}s")
+        return
+    if args.command == "lookup":
+        if not args.name:
+            print("Usage: message_catalog.py lookup <name>", file=sys.stderr)
+            sys.exit(1)
+        mid = catalog.lookup(printer, args.name)
+        print(mid if mid is not None else "not found")
+        sys.exit(0 if mid is not None else 1)
+    rows = (catalog.find(printer, args.gtin, args.batch, args.sn, args.limit) if args.command == "find"
+            else catalog.history(printer, args.limit))
+    for r in rows:
+        used = time.strftime("%Y-%m-%d %H:%M", time.localtime(max(r["last_print"] or 0, r["modified_time"] or 0,
+                                                                   r["created_time"] or 0)))
+        print(f"  {r['id']:<6} {r['name']:<32} GTIN {r['gtin'] or '-':<14} BATCH {r['batch'] or '-':<10} "
+              f"SN {r['sn'] or '-':<20} {used}")
+    if not rows:
+        print("  (none)")
+
+
+if __name__ == "__main__":
+    main()
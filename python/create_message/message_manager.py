@@ -10,6 +10,8 @@ import json
 import sys
 from typing import Dict, List, Optional, Any
 
+from framing import framer_for
+
 
 class SojetPrinterClient:
     """Client for communicating with Sojet printer via TCP-JSON protocol"""
@@ -68,16 +70,8 @@ class SojetPrinterClient:
             # Send request
             self.socket.sendall(message.encode('utf-8'))
             
-            # Receive response
-            response_data = b''
-            while True:
-                chunk = self.socket.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                # Check if we have a complete JSON response (ends with newline)
-                if response_data.endswith(b'\r\n'):
-                    break
+            # Receive one CRLF-framed response (leftover bytes stay buffered)
+            response_data = framer_for(self.socket).read_line() or b''
             
             # Parse response
             response_str = response_data.decode('utf-8').strip()
@@ -197,6 +191,10 @@ class SojetPrinterClient:
                 return False
         return False
     
+    def get_heartbeat(self) -> Optional[Dict[str, Any]]:
+        """Query /info/heart_beat (used by the connection pool to validate idle connections)"""
+        return self.send_request({"request_type": "get", "path": "/info/heart_beat"})
+    
     def __enter__(self):
         """Context manager entry"""
         self.connect()
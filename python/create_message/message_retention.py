@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Keep the printer's message storage bounded: evict least-recently-printed labels.
+
+Every label run adds a message. The retention manager remembers, per printer,
+when each message name was last printed (our start_print calls, and the
+data_name seen in /engine/real) in state/print_history.json. A message's last
+use is the later of that and its created/modified time on the printer, so a
+label that was just built is not the first to go.
+
+enforce() keeps at most `cap` messages. It evicts the least recently used ones
+with their objects and sources (message, then objects, then sources, each a
+pipelined burst) and:
+  - never touches the message currently loaded for printing (/engine/real
+    data_name / data_id); without a status reply nothing is evicted
+  - keeps objects/sources still referenced by a surviving message, and
+    interned entities (entity registry - shared by design)
+
+With a MessageCatalog, enforce() syncs it (incremental: the list is paged, only
+new / changed messages are fetched) and takes the survivors' references from
+it; only the victims are read back from the printer before they are deleted.
+Without one, every message is fetched with find_message(detail=1).
+
+Usage: python message_retention.py --cap 200 [--dry-run]
+       python message_retention.py --list
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from entity_registry import get_registry
+from message_catalog import get_catalog
+from orphan_gc import list_messages, message_references
+from sojet_client import SojetClient
+
+PRINTER_IP = "172.16.0.55"
+PRINTER_PORT = 9944
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+DEFAULT_PATH = os.path.join(STATE_DIR, "print_history.json")
+OBSERVE_RESOLUTION = 60  # s; status polls refresh a message's last use at most this often
+
+Printer = Tuple[str, int]
+
+
+class PrintHistory:
+    """Last print time per (printer, message name), saved as JSON."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._printers: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._printers = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            print(f"[WARN] Ignoring unreadable print history {path}: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _key(printer: Printer) -> str:
+        return f"{printer[0]}:{printer[1]}"
+
+    def entries(self, printer: Printer) -> Dict[str, Dict[str, Any]]:
+        return self._printers.setdefault(self._key(printer), {})
+
+    def record_print(self, printer: Printer, name: str, when: Optional[float] = None):
+        entry = self.entries(printer).setdefault(name, {"last_print": 0, "prints": 0})
+        entry["last_print"] = int(when or time.time())
+        entry["prints"] += 1
+        self._dirty = True
+
+    def observe(self, printer: Printer, status: Optional[Dict]) -> Optional[str]:
+        """Record the message named in an /engine/real reply as in use now; returns its name."""
+        name = (status or {}).get("data_name")
+        if not name or (status or {}).get("status") not in (None, "ok"):
+            return None
+        entry = self.entries(printer).setdefault(name, {"last_print": 0, "prints": 0})
+        now = int(time.time())
+        if now - entry["last_print"] >= OBSERVE_RESOLUTION:
+            entry["last_print"] = now
+            self._dirty = True
+        return name
+
+    def forget(self, printer: Printer, name: str):
+        if self.entries(printer).pop(name, None) is not None:
+            self._dirty = True
+
+    def last_print(self, printer: Printer, name: str) -> int:
+        return self._printers.get(self._key(printer), {}).get(name, {}).get("last_print", 0)
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._printers, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def last_used(history: PrintHistory, printer: Printer, message: Dict[str, Any]) -> int:
+    attr = message.get("attribute") or {}
+    return max(history.last_print(printer, message.get("name", "")),
+               int(attr.get("modified_time") or 0), int(attr.get("created_time") or 0))
+
+
+def plan_eviction(history: PrintHistory, printer: Printer, messages: List[Dict[str, Any]], cap: int,
+                  protected_ids: Set[int], protected_names: Set[str]) -> List[Dict[str, Any]]:
+    """Messages to evict (least recently used first) to get down to cap, never the protected ones."""
+    excess = len(messages) - max(0, cap)
+    if excess <= 0:
+        return []
+    candidates = [m for m in messages if m["id"] not in protected_ids and m.get("name") not in protected_names]
+    candidates.sort(key=lambda m: (last_used(history, printer, m), m["id"]))
+    return candidates[:excess]
+
+
+def enforce(client, cap: int, history: PrintHistory, dry_run: bool = False, window: int = 8, registry=None,
+            keep: Tuple[str, ...] = (), catalog=None) -> Dict[str, Any]:
+    """
+    Evict least-recently-printed messages beyond cap. Returns {"messages", "current", "evicted": [names],
+    "objects", "sources", "failed"}; raises RuntimeError when the printer state cannot be read.
+    catalog: MessageCatalog to read the messages and their references from (synced first).
+    """
+    printer = (client.host, client.port)
+    status = client.get_print_status()
+    if not status or status.get("status") not in (None, "ok"):
+        raise RuntimeError(f"Cannot read print status, not evicting: {status}")
+    current = history.observe(printer, status)
+    if catalog is not None:
+        synced = catalog.sync(client, window, history=history)
+        if synced["missing"]:
+            raise RuntimeError(f"Cannot read {synced['missing']} changed message(s) into the catalog, not evicting")
+        messages = catalog.messages(printer)
+    else:
+        messages = list_messages(client)
+    victims = plan_eviction(history, printer, messages, cap,
+                            {status.get("data_id")} - {None, 0}, {current, *keep} - {None})
+    result = {"messages": len(messages), "current": current, "evicted": [m["name"] for m in victims],
+              "objects": 0, "sources": 0, "failed": []}
+    if not victims:
+        history.save()
+        return result
+
+    victim_ids = {m["id"] for m in victims}
+    if catalog is not None:
+        refs = catalog.references(printer)
+        # What is deleted comes from the printer itself, not from the mirror
+        refs.update(message_references(client, sorted(victim_ids), window))
+    else:
+        refs = message_references(client, [m["id"] for m in messages], window)
+    kept_objects: Set[int] = set()
+    kept_sources: Set[Tuple[str, int]] = set()
+    for mid, (objects, sources) in refs.items():
+        if mid not in victim_ids:
+            kept_objects |= objects
+            kept_sources |= sources
+    if registry is not None:
+        for e in registry.entries(printer).values():
+            if e["kind"] == "object":
+                kept_objects.add(e["id"])
+            else:
+                kept_sources.add((e["type"], e["id"]))
+    objects = sorted(set().union(*(refs[i][0] for i in victim_ids)) - kept_objects)
+    sources = sorted(set().union(*(refs[i][1] for i in victim_ids)) - kept_sources)
+    result["objects"], result["sources"] = len(objects), len(sources)
+    if dry_run:
+        return result
+
+    for kind, items in (("message", victims), ("object", objects), ("source", sources)):
+        with client.pipeline(window) as p:
+            futs = []
+            for item in items:
+                if kind == "message":
+                    futs.append((item, p.delete_message(item["id"])))
+                elif kind == "object":
+                    futs.append((item, p.delete_object(item)))
+                else:
+                    futs.append((item, p.delete_source(item[1], item[0])))
+        for item, fut in futs:
+            r = fut.result()
+            if r and r.get("status") in (None, "ok"):
+                if kind == "message":
+                    history.forget(printer, item["name"])
+                    if catalog is not None:
+                        catalog.record_deleted(printer, item["id"])
+            else:
+                result["failed"].append((kind, item["id"] if kind == "message" else item, r))
+        if kind == "message" and result["failed"]:
+            break  # a message we could not delete still uses its objects
+    history.save()
+    return result
+
+
+_histories: Dict[str, PrintHistory] = {}
+
+
+def get_history(path: str = DEFAULT_PATH) -> PrintHistory:
+    """Process-wide print history per file (kept loaded by the print worker)."""
+    if path not in _histories:
+        _histories[path] = PrintHistory(path)
+    return _histories[path]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evict least-recently-printed messages beyond a cap")
+    ap.add_argument("--cap", type=int, help="Messages to keep on the printer")
+    ap.add_argument("--keep", action="append", default=[], metavar="NAME", help="Never evict this message")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--list", action="store_true", help="Show messages by last use, oldest first")
+    ap.add_argument("--host", default=PRINTER_IP)
+    ap.add_argument("--port", type=int, default=PRINTER_PORT)
+    args = ap.parse_args()
+    if args.cap is None and not args.list:
+        ap.print_help()
+        sys.exit(1)
+
+    client = SojetClient(args.host, args.port)
+    if not client.connect():
+        print(f"Error: cannot connect to {args.host}:{args.port}", file=sys.stderr)
+        sys.exit(1)
+
+    history = get_history()
+    printer = (args.host, args.port)
+    try:
+        if args.list:
+            current = history.observe(printer, client.get_print_status())
+            for m in sorted(list_messages(client), key=lambda m: last_used(history, printer, m)):
+                used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_used(history, printer, m)))
+                print(f"  {m['id']:<6} {m.get('name', ''):<32} {used}{'  (printing)' if m.get('name') == current else ''}")
+            history.save()
+            return
+        r = enforce(client, args.cap, history, args.dry_run, registry=get_registry(), keep=tuple(args.keep),
+                    catalog=get_catalog())
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.disconnect()
+
+    verb = "Would evict" if args.dry_run else "Evicted"
+    print(f"{r['messages']} messages, cap {args.cap}: {verb} {len(r['evicted'])} "
+          f"({r['objects']} objects, {r['sources']} sources)" + (f"; printing '{r['current']}'" if r["current"] else ""))
+    for name in r["evicted"]:
+        print(f"  {name}")
+    for kind, item, resp in r["failed"]:
+        print(f"  [FAIL] {kind} {item}: {resp}")
+    if r["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Garbage-collect sources and objects no message references.
+
+Failed builds and throwaway labels leave sources/objects on the printer that
+nothing points at; they take storage and slow down list / find calls. The
+printer has no list call for sources or objects, so the GC:
+  1. pages /data/list for every message and resolves each with a pipelined
+     find_message(detail=1) into the reachable object / source ids
+  2. gathers candidates: ids known locally (entity registry, build journals)
+     plus a pipelined find over the id range up to the highest id seen
+     (+ `slack`), for objects and each source type
+  3. lists the message catalogue again and drops anything a message created
+     meanwhile references, and anything newer than the first listing (an id
+     above every id it showed may belong to a build that is still running)
+  4. deletes what is left, objects before sources, pipelined, at most `rate`
+     requests per second, and forgets the deleted ids in the registry
+
+Entities recorded in an open build journal are left for
+`build_journal.py rollback` (the build may still be resumed).
+
+Usage: python orphan_gc.py --dry-run
+       python orphan_gc.py [--rate 50] [--scan-to 5000] [--host IP] [--port N]
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from build_journal import list_journals
+from entity_registry import get_registry
+from sojet_client import SojetClient
+
+PRINTER_IP = "172.16.0.55"
+PRINTER_PORT = 9944
+
+SOURCE_TYPES = ("text", "date", "counter")
+PAGE_SIZE = 10
+
+SourceRef = Tuple[str, int]  # (type, id)
+
+
+class RateLimiter:
+    """At most `rate` calls per second (None = unlimited); wait() before each call."""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = max(now, self._next) + self.interval
+
+
+def list_messages(client, page: int = PAGE_SIZE) -> List[Dict[str, Any]]:
+    """Every entry of /data/list ({"id", "name", "attribute"}), paged."""
+    messages, offset = [], 0
+    while True:
+        r = client.get_message_list(offset, page)
+        if not r or r.get("status") not in (None, "ok"):
+            raise RuntimeError(f"Message list failed at offset {offset}: {r}")
+        batch = r.get("data_list") or []
+        messages.extend(batch)
+        if len(batch) < page:
+            return messages
+        offset += page
+
+
+def message_references(client, message_ids: Iterable[int], window: int = 8,
+                       limiter: Optional[RateLimiter] = None) -> Dict[int, Tuple[Set[int], Set[SourceRef]]]:
+    """message id -> (object ids, (source type, id)s), from pipelined find_message(detail=1)."""
+    limiter = limiter or RateLimiter()
+    with client.pipeline(window) as p:
+        futs = []
+        for mid in message_ids:
+            limiter.wait()
+            futs.append((mid, p.find_message(mid, detail=1)))
+    refs = {}
+    for mid, fut in futs:
+        r = fut.result()
+        if not r or r.get("status") not in (None, "ok"):
+            raise RuntimeError(f"Cannot resolve message {mid}: {r}")
+        objects, sources = set(), set()
+        for obj in r.get("object_list", []):
+            objects.add(obj.get("id"))
+            for s in obj.get("source_list", []):
+                sources.add((s.get("type"), s.get("id")))
+        refs[mid] = (objects, sources)
+    return refs
+
+
+def probe_ids(client, ids: Iterable[int], window: int = 8, limiter: Optional[RateLimiter] = None,
+              source_types: Tuple[str, ...] = SOURCE_TYPES, objects: bool = True) -> Tuple[Set[int], Set[SourceRef]]:
+    """Which of ids exist on the printer as objects (if `objects`), and as sources of each type."""
+    limiter = limiter or RateLimiter()
+    with client.pipeline(window) as p:
+        futs = []
+        for i in ids:
+            if objects:
+                limiter.wait()
+                futs.append((None, i, p.find_object(i)))
+            for stype in source_types:
+                limiter.wait()
+                futs.append((stype, i, p.find_source(i, stype)))
+    found_objects, found_sources = set(), set()
+    for stype, i, fut in futs:
+        r = fut.result()
+        if not r or r.get("status") not in (None, "ok") or r.get("id", i) != i:
+            continue
+        if stype is None:
+            found_objects.add(i)
+        elif r.get("type", stype) == stype:
+            found_sources.add((stype, i))
+    return found_objects, found_sources
+
+
+def find_orphans(client, scan_to: Optional[int] = None, slack: int = 200, window: int = 8,
+                 limiter: Optional[RateLimiter] = None, registry=None) -> Dict[str, Any]:
+    """
+    Unreferenced objects / sources. Returns {"messages", "objects": [id], "sources": [(type, id)],
+    "journaled": count left to build_journal, "recent": count newer than the first message listing}.
+    """
+    limiter = limiter or RateLimiter()
+    printer = (client.host, client.port)
+    messages = list_messages(client)
+    refs = message_references(client, [m["id"] for m in messages], window, limiter)
+    reach_objects = set().union(*(o for o, _ in refs.values()))
+    reach_sources = set().union(*(s for _, s in refs.values()))
+    # Ids are handed out in increasing order: anything above this was created after the listing
+    horizon = max([m["id"] for m in messages] + list(reach_objects) + [i for _, i in reach_sources], default=0)
+
+    known_objects, known_sources = set(), set()
+    if registry is not None:
+        for e in registry.entries(printer).values():
+            if e["kind"] == "object":
+                known_objects.add(e["id"])
+            else:
+                known_sources.add((e["type"], e["id"]))
+    journaled_objects, journaled_sources = set(), set()
+    for j in list_journals():
+        if j.printer != printer:
+            continue
+        for (kind, _), rec in j.created.items():
+            if kind == "object":
+                journaled_objects.add(rec["id"])
+            elif kind == "source":
+                journaled_sources.add((rec["type"], rec["id"]))
+
+    top = scan_to
+    if top is None:
+        seen = [m["id"] for m in messages] + list(reach_objects) + [i for _, i in reach_sources]
+        seen += list(known_objects) + [i for _, i in known_sources]
+        top = max(seen, default=0) + slack
+    found_objects, found_sources = probe_ids(client, range(1, top + 1), window, limiter)
+    # Ids known locally but above the scanned range
+    high_objects, _ = probe_ids(client, sorted(i for i in known_objects if i > top), window, limiter, ())
+    found_objects |= high_objects
+    for stype in SOURCE_TYPES:
+        _, high_sources = probe_ids(client, sorted(i for t, i in known_sources if t == stype and i > top),
+                                    window, limiter, (stype,), objects=False)
+        found_sources |= high_sources
+
+    # Messages created while we were scanning keep their entities
+    current = list_messages(client)
+    new_ids = [m["id"] for m in current if m["id"] not in refs]
+    for objects, sources in message_references(client, new_ids, window, limiter).values():
+        reach_objects |= objects
+        reach_sources |= sources
+
+    orphan_objects = found_objects - reach_objects
+    orphan_sources = found_sources - reach_sources
+    journaled = len(orphan_objects & journaled_objects) + len(orphan_sources & journaled_sources)
+    orphan_objects -= journaled_objects
+    orphan_sources -= journaled_sources
+    recent_objects = {i for i in orphan_objects if i > horizon}
+    recent_sources = {s for s in orphan_sources if s[1] > horizon}
+    return {
+        "messages": len(current),
+        "scanned": top,
+        "objects": sorted(orphan_objects - recent_objects),
+        "sources": sorted(orphan_sources - recent_sources),
+        "journaled": journaled,
+        "recent": len(recent_objects) + len(recent_sources),
+    }
+
+
+def delete_orphans(client, orphans: Dict[str, Any], window: int = 8, limiter: Optional[RateLimiter] = None,
+                   registry=None) -> Dict[str, Any]:
+    """Delete orphans["objects"], then orphans["sources"]; returns {"objects", "sources", "failed"}."""
+    limiter = limiter or RateLimiter()
+    printer = (client.host, client.port)
+    deleted = {"objects": 0, "sources": 0, "failed": []}
+    for kind in ("objects", "sources"):
+        with client.pipeline(window) as p:
+            futs = []
+            for item in orphans[kind]:
+                limiter.wait()
+                if kind == "objects":
+                    futs.append((item, p.delete_object(item)))
+                else:
+                    futs.append((item, p.delete_source(item[1], item[0])))
+        for item, fut in futs:
+            r = fut.result()
+            if r and r.get("status") in (None, "ok"):
+                deleted[kind] += 1
+                if registry is not None:
+                    registry.invalidate(printer, kind[:-1], item if kind == "objects" else item[1])
+            else:
+                deleted["failed"].append((kind[:-1], item, r))
+    if registry is not None:
+        registry.save()
+    return deleted
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Delete sources / objects that no message references")
+    ap.add_argument("--host", default=PRINTER_IP)
+    ap.add_argument("--port", type=int, default=PRINTER_PORT)
+    ap.add_argument("--dry-run", action="store_true", help="Only list what would be deleted")
+    ap.add_argument("--rate", type=float, default=50.0, help="Max requests per second (0 = unlimited)")
+    ap.add_argument("--window", type=int, default=8, help="Requests in flight")
+    ap.add_argument("--scan-to", type=int, help="Probe ids 1..N (default: highest id seen + --slack)")
+    ap.add_argument("--slack", type=int, default=200)
+    args = ap.parse_args()
+
+    client = SojetClient(args.host, args.port)
+    if not client.connect():
+        print(f"Error: cannot connect to {args.host}:{args.port}", file=sys.stderr)
+        sys.exit(1)
+
+    limiter = RateLimiter(args.rate or None)
+    registry = get_registry()
+    try:
+        orphans = find_orphans(client, args.scan_to, args.slack, args.window, limiter, registry)
+        print(f"{orphans['messages']} messages, ids 1..{orphans['scanned']} scanned: "
+              f"{len(orphans['objects'])} orphan objects, {len(orphans['sources'])} orphan sources"
+              f" ({orphans['journaled']} left to build_journal.py, {orphans['recent']} too recent)")
+        if args.dry_run:
+            for oid in orphans["objects"]:
+                print(f"  object {oid}")
+            for stype, sid in orphans["sources"]:
+                print(f"  source {sid} ({stype})")
+            return
+        result = delete_orphans(client, orphans, args.window, limiter, registry)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.disconnect()
+
+    print(f"[OK] Deleted {result['objects']} objects, {result['sources']} sources")
+    for kind, item, r in result["failed"]:
+        print(f"  [FAIL] {kind} {item}: {r}")
+    if result["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
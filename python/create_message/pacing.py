@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Adaptive pacing between protocol calls.
+
+The builder scripts used to sleep a fixed 0.3-1 s after every create. The
+printer does not need that when it is keeping up, so AdaptivePacer only
+delays when the printer shows pressure:
+  - no reply (timeout, dropped connection) doubles the delay, starting at
+    `error_delay`; an "Error" status is the outcome of that command (missing
+    id, bad attribute), not load, and counts as a normal reply
+  - a reply slower than `slow_factor` x the running baseline latency sets
+    the delay to the excess latency
+  - every normal reply halves the delay until it drops back to zero
+
+SojetClient paces every send itself; the raw-socket scripts decorate their
+send_command with @paced.
+"""
+
+import functools
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def response_ok(r: Optional[Dict[str, Any]]) -> bool:
+    """True if the printer answered at all; error statuses are not pressure."""
+    return bool(r)
+
+
+class AdaptivePacer:
+    """Tracks response latency / errors and returns the delay to apply before the next call."""
+
+    def __init__(
+        self,
+        slow_factor: float = 3.0,
+        error_delay: float = 0.1,
+        max_delay: float = 2.0,
+        alpha: float = 0.2,
+        min_baseline: float = 0.005,
+    ):
+        self.slow_factor = slow_factor
+        self.error_delay = error_delay
+        self.max_delay = max_delay
+        self.alpha = alpha
+        self.min_baseline = min_baseline
+        self.baseline: Optional[float] = None  # EWMA of normal response latency (s)
+        self.delay = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def wait(self):
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def record(self, latency: Optional[float], ok: bool):
+        """Feed one call's outcome. latency may be None when it is not meaningful (pipelined)."""
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+            self.delay = min(self.max_delay, max(self.error_delay, self.delay * 2))
+            return
+        if latency is None:
+            self.delay /= 2
+        elif self.baseline is not None and latency > self.slow_factor * max(self.baseline, self.min_baseline):
+            # Slow reply: back off by the excess, but don't let it drag the baseline up
+            self.delay = min(self.max_delay, latency - self.baseline)
+        else:
+            self.baseline = latency if self.baseline is None else (
+                self.alpha * latency + (1 - self.alpha) * self.baseline
+            )
+            self.delay /= 2
+        if self.delay < 0.001:
+            self.delay = 0.0
+
+    def call(self, fn: Callable[..., Optional[Dict[str, Any]]], *args, **kwargs):
+        """wait(), run fn, record its latency and whether the reply was ok; return the reply."""
+        self.wait()
+        t0 = time.perf_counter()
+        r = fn(*args, **kwargs)
+        self.record(time.perf_counter() - t0, response_ok(r))
+        return r
+
+
+def paced(send: Callable[..., Optional[Dict[str, Any]]]) -> Callable[..., Optional[Dict[str, Any]]]:
+    """Decorator for a raw-socket send_command: every call goes through one AdaptivePacer (.pacer)."""
+    pacer = AdaptivePacer()
+
+    @functools.wraps(send)
+    def wrapper(*args, **kwargs):
+        return pacer.call(send, *args, **kwargs)
+
+    wrapper.pacer = pacer
+    return wrapper
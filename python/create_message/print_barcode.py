@@ -4,6 +4,9 @@ import time
 import base64
 import io
 
+from framing import framer_for
+from pacing import paced
+
 try:
     import barcode
     from barcode.writer import ImageWriter
@@ -22,6 +25,7 @@ except ImportError:
 printer_ip = "172.16.0.55"
 port = 9944
 
+@paced
 def send_command(socket_obj, command_dict):
     """Send a command and wait for response"""
     cmd_str = json.dumps(command_dict) + '\r\n'
@@ -30,7 +34,7 @@ def send_command(socket_obj, command_dict):
     
     try:
         socket_obj.settimeout(5)
-        response = socket_obj.recv(4096)
+        response = framer_for(socket_obj).read_line() or b''
         response_str = response.decode(errors='ignore').strip()
         print(f"[INFO] Response: {response_str}")
         return json.loads(response_str)
@@ -99,8 +103,6 @@ def upload_and_print(socket_obj, image_bytes, content, code_type):
         print("[ERROR] Failed to upload image!")
         return False
     
-    time.sleep(1)
-    
     # Start print job
     print(f"\n[STEP 2] Starting print job for: {image_name}")
     print_cmd = {
@@ -3,6 +3,8 @@ import json
 import time
 from datetime import datetime
 
+from framing import framer_for
+
 printer_ip = "172.16.0.55"
 port = 9944
 
@@ -13,7 +15,7 @@ def send_command(socket_obj, command_dict):
     
     try:
         socket_obj.settimeout(5)
-        response = socket_obj.recv(4096)
+        response = framer_for(socket_obj).read_line() or b''
         response_str = response.decode(errors='ignore').strip()
         return json.loads(response_str)
     except socket.timeout:
@@ -1,6 +1,8 @@
 import socket
 import time
 
+from framing import framer_for
+
 printer_ip = "172.16.0.55"
 port = 9944
 
@@ -37,7 +39,7 @@ try:
             print("[INFO] Command sent.")
             try:
                 s.settimeout(5)
-                response = s.recv(4096)
+                response = framer_for(s).read_line() or b''
                 print("[INFO] Response:", response.decode(errors='ignore'))
             except socket.timeout:
                 print("[WARN] No response received.")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Randomized, collision-free GS1 AI(21) serial numbers in bulk.
+
+Serial i of a GTIN/batch is a keyed permutation of i over the serial space
+(alphabet ** digits): an FF1-style Feistel network that splits the number into
+two digit halves and adds the round function modulo alphabet ** half, so every
+output is already in range. Distinct indexes always give distinct serials,
+so nothing has to be stored or re-checked - only the next index to hand out.
+The round key is derived from the secret + GTIN + batch (keyed BLAKE2b), so
+serials are not guessable and differ per batch.
+
+Usage: python serial_generator.py --secret KEY --gtin 08961101532710 --batch 153A26 --count 100000
+       python serial_generator.py --secret KEY --gtin ... --batch ... --count 1000000 | python dynamic_feeder.py -
+       python serial_generator.py --secret KEY --gtin ... --batch ... --benchmark 200000
+       (--secret may also come from SOJET_SERIAL_SECRET)
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from typing import Iterator, List, Optional
+
+DIGITS = "0123456789"
+AI21_MAX_LEN = 20
+ROUNDS = 8  # must be even
+
+
+class SerialGenerator:
+    """serial(i) for i in [0, capacity): a keyed permutation, zero-padded in `alphabet`."""
+
+    def __init__(self, secret, gtin: str, batch: str, digits: int = 13, alphabet: str = DIGITS, prefix: str = ""):
+        if len(prefix) + digits > AI21_MAX_LEN:
+            raise ValueError(f"prefix + {digits} digits exceeds the {AI21_MAX_LEN}-character AI(21) limit")
+        if len(set(alphabet)) != len(alphabet) or len(alphabet) < 2:
+            raise ValueError("alphabet needs at least 2 distinct characters")
+        secret = secret.encode("utf-8") if isinstance(secret, str) else secret
+        if not secret:
+            raise ValueError("secret is required")
+        self.gtin = gtin
+        self.batch = batch
+        self.digits = digits
+        self.alphabet = alphabet
+        self.prefix = prefix
+        self.capacity = len(alphabet) ** digits
+
+        base = len(alphabet)
+        u = digits // 2
+        v = digits - u
+        self._mod_u, self._mod_v = base ** u, base ** v
+        self._nbytes = max(1, ((base ** v - 1).bit_length() + 7) // 8)
+        master = hashlib.blake2b(f"{gtin}|{batch}".encode("utf-8"), key=secret[:64], digest_size=32).digest()
+        # Keyed BLAKE2b state per round; 16-byte output keeps the modulo bias negligible
+        self._rounds = [
+            hashlib.blake2b(key=hashlib.blake2b(bytes([r]), key=master, digest_size=16).digest(), digest_size=16)
+            for r in range(ROUNDS)
+        ]
+        self._decimal = alphabet == DIGITS
+
+    def permute(self, index: int) -> int:
+        if not 0 <= index < self.capacity:
+            raise IndexError(f"serial index {index} outside 0..{self.capacity - 1}")
+        mod_u, mod_v, nbytes = self._mod_u, self._mod_v, self._nbytes
+        from_bytes = int.from_bytes
+        a, b = divmod(index, mod_v)  # a: u digits, b: v digits
+        for r, state in enumerate(self._rounds):
+            h = state.copy()
+            h.update(b.to_bytes(nbytes, "big"))
+            a, b = b, (a + from_bytes(h.digest(), "big")) % (mod_u if r % 2 == 0 else mod_v)
+        return a * mod_v + b  # ROUNDS is even, so a/b are back to u/v digits
+
+    def encode(self, value: int) -> str:
+        if self._decimal:
+            return f"{self.prefix}{value:0{self.digits}d}"
+        base = len(self.alphabet)
+        out = []
+        for _ in range(self.digits):
+            value, d = divmod(value, base)
+            out.append(self.alphabet[d])
+        return self.prefix + "".join(reversed(out))
+
+    def serial(self, index: int) -> str:
+        return self.encode(self.permute(index))
+
+    def iter_serials(self, start: int = 0, count: Optional[int] = None) -> Iterator[str]:
+        stop = self.capacity if count is None else min(self.capacity, start + count)
+        permute, encode = self.permute, self.encode
+        for i in range(start, stop):
+            yield encode(permute(i))
+
+    def chunks(self, start: int = 0, count: Optional[int] = None, size: int = 10000) -> Iterator[List[str]]:
+        """Serials in lists of `size`, for the dynamic feeder / bulk label CLI; resume with start=next index."""
+        chunk = []
+        for s in self.iter_serials(start, count):
+            chunk.append(s)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def benchmark(gen: SerialGenerator, count: int) -> float:
+    """Serials per second over `count` serials."""
+    t0 = time.perf_counter()
+    for _ in gen.iter_serials(0, count):
+        pass
+    return count / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate randomized, collision-free GS1 AI(21) serials")
+    ap.add_argument("--secret", default=os.environ.get("SOJET_SERIAL_SECRET"), help="Permutation key")
+    ap.add_argument("--gtin", required=True)
+    ap.add_argument("--batch", required=True)
+    ap.add_argument("--digits", type=int, default=13, help="Random part length (default 13)")
+    ap.add_argument("--prefix", default="", help="Fixed serial prefix")
+    ap.add_argument("--start", type=int, default=0, help="First index (resume point)")
+    ap.add_argument("--count", type=int, default=1000)
+    ap.add_argument("--chunk", type=int, default=10000, help="Serials per write")
+    ap.add_argument("--out", help="Output file (default stdout)")
+    ap.add_argument("--benchmark", type=int, metavar="N", help="Time N serials and report serials/second")
+    args = ap.parse_args()
+
+    if not args.secret:
+        print("Error: --secret (or SOJET_SERIAL_SECRET) required", file=sys.stderr)
+        sys.exit(1)
+    try:
+        gen = SerialGenerator(args.secret, args.gtin, args.batch, args.digits, prefix=args.prefix)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.benchmark:
+        print(f"{benchmark(gen, args.benchmark):,.0f} serials/s ({args.benchmark} serials, capacity {gen.capacity:,})")
+        return
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for chunk in gen.chunks(args.start, args.count, args.chunk):
+            out.write("\n".join(chunk) + "\n")
+    except BrokenPipeError:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"next index: {args.start + args.count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
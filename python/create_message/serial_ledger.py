@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Ledger of printed (GTIN, SN) pairs with fast duplicate detection.
+
+Layout (state/ledger/):
+  log.txt        append-only "GTIN<TAB>SN" lines - the record of what was printed
+  run-NNNNNN.idx sorted 16-byte BLAKE2b digests of (GTIN, SN), memory-mapped and
+                 binary-searched, so lookups are O(log n) without loading them
+  bloom.bin      Bloom filter over every digest; most new serials are rejected as
+                 "not seen" without touching the runs
+  manifest.json  runs, entry count, and how far into log.txt the runs cover
+
+New entries go to the log and an in-memory set (the memtable); every
+`memtable_limit` entries the set is written out as a new sorted run, and once
+there are more than `max_runs` runs they are merged into one. Entries in the log
+past the manifest offset are replayed into the memtable on open. Processes
+sharing the directory serialize on LOCK and pick up each other's entries before
+every check or add.
+
+Usage: python serial_ledger.py check <gtin> <sn> [<sn> ...]
+       python serial_ledger.py add <gtin> <sn> [<sn> ...]
+       python serial_ledger.py import <gtin> <file>      (one SN per line)
+       python serial_ledger.py stats | compact
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import sys
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from file_lock import FileLock
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+DEFAULT_DIR = os.path.join(STATE_DIR, "ledger")
+DIGEST_SIZE = 16
+
+
+def serial_digest(gtin: str, sn: str) -> bytes:
+    return hashlib.blake2b(f"{gtin}\x1d{sn}".encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def _atomic_write(path: str, data: bytes):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter keyed by digests (positions come from the digest bytes)."""
+
+    def __init__(self, capacity: int, bits_per_entry: int = 10, hashes: int = 7, data: Optional[bytearray] = None):
+        self.nbits = max(8, capacity * bits_per_entry)
+        self.hashes = hashes
+        self.bits = data if data is not None and len(data) * 8 >= self.nbits else bytearray((self.nbits + 7) // 8)
+        self.nbits = len(self.bits) * 8
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.nbits
+
+    def add(self, digest: bytes):
+        for p in self._positions(digest):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+
+class SortedRun:
+    """A memory-mapped file of sorted fixed-size digests."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = os.path.getsize(path) // DIGEST_SIZE
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def __contains__(self, digest: bytes) -> bool:
+        lo, hi, mm = 0, self.count, self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = mid * DIGEST_SIZE
+            probe = mm[off:off + DIGEST_SIZE]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for off in range(0, self.count * DIGEST_SIZE, DIGEST_SIZE):
+            yield self._mm[off:off + DIGEST_SIZE]
+
+    def close(self):
+        if self._mm:
+            self._mm.close()
+        self._file.close()
+
+
+class SerialLedger:
+    """
+    Append-only record of printed (GTIN, SN) pairs; add() refuses duplicates.
+
+    Several processes may hold the same ledger open (print worker, bulk_labels,
+    dynamic_feeder). Every operation runs under an exclusive lock on LOCK and
+    first catches up with what the others wrote: new log lines go into the
+    memtable, and a changed manifest (another process flushed or compacted)
+    reopens the runs and Bloom filter.
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR, bloom_capacity: int = 20_000_000,
+                 memtable_limit: int = 200_000, max_runs: int = 8):
+        self.path = path
+        self.bloom_capacity = bloom_capacity
+        self.memtable_limit = memtable_limit
+        self.max_runs = max_runs
+        os.makedirs(path, exist_ok=True)
+        self._manifest_path = os.path.join(path, "manifest.json")
+        self._bloom_path = os.path.join(path, "bloom.bin")
+        self._log_path = os.path.join(path, "log.txt")
+        self._lock = FileLock(os.path.join(path, "LOCK"))
+
+        self.manifest: Optional[Dict] = None
+        self._manifest_stamp = None
+        self.runs: List[SortedRun] = []
+        self.memtable = set()
+        self.bloom: Optional[BloomFilter] = None
+        self._replayed = 0  # log offset read into the memtable so far
+        self._log = open(self._log_path, "a+b")
+        with self._lock:
+            self._sync()
+
+    # --- open / recovery ---
+    def _read_manifest(self) -> Dict:
+        manifest = {"runs": [], "count": 0, "log_offset": 0, "next_run": 1, "bloom_capacity": self.bloom_capacity}
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        return manifest
+
+    def _stat_manifest(self):
+        try:
+            st = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _sync(self):
+        """Catch up with other processes' writes (call with the lock held)."""
+        stamp = self._stat_manifest()
+        if self.manifest is None or stamp != self._manifest_stamp:
+            old, self.manifest = self.manifest, self._read_manifest()
+            self._manifest_stamp = stamp
+            if old is None or old["runs"] != self.manifest["runs"] or old["log_offset"] != self.manifest["log_offset"]:
+                self._open_runs()
+                self.bloom = self._load_bloom()
+                self.memtable = set()
+                self._replayed = self.manifest["log_offset"]
+        self._replay_log()
+
+    def _open_runs(self):
+        opened = {run.path: run for run in self.runs}
+        self.runs = []
+        for name in self.manifest["runs"]:
+            path = os.path.join(self.path, name)
+            self.runs.append(opened.pop(path, None) or SortedRun(path))
+        for run in opened.values():
+            run.close()
+
+    def _load_bloom(self) -> BloomFilter:
+        capacity = self.manifest["bloom_capacity"]
+        try:
+            with open(self._bloom_path, "rb") as f:
+                data = bytearray(f.read())
+            bloom = BloomFilter(capacity, data=data)
+            if len(data) * 8 == bloom.nbits and self.manifest.get("bloom_count") == self.manifest["count"]:
+                return bloom
+        except FileNotFoundError:
+            pass
+        # Missing or stale: rebuild from the runs (streamed, one digest at a time)
+        bloom = BloomFilter(capacity)
+        for run in self.runs:
+            for digest in run:
+                bloom.add(digest)
+        return bloom
+
+    def _replay_log(self):
+        self._log.seek(self._replayed)
+        for line in self._log:
+            gtin, _, sn = line.decode("utf-8").rstrip("\n").partition("\t")
+            digest = serial_digest(gtin, sn)
+            self.memtable.add(digest)
+            self.bloom.add(digest)
+        self._replayed = self._log.tell()
+
+    # --- queries ---
+    def _seen(self, digest: bytes) -> bool:
+        if digest not in self.bloom:
+            return False
+        return digest in self.memtable or any(digest in run for run in reversed(self.runs))
+
+    def contains(self, gtin: str, sn: str) -> bool:
+        with self._lock:
+            self._sync()
+            return self._seen(serial_digest(gtin, sn))
+
+    def contains_many(self, gtin: str, serials: Iterable[str]) -> List[bool]:
+        """contains() for each serial, under one lock."""
+        with self._lock:
+            self._sync()
+            return [self._seen(serial_digest(gtin, sn)) for sn in serials]
+
+    def __len__(self) -> int:
+        return self.manifest["count"] + len(self.memtable)
+
+    # --- updates ---
+    def add(self, gtin: str, sn: str) -> bool:
+        """Record one serial; False (and nothing recorded) if it was already printed."""
+        return not self.add_many(gtin, [sn])
+
+    def add_many(self, gtin: str, serials: Iterable[str]) -> List[str]:
+        """
+        Record the serials that are new (one fsync); return the duplicates, which are not
+        recorded. A serial repeated within `serials` is recorded once; later copies are duplicates.
+        """
+        with self._lock:
+            self._sync()
+            duplicates, lines = [], []
+            for sn in serials:
+                digest = serial_digest(gtin, sn)
+                if self._seen(digest):
+                    duplicates.append(sn)
+                    continue
+                self.memtable.add(digest)
+                self.bloom.add(digest)
+                lines.append(f"{gtin}\t{sn}\n")
+            if lines:
+                self._log.seek(0, os.SEEK_END)
+                self._log.write("".join(lines).encode("utf-8"))
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._replayed = self._log.tell()
+                if len(self.memtable) >= self.memtable_limit:
+                    self.flush()
+            return duplicates
+
+    def flush(self):
+        """Write the memtable out as a sorted run and checkpoint the manifest."""
+        with self._lock:
+            self._sync()
+            if self._replayed == self.manifest["log_offset"] and \
+                    self.manifest.get("bloom_count") == self.manifest["count"]:
+                return  # nothing new since the last checkpoint; don't rewrite the Bloom filter
+            if self.memtable:
+                name = f"run-{self.manifest['next_run']:06d}.idx"
+                _atomic_write(os.path.join(self.path, name), b"".join(sorted(self.memtable)))
+                self.runs.append(SortedRun(os.path.join(self.path, name)))
+                self.manifest["runs"].append(name)
+                self.manifest["next_run"] += 1
+                self.manifest["count"] += len(self.memtable)
+                self.memtable = set()
+            self.manifest["log_offset"] = self._replayed
+            if len(self.runs) > self.max_runs:
+                self.compact()
+            self._save_manifest()
+
+    def compact(self):
+        """Merge every run into one (streaming k-way merge over the mmapped runs)."""
+        with self._lock:
+            self._sync()
+            if len(self.runs) < 2:
+                return
+            name = f"run-{self.manifest['next_run']:06d}.idx"
+            target = os.path.join(self.path, name)
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                buf = []
+                for digest in heapq.merge(*self.runs):
+                    buf.append(digest)
+                    if len(buf) >= 65536:
+                        f.write(b"".join(buf))
+                        buf = []
+                f.write(b"".join(buf))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+            old = self.runs
+            self.runs = [SortedRun(target)]
+            self.manifest["runs"] = [name]
+            self.manifest["next_run"] += 1
+            self._save_manifest()
+            for run in old:
+                run.close()
+                try:
+                    os.remove(run.path)
+                except OSError:
+                    pass  # still mapped by another process (Windows); no longer in the manifest
+
+    def _save_manifest(self):
+        _atomic_write(self._bloom_path, bytes(self.bloom.bits))
+        self.manifest["bloom_count"] = self.manifest["count"]
+        _atomic_write(self._manifest_path, json.dumps(self.manifest, indent=1).encode("utf-8"))
+        self._manifest_stamp = self._stat_manifest()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._sync()
+            return {"entries": len(self), "runs": len(self.runs), "memtable": len(self.memtable),
+                    "bloom_bytes": len(self.bloom.bits)}
+
+    def close(self):
+        self.flush()
+        self._log.close()
+        for run in self.runs:
+            run.close()
+        self._lock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_ledgers: Dict[str, SerialLedger] = {}
+
+
+def get_ledger(path: str = DEFAULT_DIR) -> SerialLedger:
+    """Process-wide ledger per directory (kept open by the print worker)."""
+    if path not in _ledgers:
+        _ledgers[path] = SerialLedger(path)
+    return _ledgers[path]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Printed-serial ledger: duplicate checks for (GTIN, SN)")
+    ap.add_argument("command", choices=("check", "add", "import", "stats", "compact"))
+    ap.add_argument("args", nargs="*")
+    ap.add_argument("--path", default=DEFAULT_DIR)
+    args = ap.parse_args()
+
+    with SerialLedger(args.path) as ledger:
+        if args.command == "stats":
+            print(json.dumps(ledger.stats()))
+        elif args.command == "compact":
+            ledger.flush()
+            ledger.compact()
+            print(json.dumps(ledger.stats()))
+        elif len(args.args) < 2:
+            print(f"Usage: serial_ledger.py {args.command} <gtin> <sn|file> ...", file=sys.stderr)
+            sys.exit(1)
+        elif args.command == "check":
+            gtin = args.args[0]
+            for sn in args.args[1:]:
+                print(f"{sn}: {'PRINTED' if ledger.contains(gtin, sn) else 'new'}")
+        else:
+            gtin = args.args[0]
+            if args.command == "import":
+                with open(args.args[1], "r", encoding="utf-8") as f:
+                    serials = [line.strip() for line in f if line.strip()]
+            else:
+                serials = args.args[1:]
+            duplicates = []
+            for i in range(0, len(serials), 100_000):
+                duplicates += ledger.add_many(gtin, serials[i:i + 100_000])
+            print(f"Added {len(serials) - len(duplicates)}, duplicates {len(duplicates)}")
+            for sn in duplicates[:20]:
+                print(f"  duplicate: {sn}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,35 @@ IP: 172.16.0.55, Port: 9944
 """
 
 import socket
-import json
 import time
+from collections import deque
 from typing import Dict, List, Optional, Any
 
+from framing import LineFramer, encode_request
+from pacing import AdaptivePacer, response_ok
+
 
 class SojetClient:
     """Client for all Sojet printer TCP-JSON protocol actions."""
     
-    def __init__(self, host: str = "172.16.0.55", port: int = 9944, timeout: int = 10):
+    def __init__(self, host: str = "172.16.0.55", port: int = 9944, timeout: int = 10,
+                 pacer: Optional[AdaptivePacer] = None):
         self.host = host
         self.port = port
         self.timeout = timeout
+        self.pacer = pacer or AdaptivePacer()
         self.socket = None
+        self.framer = None
+        self._last_hash = 0
 
     def connect(self) -> bool:
+        if self.socket:
+            self.disconnect()
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(self.timeout)
             self.socket.connect((self.host, self.port))
+            self.framer = LineFramer(self.socket)
             return True
         except socket.error as e:
             print(f"Connection error: {e}")
@@ -33,29 +43,39 @@ class SojetClient:
         if self.socket:
             self.socket.close()
             self.socket = None
+            self.framer = None
 
     def send(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         if not self.socket:
             return None
+        self.pacer.wait()
+        t0 = time.perf_counter()
         try:
-            msg = json.dumps(request, separators=(',', ':')) + '\r\n'
-            self.socket.sendall(msg.encode('utf-8'))
-            data = b''
-            while True:
-                chunk = self.socket.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if data.endswith(b'\r\n'):
-                    break
-            s = data.decode('utf-8').strip()
-            return json.loads(s) if s else None
+            self.socket.sendall(encode_request(request))
+            r = self.framer.read_json()
         except Exception as e:
             print(f"Send error: {e}")
+            self.framer.reset()
+            self.pacer.record(None, False)
             return None
+        self.pacer.record(time.perf_counter() - t0, response_ok(r))
+        return r
 
     def _hash(self) -> int:
-        return int(time.time() * 1000) % 10000000
+        # Millisecond clock, bumped so back-to-back (pipelined) requests never share a hash
+        h = int(time.time() * 1000) % 10000000
+        if h <= self._last_hash < h + 1000:
+            h = self._last_hash + 1
+        self._last_hash = h
+        return h
+
+    def pipeline(self, window: int = 8) -> "SojetPipeline":
+        """
+        Pipelined view of this connection: protocol methods return a ResponseFuture
+        immediately, with at most `window` requests awaiting a response.
+        Use as a context manager to flush on exit.
+        """
+        return SojetPipeline(self, window)
 
     # --- 1. Print Control ---
     def start_print(self, message_name: str) -> Optional[Dict]:
@@ -252,16 +272,20 @@ class SojetClient:
         if not msg or msg.get("status") == "Error":
             return None
         objects = msg.get("object_list", [])
-        sources = []
+        pending = []
         seen = set()
-        for obj in objects:
-            for s in obj.get("source_list", []):
-                sid, styp = s.get("id"), s.get("type")
-                if sid is None or not styp or (sid, styp) in seen:
-                    continue
-                seen.add((sid, styp))
-                src = self.find_source(sid, styp)
-                sources.append(src if src and src.get("status") != "Error" else {"id": sid, "type": styp, "error": "not found"})
+        with self.pipeline() as p:
+            for obj in objects:
+                for s in obj.get("source_list", []):
+                    sid, styp = s.get("id"), s.get("type")
+                    if sid is None or not styp or (sid, styp) in seen:
+                        continue
+                    seen.add((sid, styp))
+                    pending.append((sid, styp, p.find_source(sid, styp)))
+        sources = []
+        for sid, styp, fut in pending:
+            src = fut.result()
+            sources.append(src if src and src.get("status") != "Error" else {"id": sid, "type": styp, "error": "not found"})
         return {"message": msg, "objects": objects, "sources": sources}
 
     def get_message_list(self, offset: int = 0, num: int = 10) -> Optional[Dict]:
@@ -306,3 +330,118 @@ class SojetClient:
             "request_type": "post", "path": "/engine/download_image",
             "parm": parm, "size": len(content_b64), "name": name, "content": content_b64
         })
+
+
+class ResponseFuture:
+    """Response slot for one pipelined request, filled in FIFO order."""
+
+    def __init__(self, pipeline: "SojetPipeline", request: Dict[str, Any]):
+        self.request = request
+        self._pipeline = pipeline
+        self._done = False
+        self._response = None
+
+    def done(self) -> bool:
+        return self._done
+
+    def set_result(self, response: Optional[Dict[str, Any]]):
+        self._response = response
+        self._done = True
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Block until this response has arrived (reading any earlier ones first)."""
+        while not self._done:
+            if not self._pipeline.read_one():
+                break
+        return self._response
+
+
+class SojetPipeline(SojetClient):
+    """
+    Pipelined requests on an already-connected SojetClient.
+
+    Every protocol method writes its request straight away and returns a
+    ResponseFuture. The printer answers in request order on the one socket, so
+    responses are matched FIFO. At most `window` requests are in flight; a new
+    request first reads the oldest response when the window is full.
+    On a socket error or timeout all outstanding futures resolve to None and
+    the connection is closed, so later requests fail until connect() is called.
+    """
+
+    def __init__(self, client: SojetClient, window: int = 8):
+        super().__init__(client.host, client.port, client.timeout, client.pacer)
+        self.client = client
+        self.socket = client.socket
+        self.framer = client.framer
+        self.window = max(1, window)
+        self._inflight = deque()
+
+    def connect(self) -> bool:
+        # Replies still owed by the old socket never arrive; drop them with its buffered bytes
+        self._fail_all()
+        ok = self.client.connect()
+        self.socket = self.client.socket
+        self.framer = self.client.framer
+        return ok
+
+    def disconnect(self):
+        self.flush()
+        self.client.disconnect()
+        self.socket = self.framer = None
+
+    def _hash(self) -> int:
+        return self.client._hash()
+
+    def _fail_all(self):
+        while self._inflight:
+            self._inflight.popleft().set_result(None)
+        # Replies still owed would be matched to later requests; drop the connection instead
+        self.client.disconnect()
+        self.socket = self.framer = None
+
+    def send(self, request: Dict[str, Any]) -> ResponseFuture:
+        fut = ResponseFuture(self, request)
+        if not self.socket:
+            fut.set_result(None)
+            return fut
+        while len(self._inflight) >= self.window:
+            self.read_one()
+        self.pacer.wait()
+        try:
+            self.socket.sendall(encode_request(request))
+        except Exception as e:
+            print(f"Send error: {e}")
+            self._fail_all()
+            fut.set_result(None)
+            return fut
+        self._inflight.append(fut)
+        return fut
+
+    def read_one(self) -> bool:
+        """Read one response and resolve the oldest in-flight future. False if nothing is pending."""
+        if not self._inflight:
+            return False
+        try:
+            response = self.framer.read_json()
+        except Exception as e:
+            print(f"Receive error: {e}")
+            self._fail_all()
+            return True
+        self._inflight.popleft().set_result(response)
+        self.pacer.record(None, response_ok(response))
+        return True
+
+    def flush(self):
+        """Wait for every in-flight response."""
+        while self.read_one():
+            pass
+
+    def get_message_with_sources(self, message_id: int) -> Optional[Dict]:
+        self.flush()
+        return self.client.get_message_with_sources(message_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
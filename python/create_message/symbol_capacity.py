@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Local Data Matrix (ECC200) / QR capacity and symbol-size estimator.
+
+The payload grows with batch and SN, but a barcode style has a fixed box (w/h).
+estimate() picks the smallest symbol that holds the payload, from precomputed
+capacity tables, and reports the module size the box leaves for it - so a
+builder can refuse (or resize) before spending any round trips on a code the
+printer cannot render legibly.
+
+estimate_for_style() reads a barcode object style: the human-readable line
+(font height + text_margin) is taken off the box, and the style's x_dimension
+(units per module) must fit what is left. When it does not, the result carries
+the largest x_dimension that does, plus the symbol size (extras.dm_size /
+qr_ver), and fitted_style() writes both into a copy of the style.
+
+Codeword counts follow the ECC200 ASCII encodation (digit pairs pack into one
+codeword, FNC1 for GS1) and QR numeric / alphanumeric / byte segments (FNC1
+mode for GS1); they are exact for these modes and a safe upper bound otherwise.
+
+Usage: python symbol_capacity.py <payload> [--format data_matrix|qr_code] [--w 294 --h 294] [--ec M]
+"""
+
+import argparse
+import re
+import sys
+from typing import Dict, List, Tuple
+
+# ECC200 symbols: (rows, cols, data codewords); square sizes first, then rectangular
+DATA_MATRIX_SIZES: List[Tuple[int, int, int]] = [
+    (10, 10, 3), (12, 12, 5), (14, 14, 8), (16, 16, 12), (18, 18, 18), (20, 20, 22),
+    (22, 22, 30), (24, 24, 36), (26, 26, 44), (32, 32, 62), (36, 36, 86), (40, 40, 114),
+    (44, 44, 144), (48, 48, 174), (52, 52, 204), (64, 64, 280), (72, 72, 368), (80, 80, 456),
+    (88, 88, 576), (96, 96, 696), (104, 104, 816), (120, 120, 1050), (132, 132, 1304), (144, 144, 1558),
+    (8, 18, 5), (8, 32, 10), (12, 26, 16), (12, 36, 22), (16, 36, 32), (16, 48, 49),
+]
+
+# QR data codewords per version (index 0 = version 1) and EC level
+QR_DATA_CODEWORDS: Dict[str, List[int]] = {
+    "L": [19, 34, 55, 80, 108, 136, 156, 194, 232, 274, 324, 370, 428, 461, 523, 589, 647, 721, 795, 861,
+          932, 1006, 1094, 1174, 1276, 1370, 1468, 1531, 1631, 1735, 1843, 1955, 2071, 2191, 2306, 2434,
+          2566, 2702, 2812, 2956],
+    "M": [16, 28, 44, 64, 86, 108, 124, 154, 182, 216, 254, 290, 334, 365, 415, 453, 507, 563, 627, 669,
+          714, 782, 860, 914, 1000, 1062, 1128, 1193, 1267, 1373, 1455, 1541, 1631, 1725, 1812, 1914,
+          1992, 2102, 2216, 2334],
+    "Q": [13, 22, 34, 48, 62, 76, 88, 110, 132, 154, 180, 206, 244, 261, 295, 325, 367, 397, 445, 485,
+          512, 568, 614, 664, 718, 754, 808, 871, 911, 985, 1033, 1115, 1171, 1231, 1286, 1354, 1426,
+          1502, 1582, 1666],
+    "H": [9, 16, 26, 36, 46, 60, 66, 86, 100, 122, 140, 158, 180, 197, 223, 253, 283, 313, 341, 385,
+          406, 442, 464, 514, 538, 596, 628, 661, 701, 745, 793, 845, 901, 961, 986, 1054, 1096, 1142,
+          1222, 1276],
+}
+QR_ALNUM = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:")
+# Character-count indicator bits for versions 1-9, 10-26, 27-40
+QR_COUNT_BITS = {"numeric": (10, 12, 14), "alnum": (9, 11, 13), "byte": (8, 16, 16)}
+
+MIN_MODULE = 3  # smallest module (box units per module) considered legible
+# Font height in a style's font_style, e.g. "ttf-default-r*nnn*-80-80-UTF-8" (width-height-encoding)
+FONT_SIZE = re.compile(r"-(\d+)-(\d+)-(?=\D)")
+
+
+def data_matrix_codewords(payload: str, gs1: bool = True) -> int:
+    """ECC200 ASCII encodation: digit pairs -> 1 codeword, ASCII -> 1, extended -> 2, FNC1/GS -> 1."""
+    count = 1 if gs1 else 0
+    i, n = 0, len(payload)
+    while i < n:
+        c = payload[i]
+        if c.isdigit() and i + 1 < n and payload[i + 1].isdigit():
+            i += 2
+        else:
+            i += 1
+        count += 2 if ord(c) > 127 else 1
+    return count
+
+
+def _qr_segment_bits(mode: str, text: str, version: int) -> int:
+    band = 0 if version <= 9 else 1 if version <= 26 else 2
+    bits = 4 + QR_COUNT_BITS[mode][band]
+    n = len(text)
+    if mode == "numeric":
+        return bits + 10 * (n // 3) + (0, 4, 7)[n % 3]
+    if mode == "alnum":
+        return bits + 11 * (n // 2) + 6 * (n % 2)
+    return bits + 8 * len(text.encode("utf-8"))
+
+
+def qr_bits(payload: str, version: int, gs1: bool = True) -> int:
+    """Bits for the payload: the cheaper of one segment, or numeric runs (>= 6 digits) split from byte text."""
+    single = "numeric" if payload.isdigit() else "alnum" if set(payload) <= QR_ALNUM else "byte"
+    best = _qr_segment_bits(single, payload, version)
+    segments, run_start, i = [], 0, 0
+    while i < len(payload):
+        if payload[i].isdigit():
+            j = i
+            while j < len(payload) and payload[j].isdigit():
+                j += 1
+            if j - i >= 6:
+                if run_start < i:
+                    segments.append(("byte", payload[run_start:i]))
+                segments.append(("numeric", payload[i:j]))
+                run_start = j
+            i = j
+        else:
+            i += 1
+    if run_start < len(payload):
+        segments.append(("byte", payload[run_start:]))
+    if len(segments) > 1:
+        best = min(best, sum(_qr_segment_bits(m, t, version) for m, t in segments))
+    return best + (4 if gs1 else 0)
+
+
+def estimate(payload: str, w: int, h: int, fmt: str = "data_matrix", ec_level: str = "M",
+             gs1: bool = True, min_module: float = MIN_MODULE, square_only: bool = True, size: int = 0) -> Dict:
+    """
+    Smallest symbol holding payload and the module size it gets in a w x h box.
+    size pins the symbol instead: the Data Matrix size number (1-based index into
+    DATA_MATRIX_SIZES, as in extras.dm_size) or the QR version (extras.qr_ver); 0 = auto.
+    Returns {"format", "rows", "cols", "used", "capacity", "module", "fits", "reason"}
+    ("dm_size" for Data Matrix, "version" / "ec_level" for QR); fits is False when no
+    symbol holds the payload or the module would be smaller than min_module.
+    """
+    result: Dict = {"format": fmt, "rows": None, "cols": None, "module": 0.0, "fits": False}
+    if fmt == "qr_code":
+        level = ec_level.upper() if ec_level and ec_level.upper() in QR_DATA_CODEWORDS else "M"
+        result["ec_level"] = level
+        for version, codewords in enumerate(QR_DATA_CODEWORDS[level], start=1):
+            if size and version != size:
+                continue
+            used = (qr_bits(payload, version, gs1) + 7) // 8
+            result["used"] = used
+            if used <= codewords:
+                side = 17 + 4 * version
+                result.update(version=version, rows=side, cols=side, capacity=codewords)
+                break
+    else:
+        used = data_matrix_codewords(payload, gs1)
+        result["used"] = used
+        for number, (rows, cols, codewords) in enumerate(DATA_MATRIX_SIZES, start=1):
+            if (size and number != size) or (not size and square_only and rows != cols):
+                continue
+            if used <= codewords:
+                result.update(dm_size=number, rows=rows, cols=cols, capacity=codewords)
+                break
+    if result["rows"] is None:
+        result["reason"] = (f"payload needs {result.get('used')} codewords, more than {fmt} size {size} holds"
+                            if size else f"payload too long for any {fmt} symbol")
+        return result
+    module = min(w / result["cols"], h / result["rows"])
+    result["module"] = round(module, 2)
+    result["fits"] = module >= min_module
+    if not result["fits"]:
+        result["reason"] = (f"{result['rows']}x{result['cols']} modules leave {module:.1f} units per module "
+                            f"in a {w}x{h} box (minimum {min_module})")
+    return result
+
+
+def text_height(style: Dict) -> int:
+    """Box height the human-readable line takes (font height + text_margin); 0 without one."""
+    if style.get("human_readable") not in ("top", "bottom"):
+        return 0
+    m = FONT_SIZE.search(style.get("font_style", ""))
+    return (int(m.group(2)) if m else 0) + int(style.get("text_margin") or 0)
+
+
+def estimate_for_style(payload: str, style: Dict, min_module: float = MIN_MODULE) -> Dict:
+    """
+    estimate() using a barcode object style (format, w, h, extras.dm_size / qr_ver /
+    qr_ec_level), in the box minus the human-readable line. Adds "text_height",
+    "x_dimension" (the style's own when the symbol fits at it, else the largest whole
+    module that does) and "resized" (x_dimension differs from the style's).
+    fits is False when no x_dimension of at least min_module fits.
+    """
+    fmt = style.get("format", "data_matrix")
+    extras = style.get("extras") or {}
+    ec = extras.get("qr_ec_level", "M")
+    size = int(extras.get("qr_ver" if fmt == "qr_code" else "dm_size") or 0)
+    band = text_height(style)
+    w, h = style.get("w", 0), max(0, style.get("h", 0) - band)
+    # GS1 assumed (FNC1 costs one codeword / 4 bits), which keeps the estimate on the safe side
+    result = estimate(payload, w, h, fmt, "M" if ec == "auto" else ec, gs1=True, min_module=min_module, size=size)
+    result["text_height"] = band
+    if result["rows"] is None:
+        return result
+    largest = min(w // result["cols"], h // result["rows"])
+    own = style.get("x_dimension") or 0
+    result["x_dimension"] = own if 0 < own <= largest else largest
+    result["resized"] = result["x_dimension"] != own
+    result["fits"] = result["x_dimension"] >= min_module
+    result.pop("reason", None)
+    if not result["fits"]:
+        result["reason"] = (f"{result['rows']}x{result['cols']} modules leave {largest} units per module "
+                            f"in a {w}x{h} box below {band} units of text (minimum {min_module})")
+    return result
+
+
+def fitted_style(style: Dict, fit: Dict) -> Dict:
+    """Copy of style with the x_dimension and symbol size (dm_size / qr_ver) of an estimate_for_style() result."""
+    extras = dict(style.get("extras") or {})
+    if fit.get("version"):
+        extras["qr_ver"] = fit["version"]
+    elif fit.get("dm_size"):
+        extras["dm_size"] = fit["dm_size"]
+    return {**style, "x_dimension": fit["x_dimension"], "extras": extras}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Estimate Data Matrix / QR symbol size for a payload")
+    ap.add_argument("payload")
+    ap.add_argument("--format", default="data_matrix", choices=("data_matrix", "qr_code"))
+    ap.add_argument("--w", type=int, default=294)
+    ap.add_argument("--h", type=int, default=294)
+    ap.add_argument("--ec", default="M", help="QR error correction level (L/M/Q/H)")
+    ap.add_argument("--min-module", type=float, default=MIN_MODULE)
+    ap.add_argument("--no-gs1", action="store_true")
+    args = ap.parse_args()
+
+    r = estimate(args.payload, args.w, args.h, args.format, args.ec, not args.no_gs1, args.min_module)
+    size = f"{r['rows']}x{r['cols']}" if r["rows"] else "-"
+    version = f" version {r['version']}-{r['ec_level']}" if r.get("version") else ""
+    print(f"{r['format']}{version}: {size} modules, {r.get('used')}/{r.get('capacity', '-')} codewords, "
+          f"module {r['module']} -> {'fits' if r['fits'] else 'DOES NOT FIT'}")
+    if not r["fits"]:
+        print(f"  {r['reason']}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
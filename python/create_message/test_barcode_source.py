@@ -10,6 +10,8 @@ import time
 import base64
 import io
 
+from framing import framer_for
+
 try:
     import qrcode
     from PIL import Image
@@ -24,7 +26,7 @@ def send(s, cmd):
     s.sendall((json.dumps(cmd, separators=(',', ':')) + '\r\n').encode())
     try:
         s.settimeout(5)
-        r = s.recv(65536).decode().strip()
+        r = (framer_for(s).read_line() or b'').decode().strip()
         return json.loads(r)
     finally:
         s.settimeout(None)
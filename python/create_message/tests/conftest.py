@@ -0,0 +1,91 @@
+import itertools
+import json
+import os
+import socketserver
+import sys
+import threading
+
+import pytest
+
+# The scripts import each other as top-level modules (run from python/create_message)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakePrinterState:
+    """The data endpoints of a printer (sources, objects, messages) and /engine/real, in memory."""
+
+    def __init__(self):
+        self.sources, self.objects, self.messages = {}, {}, {}
+        self.ids = itertools.count(100)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.real = {"status": "ok", "state": "started", "data_name": "", "data_id": 0}
+
+    def handle(self, req):
+        path, rtype = req.get("path"), req.get("request_type")
+        with self.lock:
+            self.requests.append((rtype, path))
+            if path == "/engine/real":
+                return dict(self.real)
+            if path == "/data/list":
+                messages = sorted(self.messages.values(), key=lambda m: m["id"])
+                offset = req.get("offset", 0)
+                return {"status": "ok", "data_list": [{"id": m["id"], "name": m["name"],
+                                                       "attribute": {"modified_time": m["modified_time"]}}
+                                                      for m in messages[offset:offset + req.get("num", 10)]]}
+            table = {"/data/source": self.sources, "/data/object": self.objects, "/data/data": self.messages}.get(path)
+            if table is None:
+                return {"status": "ok"}
+            if rtype == "post":
+                refs = req.get("source_list") or req.get("object_list") or []
+                parent = self.sources if path == "/data/object" else self.objects
+                if any(r["id"] not in parent for r in refs):
+                    return {"status": "Error", "descript": "reference missing"}
+                entity_id = next(self.ids)
+                table[entity_id] = {**req, "id": entity_id, "modified_time": entity_id}
+                return {"status": "ok", "id": entity_id}
+            if rtype == "get":
+                entity = table.get(req["id"])
+                if not entity:
+                    return {"status": "Error"}
+                if path == "/data/data":  # detail: the objects, with their source lists
+                    entity = {**entity, "object_list": [self.objects.get(o["id"], o) for o in entity["object_list"]]}
+                return {"status": "ok", **entity}
+            if rtype == "delete":
+                return {"status": "ok"} if table.pop(req["id"], None) else {"status": "Error"}
+            if rtype == "put" and req.get("id") in table:
+                table[req["id"]].update({k: v for k, v in req.items() if k in ("name", "attribute")})
+            return {"status": "ok"}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        buf = b""
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            buf += data
+            *lines, buf = buf.split(b"\r\n")
+            out = b"".join(json.dumps(self.server.state.handle(json.loads(line))).encode() + b"\r\n"
+                           for line in lines if line)
+            if out:
+                self.request.sendall(out)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+@pytest.fixture
+def fake_printer():
+    """A FakePrinterState served on 127.0.0.1; yields (state, port)."""
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.state = FakePrinterState()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        yield server.state, server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from async_sojet_client import AsyncSojetClient, fetch_print_status
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_sends_match_replies_in_order(fake_printer):
+    state, port = fake_printer
+
+    async def scenario():
+        async with AsyncSojetClient("127.0.0.1", port, window=4) as client:
+            return await asyncio.gather(*(client.add_source("text", f"s{i}", str(i)) for i in range(20)))
+
+    replies = run(scenario())
+    assert [state.sources[r["id"]]["name"] for r in replies] == [f"s{i}" for i in range(20)]
+
+
+def test_pipeline_resolves_futures_on_exit(fake_printer):
+    state, port = fake_printer
+
+    async def scenario():
+        async with AsyncSojetClient("127.0.0.1", port) as client:
+            async with client.pipeline(window=2) as p:
+                futures = [p.add_source("text", f"p{i}", str(i)) for i in range(5)]
+                assert not any(f.done() for f in futures)
+            source = futures[0].result()
+            obj = await client.add_object("text", "o", {}, [{"id": source["id"], "type": "text"}])
+            msg = await client.new_message("m", [{"id": obj["id"]}])
+            return futures, await client.get_message_with_sources(msg["id"])
+
+    futures, detail = run(scenario())
+    assert [state.sources[f.result()["id"]]["name"] for f in futures] == [f"p{i}" for i in range(5)]
+    assert [s["name"] for s in detail["sources"]] == ["p0"]
+
+
+def test_timeout_drops_the_connection(fake_printer, monkeypatch):
+    state, port = fake_printer
+    handle = state.handle
+
+    def stall_first(req, stalled=[]):
+        if not stalled:
+            stalled.append(req)
+            time.sleep(0.6)
+        return handle(req)
+
+    monkeypatch.setattr(state, "handle", stall_first)
+
+    async def scenario():
+        client = AsyncSojetClient("127.0.0.1", port, timeout=0.3)
+        assert await client.connect()
+        slow = await client.get_print_status()
+        after = await client.get_print_status()
+        await client.disconnect()
+        return slow, after, client.writer
+
+    assert run(scenario()) == (None, None, None)
+
+
+def test_fetch_print_status_polls_every_client(fake_printer):
+    state, port = fake_printer
+    state.real["data_name"] = "LABEL"
+
+    async def scenario():
+        clients = [AsyncSojetClient("127.0.0.1", port) for _ in range(3)]
+        await asyncio.gather(*(c.connect() for c in clients))
+        try:
+            return await asyncio.gather(*(c.get_print_status() for c in clients)), \
+                await fetch_print_status(clients[:1])
+        finally:
+            await asyncio.gather(*(c.disconnect() for c in clients))
+
+    replies, keyed = run(scenario())
+    assert [r["data_name"] for r in replies] == ["LABEL"] * 3
+    assert keyed[("127.0.0.1", port)]["state"] == "started"
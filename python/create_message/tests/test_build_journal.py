@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from build_journal import BuildJournal, list_journals
+from entity_registry import EntityRegistry
+from message_builder import BuildError, MessageBuilder
+from sojet_client import SojetClient
+
+
+@pytest.fixture
+def client(fake_printer):
+    client = SojetClient("127.0.0.1", fake_printer[1])
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def label(name="L1"):
+    b = MessageBuilder(name)
+    b.source("a", "text", "A", {"content": "a"})
+    b.source("b", "text", "B", {"content": "b"})
+    b.source("shared", "text", "Shared", {"content": "s"}, intern=True)
+    b.object("oa", "text", "OA", {}, ["a", "shared"])
+    b.object("ob", "text", "OB", {}, ["b"])
+    return b
+
+
+def refuse(state, monkeypatch, path):
+    original = state.handle
+    monkeypatch.setattr(state, "handle", lambda req: {"status": "Error", "descript": "refused"}
+                        if req.get("path") == path and req.get("request_type") == "post" else original(req))
+    return lambda: monkeypatch.setattr(state, "handle", original)
+
+
+def open_journal(client, tmp_path, name="L1"):
+    return BuildJournal.open((client.host, client.port), name, str(tmp_path / "journals"))
+
+
+def test_failed_build_resumes_without_recreating(fake_printer, client, tmp_path, monkeypatch):
+    state = fake_printer[0]
+    restore = refuse(state, monkeypatch, "/data/object")
+    with pytest.raises(BuildError):
+        label().execute(client, journal=open_journal(client, tmp_path))
+    restore()
+    assert len(state.sources) == 3
+
+    journal = open_journal(client, tmp_path)
+    assert {key for _, key in journal.created} == {"a", "b", "shared"}
+    result = label().execute(client, journal=journal)
+    assert result["resumed"]["source"] == ["a", "b", "shared"]
+    assert len(state.sources) == 3 and len(state.objects) == 2 and len(state.messages) == 1
+    assert not os.path.exists(journal.path)  # committed
+
+
+def test_resume_rebuilds_entities_deleted_meanwhile(fake_printer, client, tmp_path, monkeypatch):
+    state = fake_printer[0]
+    restore = refuse(state, monkeypatch, "/data/data")
+    with pytest.raises(BuildError):
+        label().execute(client, journal=open_journal(client, tmp_path))
+    restore()
+    gone = min(state.objects)
+    del state.objects[gone]
+
+    result = label().execute(client, journal=open_journal(client, tmp_path))
+    assert result["resumed"]["object"] == ["ob"]
+    assert result["object_ids"]["oa"] != gone
+
+
+def test_changed_definition_is_not_resumed(fake_printer, client, tmp_path, monkeypatch):
+    restore = refuse(fake_printer[0], monkeypatch, "/data/object")
+    with pytest.raises(BuildError):
+        label().execute(client, journal=open_journal(client, tmp_path))
+    restore()
+    changed = label()
+    changed.sources["a"]["attribute"] = {"content": "new"}
+    result = changed.execute(client, journal=open_journal(client, tmp_path))
+    assert "a" not in result["resumed"]["source"] and "b" in result["resumed"]["source"]
+
+
+def test_rollback_deletes_created_but_keeps_interned(fake_printer, client, tmp_path, monkeypatch):
+    state = fake_printer[0]
+    registry = EntityRegistry(str(tmp_path / "registry.json"))
+    restore = refuse(state, monkeypatch, "/data/data")
+    with pytest.raises(BuildError):
+        label().execute(client, registry=registry, journal=open_journal(client, tmp_path))
+    restore()
+
+    journal = open_journal(client, tmp_path)
+    assert [j.message_name for j in list_journals(str(tmp_path / "journals"))] == ["L1"]
+    undone = journal.rollback(client)
+    assert not undone["failed"] and not undone["lost"]
+    assert {d["kind"] for d in undone["deleted"]} == {"source", "object"}
+    assert [k["key"] for k in undone["kept"]] == ["shared"]
+    assert list(state.sources) == [k["id"] for k in undone["kept"]] and not state.objects
+    assert list_journals(str(tmp_path / "journals")) == []
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+import bulk_labels
+from build_journal import BuildJournal, journal_path
+from message_builder import MessageBuilder
+from serial_generator import SerialGenerator
+from serial_ledger import SerialLedger
+from sojet_client import SojetClient
+
+ROWS = [{"gtin": "09506000134352", "mfg": "012024", "exp": "122026", "batch": f"B{i}", "sn": f"SN{i:04d}",
+         "tmda_reg": "TZ1"} for i in range(1, 13)]
+
+
+@pytest.fixture
+def journals(tmp_path, monkeypatch):
+    root = str(tmp_path / "journals")
+    monkeypatch.setattr(BuildJournal, "open", classmethod(
+        lambda cls, printer, name, root=root: cls(journal_path(printer, name, root), printer, name)))
+    return root
+
+
+@pytest.fixture
+def client(fake_printer):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def make_run(client, tmp_path):
+    checkpoint_path = str(tmp_path / "in.checkpoint.json")
+    checkpoint = bulk_labels.load_checkpoint(checkpoint_path, str(tmp_path / "in.csv"))
+    return bulk_labels.BulkLabelRun(client, checkpoint, checkpoint_path, str(tmp_path / "in.results.jsonl"),
+                                    name_prefix="T", chunk=5)
+
+
+def crash_once(monkeypatch, target, attr, when):
+    original = getattr(target, attr)
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if when(calls, args):
+            monkeypatch.setattr(target, attr, original)
+            raise KeyboardInterrupt
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(target, attr, wrapper)
+
+
+def assert_built_once(state, tmp_path, journals):
+    names = [m["name"] for m in state.messages.values()]
+    assert sorted(names) == [f"T_{i:05d}" for i in range(1, 13)]
+    referenced = {s["id"] for o in state.objects.values() for s in o["source_list"]}
+    assert set(state.objects) == {o["id"] for m in state.messages.values() for o in m["object_list"]}
+    assert set(state.sources) == referenced
+    with open(tmp_path / "in.results.jsonl") as f:
+        assert len(f.readlines()) == 12
+    assert not any(files for _, _, files in os.walk(journals))
+
+
+@pytest.mark.parametrize("attr", ["_submit", "_collect"])
+def test_crash_mid_chunk_resumes_without_duplicates(fake_printer, client, tmp_path, journals, monkeypatch, attr):
+    # Interrupted at the second chunk's message level: before it is sent (_submit), or
+    # after it is sent but before the replies are logged (_collect)
+    def message_level(args):
+        return (args[2][0][0] if attr == "_submit" else args[1]) == "message"
+
+    def at_second_chunk(calls, args):
+        return message_level(args) and sum(map(message_level, calls)) == 6
+
+    crash_once(monkeypatch, MessageBuilder, attr, at_second_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        make_run(client, tmp_path).run(iter(ROWS))
+    stats = make_run(client, tmp_path).run(iter(ROWS))
+    assert stats["created"] == 12 and stats["failed"] == 0
+    assert_built_once(fake_printer[0], tmp_path, journals)
+
+
+def test_crash_before_checkpoint_resumes_without_duplicates(fake_printer, client, tmp_path, journals, monkeypatch):
+    crash_once(monkeypatch, bulk_labels, "_atomic_write_json", lambda calls, args: len(calls) == 2)
+    with pytest.raises(KeyboardInterrupt):
+        make_run(client, tmp_path).run(iter(ROWS))
+    make_run(client, tmp_path).run(iter(ROWS))
+    assert_built_once(fake_printer[0], tmp_path, journals)
+
+
+def test_failed_label_is_rolled_back(fake_printer, client, tmp_path, journals, monkeypatch):
+    state = fake_printer[0]
+    original = state.handle
+
+    def refuse_messages(req):
+        if req.get("path") == "/data/data" and req.get("name") == "T_00002":
+            return {"status": "Error", "descript": "refused"}
+        return original(req)
+
+    monkeypatch.setattr(state, "handle", refuse_messages)
+    stats = make_run(client, tmp_path).run(iter(ROWS[:3]))
+    assert stats["created"] == 2 and stats["failed"] == 1
+    referenced = {s["id"] for o in state.objects.values() for s in o["source_list"]}
+    assert set(state.sources) == referenced
+    assert set(state.objects) == {o["id"] for m in state.messages.values() for o in m["object_list"]}
+
+
+def test_generated_serials_skip_the_ledger_and_resume(fake_printer, client, tmp_path, journals, monkeypatch):
+    # Index 1 is already printed; the crash hits after chunk 2 was recorded in the ledger
+    rows = [{**r, "sn": "", "batch": "B1"} for r in ROWS]
+    gen = SerialGenerator("k", rows[0]["gtin"], "B1", 13)
+    with SerialLedger(str(tmp_path / "ledger"), bloom_capacity=10_000) as ledger:
+        ledger.add(rows[0]["gtin"], gen.serial(1))
+
+        def make(c):
+            run = make_run(c, tmp_path)
+            run.ledger, run.serial_secret = ledger, "k"
+            return run
+
+        crash_once(monkeypatch, bulk_labels, "_atomic_write_json", lambda calls, args: len(calls) == 2)
+        with pytest.raises(KeyboardInterrupt):
+            make(client).run(iter(rows))
+        make(client).run(iter(rows))
+        serials = [ledger.contains(rows[0]["gtin"], gen.serial(i)) for i in range(14)]
+    assert serials == [True] * 13 + [False]
+    assert_built_once(fake_printer[0], tmp_path, journals)
@@ -0,0 +1,71 @@
+import pytest
+
+from create_product_label import build_label, update_label, worst_case_payload
+from serial_ledger import SerialLedger
+from sojet_client import SojetClient
+from symbol_capacity import estimate_for_style
+
+VALUES = {"gtin": "09506000134352", "mfg": "012024", "exp": "122026", "batch": "B1", "sn": "SN0001",
+          "tmda_reg": "TZ1"}
+
+
+@pytest.fixture
+def client(fake_printer):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    with SerialLedger(str(tmp_path / "ledger"), bloom_capacity=10_000) as ledger:
+        yield ledger
+
+
+def test_printed_serial_is_refused_before_sending(fake_printer, client, ledger):
+    state = fake_printer[0]
+    build_label(client, VALUES, "L1", ledger=ledger)
+    assert ledger.contains(VALUES["gtin"], VALUES["sn"])
+    state.requests.clear()
+    with pytest.raises(ValueError):
+        build_label(client, VALUES, "L2", ledger=ledger)
+    assert not state.requests
+
+
+def test_serial_recorded_by_another_process_meanwhile_warns(fake_printer, client, ledger, monkeypatch, capsys):
+    state = fake_printer[0]
+    handle = state.handle
+
+    def racing_handle(req):
+        if req.get("path") == "/data/data" and req.get("request_type") == "post":
+            with SerialLedger(ledger.path, bloom_capacity=10_000) as other:
+                other.add(VALUES["gtin"], VALUES["sn"])
+        return handle(req)
+
+    monkeypatch.setattr(state, "handle", racing_handle)
+    result = build_label(client, VALUES, "L1", ledger=ledger)
+    assert result["message_id"] in state.messages
+    assert "recorded by another process" in capsys.readouterr().err
+    assert len(ledger) == 1
+
+
+def test_barcode_object_gets_a_size_that_fits_its_box(fake_printer, client):
+    state = fake_printer[0]
+    result = build_label(client, VALUES, "L1")
+    style = state.objects[result["object_ids"]["Barcode"]]["style"]
+    fit = estimate_for_style(worst_case_payload(VALUES, "dynamic"), style)
+    assert fit["fits"] and not fit["resized"]
+    assert style["extras"]["dm_size"] == fit["dm_size"]
+    assert fit["cols"] * style["x_dimension"] <= style["w"]
+    assert fit["rows"] * style["x_dimension"] + fit["text_height"] <= style["h"]
+
+
+def test_update_refuses_a_payload_the_label_symbol_cannot_hold(fake_printer, client):
+    state = fake_printer[0]
+    result = build_label(client, {**VALUES, "sn": "1", "batch": "1"}, "L1", "single")
+    state.requests.clear()
+    with pytest.raises(ValueError):
+        update_label(client, result["message_id"], {"sn": "S" * 20, "batch": "B" * 20})
+    assert not [r for r in state.requests if r[0] == "put"]
@@ -0,0 +1,81 @@
+import pytest
+
+from dynamic_feeder import DynamicFeeder
+from serial_ledger import SerialLedger
+from sojet_client import SojetClient
+
+GTIN = "08961101532710"
+
+
+class FakePrinter:
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.batches = []
+
+    def get_print_status(self):
+        return {"status": "ok", "trans_ready": True, "output": 0}
+
+    def send_dynamic_data(self, print_mode, data):
+        if not self.accept:
+            return {"status": "Error"}
+        self.batches.append([d["content"] for d in data])
+        return {"status": "ok"}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    with SerialLedger(str(tmp_path / "ledger"), bloom_capacity=10_000) as ledger:
+        yield ledger
+
+
+def test_rejected_batch_records_no_serials(ledger):
+    feeder = DynamicFeeder(FakePrinter(accept=False), ["A1", "A2"], ledger=ledger, gtin=GTIN)
+    with pytest.raises(RuntimeError):
+        feeder.step()
+    assert not ledger.contains(GTIN, "A1")
+    assert not ledger.contains(GTIN, "A2")
+
+
+def test_repeat_within_batch_sends_first_copy(ledger):
+    printer = FakePrinter()
+    feeder = DynamicFeeder(printer, ["A1", "A2", "A1"], ledger=ledger, gtin=GTIN)
+    assert feeder.step() == 2
+    assert printer.batches == [["A1", "A2"]]
+    assert feeder.duplicates == 1
+    assert ledger.contains(GTIN, "A1") and ledger.contains(GTIN, "A2")
+
+
+def test_already_printed_serials_are_skipped(ledger):
+    ledger.add(GTIN, "A1")
+    printer = FakePrinter()
+    feeder = DynamicFeeder(printer, ["A1", "A2"], ledger=ledger, gtin=GTIN)
+    feeder.step()
+    assert printer.batches == [["A2"]]
+    assert feeder.duplicates == 1
+
+
+class SilentPrinter(FakePrinter):
+    """Connected, but /engine/real never answers (timeouts)."""
+
+    socket = object()
+
+    def get_print_status(self):
+        return None
+
+
+def test_feeder_gives_up_after_consecutive_missed_polls():
+    feeder = DynamicFeeder(SilentPrinter(), ["A1"], max_failed_polls=3, poll_interval=0)
+    with pytest.raises(RuntimeError):
+        feeder.run()
+    assert feeder.sent == 0
+
+
+def test_feeder_stops_at_once_on_a_closed_connection(fake_printer):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    feeder = DynamicFeeder(client, ["A1", "A2"], poll_interval=0)
+    assert feeder.step() == 2
+    client.disconnect()
+    with pytest.raises(RuntimeError):
+        feeder.step()
@@ -0,0 +1,72 @@
+import pytest
+
+from entity_registry import EntityRegistry, definition_digest, source_definition
+from message_builder import MessageBuilder
+from sojet_client import SojetClient
+
+
+@pytest.fixture
+def client(fake_printer):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def label(name):
+    b = MessageBuilder(name)
+    b.source("date", "date", "SN-DATE", {"format": "YYMMDD"}, intern=True)
+    b.source("sn", "text", "SN", {"content": name})
+    b.object("date_obj", "text", "date", {"x": 0}, ["date"], intern=True)
+    b.object("sn_obj", "text", "sn", {"x": 1}, ["sn"])
+    return b
+
+
+def test_interned_entities_are_created_once(fake_printer, client, tmp_path):
+    state = fake_printer[0]
+    registry = EntityRegistry(str(tmp_path / "registry.json"))
+    first = label("L1").execute(client, registry=registry)
+    second = label("L2").execute(client, registry=EntityRegistry(registry.path))
+    assert second["reused"] == {"source": ["date"], "object": ["date_obj"]}
+    assert second["source_ids"]["date"] == first["source_ids"]["date"]
+    assert second["object_ids"]["date_obj"] == first["object_ids"]["date_obj"]
+    assert len(state.sources) == 3 and len(state.objects) == 3
+
+
+def test_build_recreates_interned_entities_deleted_on_the_printer(fake_printer, client, tmp_path):
+    state = fake_printer[0]
+    registry = EntityRegistry(str(tmp_path / "registry.json"))
+    first = label("L1").execute(client, registry=registry)
+    del state.objects[first["object_ids"]["date_obj"]]
+    second = label("L2").execute(client, registry=registry)
+    assert second["object_ids"]["date_obj"] != first["object_ids"]["date_obj"]
+    assert second["object_ids"]["date_obj"] in state.objects
+    assert state.messages[second["message_id"]]
+
+
+def test_verify_drops_only_entries_the_printer_reports_missing(fake_printer, client, tmp_path, monkeypatch):
+    state = fake_printer[0]
+    registry = EntityRegistry(str(tmp_path / "registry.json"))
+    result = label("L1").execute(client, registry=registry)
+    del state.sources[result["source_ids"]["date"]]
+    handle = state.handle
+    monkeypatch.setattr(state, "handle", lambda req: {} if req.get("path") == "/data/object" else handle(req))
+    assert registry.verify(client) == 1
+    printer = (client.host, client.port)
+    assert [e["kind"] for e in registry.entries(printer).values()] == ["object"]
+
+
+def test_save_merges_with_other_processes(tmp_path):
+    path = str(tmp_path / "registry.json")
+    printer = ("10.0.0.1", 9944)
+    a, b = EntityRegistry(path), EntityRegistry(path)
+    d1 = definition_digest("source", source_definition("text", {"content": "1"}))
+    d2 = definition_digest("source", source_definition("text", {"content": "2"}))
+    a.store(printer, d1, "source", "text", 1)
+    a.save()
+    b.store(printer, d2, "source", "text", 2)
+    b.save()
+    a.invalidate(printer, "source", 1)
+    a.save()
+    assert EntityRegistry(path).entries(printer) == {d2: {"kind": "source", "type": "text", "id": 2}}
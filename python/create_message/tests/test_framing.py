@@ -0,0 +1,75 @@
+import pytest
+
+from framing import LineFramer, encode_request
+
+
+class ChunkSocket:
+    """recv_into() hands out the given byte chunks one per call, then EOF."""
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, view):
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        n = min(len(chunk), len(view))
+        view[:n] = chunk[:n]
+        if n < len(chunk):
+            self.chunks.insert(0, chunk[n:])
+        return n
+
+
+def read_all(framer):
+    lines = []
+    while True:
+        line = framer.read_line()
+        if line is None:
+            return lines
+        lines.append(line)
+
+
+def test_line_split_across_reads():
+    assert read_all(LineFramer(ChunkSocket(b'{"a":', b'1}\r\n'))) == [b'{"a":1}']
+
+
+def test_pipelined_replies_in_one_read():
+    framer = LineFramer(ChunkSocket(b'{"a":1}\r\n{"b":2}\r\n{"c"', b':3}\r\n'))
+    assert framer.read_json() == {"a": 1}
+    assert framer.pending() > 0
+    assert read_all(framer) == [b'{"b":2}', b'{"c":3}']
+
+
+def test_crlf_split_between_reads():
+    assert read_all(LineFramer(ChunkSocket(b"one\r", b"\ntwo\r\n"))) == [b"one", b"two"]
+
+
+def test_eof_returns_partial_line_then_none():
+    framer = LineFramer(ChunkSocket(b"done\r\ntail"))
+    assert framer.read_line() == b"done"
+    assert framer.read_line() == b"tail"
+    assert framer.read_line() is None
+
+
+def test_buffer_grows_for_lines_longer_than_it():
+    payload = b"x" * 50_000
+    framer = LineFramer(ChunkSocket(payload[:20_000], payload[20_000:] + b"\r\nnext\r\n"), bufsize=16)
+    assert read_all(framer) == [payload, b"next"]
+
+
+def test_line_over_max_line_raises():
+    framer = LineFramer(ChunkSocket(b"y" * 10_000), max_line=4096)
+    with pytest.raises(ValueError):
+        framer.read_line()
+
+
+def test_reset_drops_buffered_bytes():
+    framer = LineFramer(ChunkSocket(b"stale\r\nhalf", b"fresh\r\n"))
+    assert framer.read_line() == b"stale"
+    assert framer.pending() == len(b"half")
+    framer.reset()
+    assert framer.read_line() == b"fresh"
+
+
+def test_encode_request_is_one_compact_line():
+    assert encode_request({"path": "/engine/real", "id": 1}) == b'{"path":"/engine/real","id":1}\r\n'
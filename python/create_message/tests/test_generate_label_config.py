@@ -0,0 +1,45 @@
+import pytest
+
+import generate_label_config
+from generate_label_config import build_qr_string, build_qr_strings, gtin_check_digit, validate_label_fields
+
+GTIN = "09506000134352"
+
+
+def test_codes_match_the_single_record_builder():
+    codes, errors = build_qr_strings([GTIN, GTIN], ["SN1", "SN2"], ["122026", "012029"], ["B1", "B2"])
+    assert errors == {}
+    assert codes == [build_qr_string(GTIN, "SN1", "122026", "B1"), build_qr_string(GTIN, "SN2", "012029", "B2")]
+
+
+def test_errors_are_reported_per_row():
+    codes, errors = build_qr_strings(
+        [GTIN, "09506000134353", "0950600013435", GTIN],
+        ["SN1", "SN2", "SN3", "S" * 21],
+        ["122026", "122026", "122026", "002026"],
+        ["B1", "B2", "B 3", "B4"],
+    )
+    assert codes[0] and codes[1:] == ["", "", ""]
+    assert sorted(errors) == [1, 2, 3]
+    assert errors[1] == [f"GTIN '09506000134353' check digit should be {gtin_check_digit(GTIN)}"]
+    assert len(errors[2]) == 2  # GTIN length, batch character set
+    assert len(errors[3]) == 2  # SN length, expiry month
+
+
+def test_columns_must_have_the_same_length():
+    with pytest.raises(ValueError):
+        build_qr_strings([GTIN], [], ["122026"], ["B1"])
+
+
+def test_validate_label_fields_checks_one_record():
+    assert validate_label_fields(GTIN, "SN1", "122026", "B1") == []
+    assert validate_label_fields(GTIN, "", "122026", "B1") == ["SN is empty"]
+
+
+def test_check_digits_are_the_same_without_numpy(monkeypatch):
+    gtins = [f"{n:013d}" for n in range(0, 10_000_000_000_000, 997_000_000_001)]
+    gtins = [g + str(gtin_check_digit(g)) for g in gtins] + [GTIN[:-1] + "0"]
+    default = build_qr_strings(gtins, ["S"] * len(gtins), ["122026"] * len(gtins), ["B"] * len(gtins))
+    monkeypatch.setattr(generate_label_config, "np", None)
+    assert build_qr_strings(gtins, ["S"] * len(gtins), ["122026"] * len(gtins), ["B"] * len(gtins)) == default
+    assert list(default[1]) == [len(gtins) - 1]
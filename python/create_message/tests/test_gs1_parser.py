@@ -0,0 +1,39 @@
+import pytest
+
+from generate_label_config import build_qr_string
+from gs1_parser import GS, GS1ParseError, expected_fields, parse, verify
+
+GTIN = "08961101532710"
+
+
+@pytest.mark.parametrize("sn,batch", [
+    ("0275008260421656", "153A26"),
+    ("1729010010", "10"),          # serial that looks like the 17 / 10 fields
+    ("20BB17209182", "179980A8"),  # batch starting with 17
+    ("7", "1710171017101710"),
+])
+def test_round_trip_unseparated(sn, batch):
+    code = build_qr_string(GTIN, sn, "012029", batch)
+    assert parse(code) == {"01": GTIN, "21": sn, "17": "290100", "10": batch}
+    ok, _, problems = verify("]d2" + code, expected_fields(GTIN, sn, "012029", batch))
+    assert ok, problems
+
+
+def test_separated_and_parenthesized_forms():
+    expected = {"01": GTIN, "21": "ABC123", "17": "290100", "10": "153A26"}
+    assert parse(f"]Q301{GTIN}21ABC123{GS}1729010010153A26") == expected
+    assert parse(f"(01){GTIN}(21)ABC123(17)290100(10)153A26") == expected
+
+
+def test_bad_check_digit_is_reported():
+    code = build_qr_string("08961101532711", "SN1", "012029", "B1")
+    ok, fields, problems = verify(code, {"21": "SN1"})
+    assert not ok and fields["01"] == "08961101532711"
+    assert any("check digit" in p for p in problems)
+
+
+def test_verify_mismatch_and_garbage():
+    code = build_qr_string(GTIN, "SN1", "012029", "B1")
+    assert not verify(code, {"21": "SN2"})[0]
+    with pytest.raises(GS1ParseError):
+        parse("99")
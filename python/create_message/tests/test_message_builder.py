@@ -0,0 +1,83 @@
+import pytest
+
+from message_builder import BuildError, MessageBuilder, execute_many
+from sojet_client import SojetClient
+
+
+@pytest.fixture
+def client(fake_printer, monkeypatch):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    client.bursts = 0
+    pipeline = client.pipeline
+
+    def counting_pipeline(window=8):
+        client.bursts += 1
+        return pipeline(window)
+
+    monkeypatch.setattr(client, "pipeline", counting_pipeline)
+    yield client
+    client.disconnect()
+
+
+def label(name, fields=("a", "b", "c")):
+    b = MessageBuilder(name)
+    for f in fields:
+        b.source(f, "text", f, {"content": f"{name}-{f}"})
+    b.object("top", "text", "top", {"x": 0}, list(fields[:2]))
+    b.object("bottom", "text", "bottom", {"x": 1}, list(fields[2:]))
+    return b
+
+
+def test_unknown_source_key_is_rejected():
+    b = MessageBuilder("m")
+    b.source("a", "text", "a", {})
+    with pytest.raises(ValueError):
+        b.object("o", "text", "o", {}, ["a", "missing"])
+
+
+def test_execute_creates_each_level_in_one_burst(fake_printer, client):
+    state = fake_printer[0]
+    result = label("L1").execute(client)
+    assert client.bursts == 3
+    paths = [path for _, path in state.requests]
+    assert paths == ["/data/source"] * 3 + ["/data/object"] * 2 + ["/data/data"]
+    message = state.messages[result["message_id"]]
+    assert [o["id"] for o in message["object_list"]] == [result["object_ids"]["top"], result["object_ids"]["bottom"]]
+    top = state.objects[result["object_ids"]["top"]]
+    assert [s["id"] for s in top["source_list"]] == [result["source_ids"]["a"], result["source_ids"]["b"]]
+
+
+def test_failed_level_raises_with_the_ids_created_so_far(fake_printer, client, monkeypatch):
+    state = fake_printer[0]
+    handle = state.handle
+    monkeypatch.setattr(state, "handle", lambda req: {"status": "Error"} if req.get("name") == "bottom"
+                        else handle(req))
+    with pytest.raises(BuildError) as e:
+        label("L1").execute(client)
+    assert e.value.step == "object bottom"
+    assert set(e.value.created["source_ids"]) == {"a", "b", "c"}
+    assert list(e.value.created["object_ids"]) == ["top"]
+    assert not state.messages
+
+
+def test_execute_many_takes_three_bursts_for_any_number_of_labels(fake_printer, client):
+    state = fake_printer[0]
+    results = execute_many([label(f"L{i}") for i in range(6)], client, window=4)
+    assert client.bursts == 3
+    assert sorted(m["name"] for m in state.messages.values()) == [f"L{i}" for i in range(6)]
+    for r in results:
+        contents = {state.sources[sid]["attribute"]["content"] for sid in r["source_ids"].values()}
+        assert contents == {f"{r['message_name']}-{f}" for f in "abc"}
+
+
+def test_execute_many_leaves_a_failed_builder_out_of_later_levels(fake_printer, client, monkeypatch):
+    state = fake_printer[0]
+    handle = state.handle
+    monkeypatch.setattr(state, "handle", lambda req: {"status": "Error"}
+                        if req.get("attribute", {}).get("content") == "BAD-b" else handle(req))
+    results = execute_many([label("GOOD"), label("BAD"), label("ALSO")], client)
+    assert isinstance(results[1], BuildError) and results[1].step == "source b"
+    assert sorted(m["name"] for m in state.messages.values()) == ["ALSO", "GOOD"]
+    assert len(state.objects) == 4  # top and bottom of GOOD and ALSO only
@@ -0,0 +1,42 @@
+import pytest
+
+from create_product_label import build_label, update_label
+from message_catalog import MessageCatalog
+from sojet_client import SojetClient
+
+VALUES = {"gtin": "09506000134352", "mfg": "012024", "exp": "122026", "batch": "B1", "sn": "SN1", "tmda_reg": "TZ1"}
+
+
+@pytest.fixture
+def client(fake_printer):
+    client = SojetClient("127.0.0.1", fake_printer[1])
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+@pytest.fixture
+def catalog():
+    catalog = MessageCatalog(":memory:")
+    yield catalog
+    catalog.close()
+
+
+def test_sync_reads_label_fields_and_skips_unchanged_messages(client, catalog):
+    mid = build_label(client, VALUES, "L1")["message_id"]
+    assert catalog.sync(client)["fetched"] == 1
+    assert catalog.lookup((client.host, client.port), "L1") == mid
+    assert [m["sn"] for m in catalog.find((client.host, client.port), gtin=VALUES["gtin"], batch="B1")] == ["SN1"]
+    assert catalog.sync(client)["fetched"] == 0
+
+
+def test_in_place_update_is_refetched_once_marked_stale(client, catalog):
+    printer = (client.host, client.port)
+    mid = build_label(client, VALUES, "L1")["message_id"]
+    catalog.sync(client)
+    update_label(client, mid, {"batch": "B2"})
+    assert catalog.sync(client)["fetched"] == 0  # modified_time did not change
+    catalog.mark_stale(printer, mid)
+    assert catalog.sync(client)["fetched"] == 1
+    assert [m["id"] for m in catalog.find(printer, batch="B2")] == [mid]
+    assert catalog.find(printer, batch="B1") == []
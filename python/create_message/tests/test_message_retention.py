@@ -0,0 +1,89 @@
+import pytest
+
+from message_catalog import MessageCatalog
+from message_retention import PrintHistory, enforce, plan_eviction
+from sojet_client import SojetClient
+
+PRINTER = ("127.0.0.1", 9944)
+
+
+@pytest.fixture
+def history(tmp_path):
+    return PrintHistory(str(tmp_path / "history.json"))
+
+
+def message(mid, name, modified=0):
+    return {"id": mid, "name": name, "attribute": {"created_time": modified, "modified_time": modified}}
+
+
+def test_under_cap_evicts_nothing(history):
+    assert plan_eviction(history, PRINTER, [message(1, "a")], 1, set(), set()) == []
+
+
+def test_least_recently_printed_go_first(history):
+    messages = [message(1, "a", 100), message(2, "b", 200), message(3, "c", 300)]
+    history.record_print(PRINTER, "a", when=400)
+    assert [m["name"] for m in plan_eviction(history, PRINTER, messages, 1, set(), set())] == ["b", "c"]
+
+
+def test_ties_break_by_id(history):
+    messages = [message(5, "x"), message(2, "y"), message(9, "z")]
+    assert [m["id"] for m in plan_eviction(history, PRINTER, messages, 2, set(), set())] == [2]
+
+
+def test_printing_message_is_never_evicted(history):
+    messages = [message(1, "printing", 100), message(2, "old", 200), message(3, "new", 300)]
+    victims = plan_eviction(history, PRINTER, messages, 1, {1}, set())
+    assert [m["name"] for m in victims] == ["old", "new"]
+    victims = plan_eviction(history, PRINTER, messages, 2, set(), {"printing"})
+    assert [m["name"] for m in victims] == ["old"]
+
+
+def test_protected_messages_may_leave_storage_over_cap(history):
+    messages = [message(1, "a"), message(2, "b")]
+    assert plan_eviction(history, PRINTER, messages, 0, {1}, {"b"}) == []
+
+
+def add_messages(client, state):
+    """printing / old / new, each with its own source and one shared by all; returns the shared source id."""
+    shared = client.add_source_raw("text", "shared", {"content": "s"})["id"]
+    ids = {}
+    for name in ("printing", "old", "new"):
+        own = client.add_source_raw("text", name, {"content": name})["id"]
+        obj = client.add_object("text", name, {}, [{"type": "text", "id": own}, {"type": "text", "id": shared}])
+        ids[name] = client.new_message(name, [{"id": obj["id"], "type": "text"}])["id"]
+    state.real.update(data_name="printing", data_id=ids["printing"])
+    return shared
+
+
+def test_enforce_keeps_the_current_message_and_shared_sources(fake_printer, history):
+    state, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    try:
+        shared = add_messages(client, state)
+        result = enforce(client, 2, history)
+    finally:
+        client.disconnect()
+    assert result["current"] == "printing" and result["evicted"] == ["old"]
+    assert result["objects"] == 1 and result["sources"] == 1 and not result["failed"]
+    assert sorted(m["name"] for m in state.messages.values()) == ["new", "printing"]
+    assert shared in state.sources
+
+
+def test_enforce_with_a_catalog_reads_back_only_the_victims(fake_printer, history):
+    state, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    catalog = MessageCatalog(":memory:")
+    assert client.connect()
+    try:
+        shared = add_messages(client, state)
+        catalog.sync(client)
+        del state.requests[:]
+        result = enforce(client, 2, history, catalog=catalog)
+    finally:
+        client.disconnect()
+    assert result["evicted"] == ["old"] and result["sources"] == 1 and not result["failed"]
+    assert state.requests.count(("get", "/data/data")) == 1
+    assert shared in state.sources
+    assert sorted(m["name"] for m in catalog.messages(("127.0.0.1", port))) == ["new", "printing"]
@@ -0,0 +1,50 @@
+import pytest
+
+import orphan_gc
+from sojet_client import SojetClient
+
+
+@pytest.fixture
+def client(fake_printer, monkeypatch):
+    monkeypatch.setattr(orphan_gc, "list_journals", lambda: [])
+    client = SojetClient("127.0.0.1", fake_printer[1])
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def text_source(client, name):
+    return client.add_source_raw("text", name, {"content": name})["id"]
+
+
+def test_unreferenced_ids_are_orphans_up_to_the_first_listing(client):
+    stale = text_source(client, "stale")
+    used = text_source(client, "used")
+    obj = client.add_object("text", "o", {}, [{"type": "text", "id": used}])["id"]
+    client.new_message("M", [{"id": obj, "type": "text"}])
+    # Created after the message: may belong to a build that has not made its message yet
+    fresh = text_source(client, "fresh")
+
+    orphans = orphan_gc.find_orphans(client, slack=10)
+    assert orphans["sources"] == [("text", stale)]
+    assert orphans["objects"] == []
+    assert orphans["recent"] == 1
+    assert fresh > stale
+
+
+def test_entities_of_a_message_created_during_the_scan_are_kept(client, monkeypatch):
+    source = text_source(client, "s")
+    client.new_message("Old", [])
+    probe = orphan_gc.probe_ids
+
+    def probe_while_building(*args, **kwargs):
+        found = probe(*args, **kwargs)
+        if not getattr(probe_while_building, "built", False):
+            probe_while_building.built = True
+            obj = client.add_object("text", "o", {}, [{"type": "text", "id": source}])["id"]
+            client.new_message("New", [{"id": obj, "type": "text"}])
+        return found
+
+    monkeypatch.setattr(orphan_gc, "probe_ids", probe_while_building)
+    orphans = orphan_gc.find_orphans(client, slack=10)
+    assert orphans["sources"] == [] and orphans["objects"] == []
@@ -0,0 +1,75 @@
+import time
+
+from pacing import AdaptivePacer, paced
+from sojet_client import SojetClient
+
+
+def test_no_reply_doubles_the_delay_up_to_the_cap():
+    pacer = AdaptivePacer(error_delay=0.1, max_delay=0.5)
+    delays = []
+    for _ in range(5):
+        pacer.record(None, False)
+        delays.append(pacer.delay)
+    assert delays == [0.1, 0.2, 0.4, 0.5, 0.5]
+    assert pacer.errors == 5
+
+
+def test_error_status_is_not_pressure():
+    pacer = AdaptivePacer()
+    pacer.record(0.01, True)
+    assert pacer.delay == 0.0
+
+
+def test_slow_reply_backs_off_by_the_excess_without_moving_the_baseline():
+    pacer = AdaptivePacer(slow_factor=3.0)
+    for _ in range(3):
+        pacer.record(0.02, True)
+    pacer.record(0.2, True)
+    assert abs(pacer.delay - 0.18) < 1e-9
+    assert abs(pacer.baseline - 0.02) < 1e-9
+
+
+def test_normal_replies_halve_the_delay_back_to_zero():
+    pacer = AdaptivePacer(error_delay=0.1)
+    pacer.record(None, False)
+    pacer.record(0.01, True)
+    assert pacer.delay == 0.05
+    for _ in range(10):
+        pacer.record(0.01, True)
+    assert pacer.delay == 0.0
+
+
+def test_paced_decorator_shares_one_pacer():
+    replies = iter([None, None, {"status": "Error"}])
+
+    @paced
+    def send_command(sock, cmd):
+        return next(replies)
+
+    send_command(None, {})
+    send_command(None, {})
+    assert send_command.pacer.errors == 2 and send_command.pacer.delay == 0.2
+    send_command(None, {})
+    assert send_command.pacer.delay == 0.1
+
+
+def test_client_backs_off_on_a_missing_reply(fake_printer, monkeypatch):
+    state, port = fake_printer
+    handle = state.handle
+    monkeypatch.setattr(state, "handle", lambda req: time.sleep(0.4) or handle(req))
+    client = SojetClient("127.0.0.1", port, timeout=0.2)
+    assert client.connect()
+    try:
+        assert client.get_print_status() is None
+        assert client.pacer.delay == client.pacer.error_delay
+    finally:
+        client.disconnect()
+
+    monkeypatch.setattr(state, "handle", handle)
+    assert client.connect()
+    try:
+        for _ in range(12):
+            assert client.get_print_status()["status"] == "ok"
+        assert client.pacer.delay == 0.0
+    finally:
+        client.disconnect()
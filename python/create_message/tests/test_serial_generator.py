@@ -0,0 +1,46 @@
+import pytest
+
+from serial_generator import SerialGenerator
+
+GTIN = "08961101532710"
+
+
+def test_every_index_maps_to_a_distinct_serial_in_range():
+    for digits in (3, 4):  # odd and even digit splits
+        gen = SerialGenerator("key", GTIN, "B1", digits=digits)
+        serials = list(gen.iter_serials())
+        assert len(serials) == gen.capacity == 10 ** digits
+        assert len(set(serials)) == gen.capacity
+        assert all(len(s) == digits and s.isdigit() for s in serials)
+
+
+def test_custom_alphabet_and_prefix():
+    gen = SerialGenerator("key", GTIN, "B1", digits=3, alphabet="ABCDEFGH", prefix="X")
+    serials = list(gen.iter_serials())
+    assert len(set(serials)) == 8 ** 3
+    assert all(s[0] == "X" and set(s[1:]) <= set("ABCDEFGH") for s in serials)
+
+
+def test_deterministic_per_secret_gtin_and_batch():
+    first = list(SerialGenerator("key", GTIN, "B1").iter_serials(0, 100))
+    assert first == list(SerialGenerator("key", GTIN, "B1").iter_serials(0, 100))
+    assert first != list(SerialGenerator("key", GTIN, "B2").iter_serials(0, 100))
+    assert first != list(SerialGenerator("other", GTIN, "B1").iter_serials(0, 100))
+
+
+def test_chunks_resume_at_start_index():
+    gen = SerialGenerator("key", GTIN, "B1")
+    chunks = list(gen.chunks(start=5, count=10, size=4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert sum(chunks, []) == list(gen.iter_serials(5, 10)) == [gen.serial(i) for i in range(5, 15)]
+
+
+def test_rejects_bad_parameters():
+    with pytest.raises(ValueError):
+        SerialGenerator("key", GTIN, "B1", digits=18, prefix="ABC")  # over the 20-character AI(21) limit
+    with pytest.raises(ValueError):
+        SerialGenerator("", GTIN, "B1")
+    with pytest.raises(ValueError):
+        SerialGenerator("key", GTIN, "B1", alphabet="AA")
+    with pytest.raises(IndexError):
+        SerialGenerator("key", GTIN, "B1", digits=3).serial(1000)
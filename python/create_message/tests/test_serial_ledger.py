@@ -0,0 +1,70 @@
+from serial_ledger import SerialLedger
+
+GTIN = "08961101532710"
+
+
+def open_ledger(path, **kw):
+    return SerialLedger(str(path), bloom_capacity=10_000, **kw)
+
+
+def test_duplicates_survive_restart(tmp_path):
+    with open_ledger(tmp_path) as ledger:
+        assert ledger.add(GTIN, "SN1")
+        assert ledger.add_many(GTIN, ["SN2", "SN3"]) == []
+    with open_ledger(tmp_path) as ledger:
+        assert ledger.contains(GTIN, "SN1")
+        assert not ledger.add(GTIN, "SN2")
+        assert not ledger.contains("00000000000000", "SN1")
+        assert len(ledger) == 3
+
+
+def test_unflushed_log_is_replayed(tmp_path):
+    ledger = open_ledger(tmp_path)
+    ledger.add(GTIN, "SN1")
+    # no close(): the entry is only in log.txt
+    assert open_ledger(tmp_path).contains(GTIN, "SN1")
+
+
+def test_repeat_within_one_add_many(tmp_path):
+    with open_ledger(tmp_path) as ledger:
+        assert ledger.add_many(GTIN, ["A", "B", "A"]) == ["A"]
+        assert len(ledger) == 2
+
+
+def test_flush_and_compact_keep_entries(tmp_path):
+    with open_ledger(tmp_path, memtable_limit=10, max_runs=2) as ledger:
+        for i in range(0, 100, 5):
+            ledger.add_many(GTIN, [str(n) for n in range(i, i + 5)])
+        assert len(ledger.runs) <= 2
+        assert ledger.contains_many(GTIN, ["0", "57", "99", "100"]) == [True, True, True, False]
+
+
+def test_processes_see_each_others_writes(tmp_path):
+    a = open_ledger(tmp_path, memtable_limit=20)
+    b = open_ledger(tmp_path, memtable_limit=20)
+    assert a.add(GTIN, "SN1")
+    assert not b.add(GTIN, "SN1")
+    b.add_many(GTIN, [f"B{i}" for i in range(30)])  # b flushes a run
+    a.add_many(GTIN, [f"A{i}" for i in range(30)])  # a flushes the next one
+    assert len(set(a.manifest["runs"])) == len(a.manifest["runs"])
+    assert a.contains(GTIN, "B29") and b.contains(GTIN, "A29")
+    a.close()
+    b.close()
+    with open_ledger(tmp_path) as ledger:
+        assert len(ledger) == 61
+
+
+def test_close_without_changes_leaves_the_bloom_file_alone(tmp_path):
+    with open_ledger(tmp_path) as ledger:
+        ledger.add(GTIN, "SN1")
+    bloom = tmp_path / "bloom.bin"
+    before = bloom.stat()
+    with open_ledger(tmp_path) as ledger:
+        assert ledger.contains(GTIN, "SN1")
+    after = bloom.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    with open_ledger(tmp_path) as ledger:
+        ledger.add(GTIN, "SN2")
+    assert bloom.stat().st_ino != before.st_ino
+    with open_ledger(tmp_path) as ledger:
+        assert ledger.contains_many(GTIN, ["SN1", "SN2"]) == [True, True]
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from sojet_client import SojetClient
+
+
+@pytest.fixture
+def client(fake_printer):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port, timeout=0.3)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def test_responses_match_requests_in_order(fake_printer, client):
+    state = fake_printer[0]
+    with client.pipeline(window=4) as pipe:
+        futures = []
+        for i in range(20):
+            futures.append(pipe.add_source("text", f"s{i}", str(i)))
+            assert len(pipe._inflight) <= 4
+    ids = [f.result()["id"] for f in futures]
+    assert [state.sources[i]["name"] for i in ids] == [f"s{i}" for i in range(20)]
+
+
+def test_result_reads_earlier_replies_first(client):
+    pipe = client.pipeline(window=8)
+    first = pipe.add_source("text", "a", "1")
+    second = pipe.add_source("text", "b", "2")
+    assert second.result()["status"] == "ok"
+    assert first.done() and first.result()["id"] < second.result()["id"]
+
+
+def test_stalled_reply_closes_the_connection(fake_printer, client, monkeypatch):
+    state = fake_printer[0]
+    handle = state.handle
+
+    def stall_first(req, stalled=[]):
+        if not stalled:
+            stalled.append(req)
+            time.sleep(0.6)
+        return handle(req)
+
+    monkeypatch.setattr(state, "handle", stall_first)
+    pipe = client.pipeline()
+    slow = pipe.add_source("text", "slow", "1")
+    queued = pipe.add_source("text", "queued", "2")
+    assert slow.result() is None and queued.result() is None
+    assert client.socket is None
+    time.sleep(0.5)  # the late replies land on the closed socket, not on the next request
+    assert pipe.add_source("text", "after", "3").result() is None
+
+    assert pipe.connect()
+    r = pipe.find_source(pipe.add_source("text", "fresh", "4").result()["id"], "text").result()
+    assert r["name"] == "fresh"
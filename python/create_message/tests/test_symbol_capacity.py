@@ -0,0 +1,95 @@
+from symbol_capacity import (
+    DATA_MATRIX_SIZES, QR_DATA_CODEWORDS, data_matrix_codewords, estimate, estimate_for_style, fitted_style, qr_bits,
+    text_height,
+)
+
+
+def test_data_matrix_tables_are_ordered():
+    square = [s for s in DATA_MATRIX_SIZES if s[0] == s[1]]
+    assert square == sorted(square)
+    assert [c for _, _, c in square] == sorted(c for _, _, c in square)
+
+
+def test_qr_tables_grow_with_version_and_shrink_with_ec_level():
+    for level, table in QR_DATA_CODEWORDS.items():
+        assert len(table) == 40
+        assert table == sorted(table), level
+    for version in range(40):
+        l, m, q, h = (QR_DATA_CODEWORDS[k][version] for k in "LMQH")
+        assert l > m > q > h
+
+
+def test_data_matrix_codewords_pack_digit_pairs():
+    assert data_matrix_codewords("0123", gs1=False) == 2
+    assert data_matrix_codewords("012", gs1=False) == 2
+    assert data_matrix_codewords("AB", gs1=False) == 2
+    assert data_matrix_codewords("é", gs1=False) == 2
+    assert data_matrix_codewords("0123") == 3  # + FNC1
+
+
+def test_estimate_picks_the_smallest_data_matrix():
+    assert data_matrix_codewords("1" * 14) == 8
+    assert (estimate("1" * 14, 294, 294)["rows"], estimate("1" * 16, 294, 294)["rows"]) == (14, 16)
+
+
+def test_qr_version_1_m_holds_34_digits():
+    assert qr_bits("1" * 34, 1, gs1=False) == 128  # 16 data codewords
+    assert estimate("1" * 34, 294, 294, "qr_code", gs1=False)["version"] == 1
+    assert estimate("1" * 35, 294, 294, "qr_code", gs1=False)["version"] == 2
+
+
+def test_numeric_runs_are_split_from_byte_text():
+    payload = "ab" + "1" * 30
+    assert qr_bits(payload, 1, gs1=False) < 4 + 8 + 8 * len(payload)
+
+
+def test_small_box_or_long_payload_does_not_fit():
+    small = estimate("1" * 40, 20, 20)
+    assert not small["fits"] and "units per module" in small["reason"]
+    huge = estimate("A" * 5000, 294, 294)
+    assert not huge["fits"] and "too long" in huge["reason"]
+
+
+def test_estimate_for_style_reads_format_box_and_ec_level():
+    r = estimate_for_style("1" * 34, {"format": "qr_code", "w": 294, "h": 294, "extras": {"qr_ec_level": "H"}})
+    assert r["ec_level"] == "H" and r["fits"]
+
+
+DM_STYLE = {"format": "data_matrix", "w": 294, "h": 294, "x_dimension": 14, "human_readable": "bottom",
+            "font_style": "ttf-default-r*nnn*-80-80-UTF-8", "text_margin": 3, "extras": {"dm_size": 0}}
+
+
+def test_text_height_is_font_height_plus_margin():
+    assert text_height(DM_STYLE) == 83
+    assert text_height({**DM_STYLE, "human_readable": "none"}) == 0
+
+
+def test_x_dimension_is_reduced_to_fit_below_the_text():
+    fit = estimate_for_style("1" * 60, DM_STYLE)  # 31 codewords: 24x24
+    assert (fit["rows"], fit["dm_size"]) == (24, 8)
+    assert fit["fits"] and fit["resized"] and fit["x_dimension"] == (294 - 83) // 24
+    assert 24 * fit["x_dimension"] + fit["text_height"] <= 294
+
+
+def test_own_x_dimension_is_kept_when_it_fits():
+    fit = estimate_for_style("1" * 10, {**DM_STYLE, "x_dimension": 13})  # 10x10
+    assert fit["x_dimension"] == 13 and not fit["resized"]
+
+
+def test_pinned_dm_size_is_honoured():
+    assert estimate_for_style("1" * 10, {**DM_STYLE, "extras": {"dm_size": 8}})["rows"] == 24
+    too_small = estimate_for_style("1" * 60, {**DM_STYLE, "extras": {"dm_size": 7}})
+    assert not too_small["fits"] and "codewords" in too_small["reason"]
+
+
+def test_no_legible_module_does_not_fit():
+    fit = estimate_for_style("1" * 60, {**DM_STYLE, "h": 150})
+    assert not fit["fits"] and "units of text" in fit["reason"]
+
+
+def test_fitted_style_applies_x_dimension_and_symbol_size():
+    style = fitted_style(DM_STYLE, estimate_for_style("1" * 60, DM_STYLE))
+    assert (style["x_dimension"], style["extras"]["dm_size"]) == (8, 8)
+    assert DM_STYLE["extras"]["dm_size"] == 0
+    qr = {**DM_STYLE, "format": "qr_code", "extras": {"qr_ver": 0, "qr_ec_level": "auto"}}
+    assert fitted_style(qr, estimate_for_style("1" * 20, qr))["extras"]["qr_ver"] == 1
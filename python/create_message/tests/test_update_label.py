@@ -0,0 +1,87 @@
+import pytest
+
+from create_product_label import LabelBuildError, build_label, update_label
+from serial_ledger import SerialLedger
+from sojet_client import SojetClient
+
+VALUES = {"gtin": "09506000134352", "mfg": "012024", "exp": "122026", "batch": "B1", "sn": "SN0001",
+          "tmda_reg": "TZ1"}
+
+
+@pytest.fixture
+def client(fake_printer):
+    _, port = fake_printer
+    client = SojetClient("127.0.0.1", port)
+    assert client.connect()
+    yield client
+    client.disconnect()
+
+
+def contents(state, source_ids):
+    return {key: state.sources[sid]["attribute"].get("content") for key, sid in source_ids.items()}
+
+
+@pytest.mark.parametrize("barcode_source, barcode_key", [("single", "QRData"), ("dynamic", "QRSuffix")])
+def test_update_modifies_only_changed_sources(fake_printer, client, barcode_source, barcode_key):
+    state = fake_printer[0]
+    built = build_label(client, VALUES, "L1", barcode_source, sn_date=False)
+    before = contents(state, built["source_ids"])
+    state.requests.clear()
+
+    result = update_label(client, built["message_id"], {"batch": "B2"})
+    after = contents(state, built["source_ids"])
+    assert sorted(k for k in before if before[k] != after[k]) == sorted(["BATCH", barcode_key])
+    assert after["BATCH"] == "BATCH: B2" and after[barcode_key].endswith("10B2")
+    assert [rtype for rtype, _ in state.requests].count("put") == len(result["modified"]) == 2
+
+
+def test_update_with_nothing_changed_sends_no_modify(fake_printer, client):
+    state = fake_printer[0]
+    built = build_label(client, VALUES, "L1", "dynamic", sn_date=False)
+    state.requests.clear()
+    result = update_label(client, built["message_id"], {"batch": "B1"})
+    assert result["modified"] == [] and result["unchanged"] > 0
+    assert not [r for r in state.requests if r[0] == "put"]
+
+
+def test_update_of_missing_message_raises(client):
+    with pytest.raises(LabelBuildError):
+        update_label(client, 999999, {"batch": "B2"})
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    with SerialLedger(str(tmp_path / "ledger"), bloom_capacity=10_000) as ledger:
+        yield ledger
+
+
+def test_new_serial_is_checked_and_recorded(fake_printer, client, ledger):
+    state = fake_printer[0]
+    built = build_label(client, VALUES, "L1", ledger=ledger)
+    other = build_label(client, {**VALUES, "sn": "SN0002"}, "L2", ledger=ledger)
+    state.requests.clear()
+    with pytest.raises(ValueError):
+        update_label(client, other["message_id"], {"sn": "SN0001"}, ledger=ledger)
+    assert not [r for r in state.requests if r[0] == "put"]
+
+    update_label(client, built["message_id"], {"sn": "SN0003"}, ledger=ledger)
+    assert ledger.contains(VALUES["gtin"], "SN0003")
+    update_label(client, built["message_id"], {"batch": "B2"}, ledger=ledger)  # same SN: no check
+    assert len(ledger) == 3
+
+
+def test_printer_generated_serials_skip_the_ledger(fake_printer, client, ledger):
+    built = build_label(client, {**VALUES, "sn": "0275008"}, "L1", "highrate", ledger=ledger)
+    update_label(client, built["message_id"], {"sn": "0275009"}, ledger=ledger)
+    assert len(ledger) == 0
+
+
+@pytest.mark.parametrize("change", [{"gtin": "09506000134353"}, {"exp": "132026"}, {"batch": "B 1"},
+                                    {"sn": "S" * 21}])
+def test_invalid_merged_fields_are_refused_before_sending(fake_printer, client, change):
+    state = fake_printer[0]
+    built = build_label(client, VALUES, "L1", "dynamic", sn_date=False)
+    state.requests.clear()
+    with pytest.raises(ValueError):
+        update_label(client, built["message_id"], change)
+    assert not [r for r in state.requests if r[0] == "put"]
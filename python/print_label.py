@@ -1,74 +1,203 @@
 #!/usr/bin/env python3
+"""
+Label actions for the Electron app.
+
+One-shot:  python print_label.py <create|print|stop|status|catalog> [data]
+           prints one JSON result line.
+Worker:    python print_label.py --worker
+           reads JSON-lines requests {"id": .., "action": .., "data": ..} on stdin
+           and answers each with one JSON line {"id": .., "success": .., ...} on
+           stdout, keeping a warm connection to the printer between requests.
+"""
 import sys
 import json
 import os
-import subprocess
+import time
 
 # Add the create_message directory to sys.path so we can import modules from it
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(script_dir, 'create_message'))
 
+from connection_pool import get_pool
+from create_product_label import LabelBuildError, build_label, default_message_name
+from build_journal import BuildJournal
+from entity_registry import get_registry
+from message_catalog import get_catalog
+from message_retention import enforce, get_history
+from serial_ledger import get_ledger
+
+CONFIG_PATH = os.path.join(script_dir, 'create_message', 'printer_config.json')
+DEFAULT_IP = "172.16.0.55"
+DEFAULT_PORT = 9944
+CATALOG_MAX_AGE = 30  # s; catalog queries sync first when the mirror is older than this
+
+
+def load_printer_config():
+    """Printer address saved by the app (printer_config.json), else the defaults."""
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return config.get("printer_ip") or DEFAULT_IP, int(config.get("printer_port") or DEFAULT_PORT)
+    except (OSError, ValueError):
+        return DEFAULT_IP, DEFAULT_PORT
+
+
+def load_message_cap():
+    """Optional "max_messages" in printer_config.json: keep at most this many messages on the printer."""
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            cap = json.load(f).get("max_messages")
+        return int(cap) if cap else None
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def create_label(label_data):
+    values = {
+        "gtin": label_data.get('gtin', ''),
+        "mfg": label_data.get('mfg', ''),
+        "exp": label_data.get('exp', ''),
+        "batch": label_data.get('batch', label_data.get('rvsp', '')), # Using RVSP as batch if batch is missing
+        "sn": label_data.get('sn', ''),
+        "tmda_reg": label_data.get('tmda_reg', label_data.get('trademark', '')),
+    }
+    values = {k: (v or "").strip() for k, v in values.items()}
+    named = bool(label_data.get('name'))
+    msg_name = label_data.get('name') or default_message_name()
+    barcode_source = label_data.get('barcode_source', 'dynamic')
+
+    ip, port = load_printer_config()
+    try:
+        with get_pool().connection(ip, port) as client:
+            # Every build is journaled, so orphan_gc leaves it alone while it runs. A retry of a
+            # random name could never resume, so a failed unnamed build is rolled back instead.
+            journal = BuildJournal.open((ip, port), msg_name)
+            try:
+                result = build_label(client, values, msg_name, barcode_source, label_data.get('sn_date', True),
+                                     registry=get_registry(),
+                                     counter_start=int(label_data.get('counter_start') or 1),
+                                     ledger=get_ledger(), journal=journal)
+            except LabelBuildError:
+                if not named:
+                    journal.rollback(client)
+                raise
+            get_catalog().record_created((ip, port), result["message_id"], msg_name, values)
+            cap = load_message_cap()
+            if cap:
+                # Keep storage bounded; never evict the label just built
+                try:
+                    result["evicted"] = enforce(client, cap, get_history(), registry=get_registry(),
+                                                keep=(msg_name,), catalog=get_catalog())["evicted"]
+                except RuntimeError as e:
+                    result["retention_error"] = str(e)
+    except LabelBuildError as e:
+        return {"success": False, "error": str(e), "resumable": named}
+    except (ConnectionError, ValueError) as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, **result}
+
+
+def printer_request(fn):
+    """Run fn(client) on a pooled printer connection; wrap the printer's reply."""
+    ip, port = load_printer_config()
+    try:
+        with get_pool().connection(ip, port) as client:
+            r = fn(client)
+    except ConnectionError as e:
+        return {"success": False, "error": str(e)}
+    if not r:
+        return {"success": False, "error": "No response from printer"}
+    if r.get("status") not in (None, "ok"):
+        return {"success": False, "error": r.get("descript") or r.get("status"), "response": r}
+    return {"success": True, "response": r}
+
+
+def catalog_query(query):
+    """Answer from the local message catalog, syncing it first when stale (or when asked to)."""
+    printer = load_printer_config()
+    catalog = get_catalog()
+    sync = query.get("sync")
+    if sync or (sync is None and time.time() - catalog.last_sync(printer) > CATALOG_MAX_AGE):
+        try:
+            with get_pool().connection(*printer) as client:
+                catalog.sync(client, history=get_history())
+        except (ConnectionError, RuntimeError) as e:
+            if sync:
+                return {"success": False, "error": str(e)}
+            # Offline: answer from the last sync
+    kind = query.get("query", "history")
+    if kind == "lookup":
+        return {"success": True, "message_id": catalog.lookup(printer, query.get("name", ""))}
+    if kind == "find":
+        return {"success": True, "messages": catalog.find(printer, query.get("gtin"), query.get("batch"),
+                                                          query.get("sn"), int(query.get("limit") or 100))}
+    if kind == "history":
+        return {"success": True, "messages": catalog.history(printer, int(query.get("limit") or 50))}
+    return {"success": False, "error": f"Unknown catalog query: {kind}"}
+
+
+def handle(action, data):
+    if action == 'create':
+        # Data is a JSON string (or, from the worker, an object) of label info
+        label_data = json.loads(data) if isinstance(data, str) else data
+        return create_label(label_data)
+    if action == 'print':
+        # Data is the message name
+        result = printer_request(lambda client: client.start_print(data))
+        if result["success"]:
+            history = get_history()
+            history.record_print(load_printer_config(), data)
+            history.save()
+            get_catalog().record_print(load_printer_config(), data)
+        return result
+    if action == 'stop':
+        return printer_request(lambda client: client.stop_print())
+    if action == 'status':
+        result = printer_request(lambda client: client.get_print_status())
+        if result["success"]:
+            get_history().observe(load_printer_config(), result["response"])
+            get_history().save()
+        return result
+    if action == 'catalog':
+        # Data: {"query": "lookup" | "find" | "history", "name", "gtin", "batch", "sn", "limit", "sync"}
+        query = json.loads(data) if isinstance(data, str) and data else (data or {})
+        return catalog_query(query)
+    return {"success": False, "error": f"Unknown action: {action}"}
+
+
+def run_worker():
+    """Serve JSON-lines requests until stdin closes. Anything else printed goes to stderr."""
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        req_id = None
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            result = handle(req.get("action"), req.get("data"))
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        out.write(json.dumps({"id": req_id, **result}) + "\n")
+        out.flush()
+
+
 def main():
-    if len(sys.argv) < 3:
+    if len(sys.argv) >= 2 and sys.argv[1] == '--worker':
+        run_worker()
+        return
+
+    if len(sys.argv) < 3 and not (len(sys.argv) == 2 and sys.argv[1] in ('stop', 'status', 'catalog')):
         print(json.dumps({"success": False, "error": "Missing action and data arguments"}))
         return
 
     action = sys.argv[1]
-    data_str = sys.argv[2]
+    data_str = sys.argv[2] if len(sys.argv) > 2 else ''
 
     try:
-        if action == 'create':
-            # Data is a JSON string of label info
-            label_data = json.loads(data_str)
-            
-            # Format arguments for create_product_label.py
-            args = [
-                sys.executable,
-                os.path.join(script_dir, 'create_message', 'create_product_label.py'),
-                f"--gtin", label_data.get('gtin', ''),
-                f"--mfg", label_data.get('mfg', ''),
-                f"--exp", label_data.get('exp', ''),
-                f"--batch", label_data.get('batch', label_data.get('rvsp', '')), # Using RVSP as batch if batch is missing
-                f"--sn", label_data.get('sn', ''),
-                f"--tmda_reg", label_data.get('trademark', '')
-            ]
-            
-            # Run the script and capture output
-            process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate()
-            
-            if process.returncode == 0:
-                # Extract message name from output: [OK] Message 'PharmaLabel_123' created
-                import re
-                match = re.search(r"Message '([^']+)' created", stdout)
-                if match:
-                    message_name = match.group(1)
-                    print(json.dumps({"success": True, "message_name": message_name}))
-                else:
-                    print(json.dumps({"success": True, "output": stdout}))
-            else:
-                print(json.dumps({"success": False, "error": stderr or stdout}))
-                
-        elif action == 'print':
-            # Data is the message name
-            message_name = data_str
-            
-            args = [
-                sys.executable,
-                os.path.join(script_dir, 'create_message', 'run_command.py'),
-                "print", "start", message_name
-            ]
-            
-            process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            stdout, stderr = process.communicate()
-            
-            if process.returncode == 0:
-                print(json.dumps({"success": True, "output": stdout}))
-            else:
-                print(json.dumps({"success": False, "error": stderr or stdout}))
-        else:
-            print(json.dumps({"success": False, "error": f"Unknown action: {action}"}))
-            
+        print(json.dumps(handle(action, data_str)))
     except Exception as e:
         print(json.dumps({"success": False, "error": str(e)}))
 
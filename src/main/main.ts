@@ -11,7 +11,8 @@
 import path from 'path';
 import { app, BrowserWindow, shell, ipcMain } from 'electron';
 import { autoUpdater } from 'electron-updater';
-import { execFile } from 'child_process';
+import { execFile, spawn, ChildProcess } from 'child_process';
+import readline from 'readline';
 import log from 'electron-log';
 import MenuBuilder from './menu';
 import { resolveHtmlPath } from './util';
@@ -96,16 +97,18 @@ ipcMain.handle('run-python', async (_event, scriptName, args) => {
   });
 });
 
-ipcMain.handle('execute-python', async (_event, action, data) => {
-  const pythonDir = app.isPackaged
+const getPythonDir = () =>
+  app.isPackaged
     ? path.join(process.resourcesPath, 'python')
     : path.join(__dirname, '../../python');
 
+const runPrintLabelOnce = async (action: string, data: string) => {
+  const pythonDir = getPythonDir();
   const pythonExecutable = await getPythonExecutable(pythonDir);
   const scriptPath = path.join(pythonDir, 'print_label.py');
   const args = [scriptPath, action, data];
 
-  return new Promise((resolve, reject) => {
+  return new Promise((resolve) => {
     console.log(`Executing: ${pythonExecutable} ${args.join(' ')}`);
 
     const options = { maxBuffer: 1024 * 1024 };
@@ -137,6 +140,101 @@ ipcMain.handle('execute-python', async (_event, action, data) => {
 
     run(pythonExecutable);
   });
+};
+
+/**
+ * Long-lived `print_label.py --worker` process. Requests and results are
+ * JSON lines tagged with an id, so the interpreter start-up and the printer
+ * TCP connect are paid once instead of on every click.
+ */
+const WORKER_TIMEOUT_MS = 30000;
+let printWorker: ChildProcess | null = null;
+let workerRequestId = 0;
+const workerPending = new Map<number, (result: any) => void>();
+
+const failPendingWorkerRequests = (error: string) => {
+  workerPending.forEach((resolve) => resolve({ success: false, error }));
+  workerPending.clear();
+};
+
+const startPrintWorker = async () => {
+  const pythonDir = getPythonDir();
+  const pythonExecutable = await getPythonExecutable(pythonDir);
+  const scriptPath = path.join(pythonDir, 'print_label.py');
+
+  console.log(`Starting print worker: ${pythonExecutable} ${scriptPath} --worker`);
+  const worker = spawn(pythonExecutable, [scriptPath, '--worker'], {
+    stdio: ['pipe', 'pipe', 'pipe'],
+  });
+
+  readline.createInterface({ input: worker.stdout! }).on('line', (line) => {
+    try {
+      const { id, ...result } = JSON.parse(line);
+      const resolve = workerPending.get(id);
+      if (resolve) {
+        workerPending.delete(id);
+        resolve(result);
+      }
+    } catch (parseError) {
+      console.error('Failed to parse print worker output:', line);
+    }
+  });
+  worker.stderr!.on('data', (chunk) => console.warn(`print worker: ${chunk}`));
+
+  const onGone = (reason: string) => {
+    if (printWorker === worker) printWorker = null;
+    failPendingWorkerRequests(reason);
+  };
+  worker.on('error', (error) => onGone(`Print worker error: ${error.message}`));
+  worker.on('exit', (code) => onGone(`Print worker exited (code ${code})`));
+  // Writing to a worker that has died raises EPIPE here, not in the caller
+  worker.stdin!.on('error', (error) => {
+    onGone(`Print worker error: ${error.message}`);
+    worker.kill();
+  });
+
+  printWorker = worker;
+  return worker;
+};
+
+const callPrintWorker = async (action: string, data: string) => {
+  const worker = printWorker || (await startPrintWorker());
+  workerRequestId += 1;
+  const id = workerRequestId;
+
+  return new Promise((resolve) => {
+    const timer = setTimeout(() => {
+      if (workerPending.delete(id)) {
+        resolve({ success: false, error: 'Print worker timed out' });
+      }
+    }, WORKER_TIMEOUT_MS);
+    workerPending.set(id, (result) => {
+      clearTimeout(timer);
+      resolve(result);
+    });
+    worker.stdin!.write(`${JSON.stringify({ id, action, data })}\n`);
+  });
+};
+
+ipcMain.handle('execute-python', async (_event, action, data) => {
+  try {
+    const result: any = await callPrintWorker(action, data);
+    if (result.success === false && /^Print worker error/.test(result.error || '')) {
+      // Worker could not be started: fall back to a one-shot run
+      return runPrintLabelOnce(action, data);
+    }
+    return result;
+  } catch (error: any) {
+    console.error('Print worker failed:', error);
+    return runPrintLabelOnce(action, data);
+  }
+});
+
+app.on('before-quit', () => {
+  if (printWorker) {
+    printWorker.stdin?.end();
+    printWorker = null;
+  }
 });
 
 ipcMain.handle('get-printer-config', async () => {
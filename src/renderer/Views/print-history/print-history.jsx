@@ -1,39 +1,51 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import './print-history.css';
 
 const PrintHistory = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('All Status');
   const [dateFilter, setDateFilter] = useState('');
+  const [records, setRecords] = useState([]);
+
+  // Messages from the print worker's local catalog (synced with the printer when stale)
+  useEffect(() => {
+    if (!window.electron || !window.electron.executePython) return;
+    window.electron.executePython('catalog', JSON.stringify({ query: 'history', limit: 50 }))
+      .then((result) => {
+        if (!result || !result.success) return;
+        setRecords(result.messages.map((m) => {
+          const used = Math.max(m.last_print || 0, m.modified_time || 0, m.created_time || 0);
+          return {
+            id: m.id,
+            timestamp: used ? new Date(used * 1000).toLocaleString('en-GB') : '-',
+            productName: m.name,
+            gtin: m.gtin || '-',
+            qrCodeId: m.sn || '-',
+            trademark: '-',
+            copies: '-',
+            status: m.last_print ? 'Printed' : 'Pending',
+            printedBy: '-',
+          };
+        }));
+      })
+      .catch((err) => console.error('Catalog query failed:', err));
+  }, []);
 
   const stats = [
-    { label: 'Total Prints', value: 10, type: 'total', icon: (
+    { label: 'Total Labels', value: records.length, type: 'total', icon: (
       <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"><polyline points="6 9 6 2 18 2 18 9"></polyline><path d="M6 18H4a2 2 0 0 1-2-2v-5a2 2 0 0 1 2-2h16a2 2 0 0 1 2 2v5a2 2 0 0 1-2 2h-2"></path><rect x="6" y="14" width="12" height="8"></rect></svg>
     )},
-    { label: 'Successful', value: 7, type: 'success', icon: (
+    { label: 'Successful', value: records.filter((r) => r.status === 'Printed').length, type: 'success', icon: (
       <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"><path d="M22 11.08V12a10 10 0 1 1-5.93-9.14"></path><polyline points="22 4 12 14.01 9 11.01"></polyline></svg>
     )},
-    { label: 'Failed', value: 2, type: 'failed', icon: (
+    { label: 'Failed', value: records.filter((r) => r.status === 'Failed').length, type: 'failed', icon: (
       <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"><circle cx="12" cy="12" r="10"></circle><line x1="15" y1="9" x2="9" y2="15"></line><line x1="9" y1="9" x2="15" y2="15"></line></svg>
     )},
-    { label: 'Pending', value: 1, type: 'pending', icon: (
+    { label: 'Pending', value: records.filter((r) => r.status === 'Pending').length, type: 'pending', icon: (
       <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"><circle cx="12" cy="12" r="10"></circle><polyline points="12 6 12 12 16 14"></polyline></svg>
     )}
   ];
 
-  const mockRecords = [
-    { id: 'PRT-001547', timestamp: '12/02/2026, 14:32:15', productName: 'Industrial Component A-4521', gtin: '00012345678905', qrCodeId: 'BC-678905-LK3M5N', trademark: 'TechPro Industries', copies: 1, status: 'Printed', printedBy: 'Admin' },
-    { id: 'PRT-001546', timestamp: '12/02/2026, 14:28:42', productName: 'Industrial Component B-8832', gtin: '00012345678912', qrCodeId: 'BC-678912-MN4P6Q', trademark: 'TechPro Industries', copies: 2, status: 'Printed', printedBy: 'Admin' },
-    { id: 'PRT-001545', timestamp: '12/02/2026, 14:25:18', productName: 'Industrial Component C-1156', gtin: '00012345678929', qrCodeId: 'BC-678929-0P5R7S', trademark: 'ManuFact Corp', copies: 1, status: 'Failed', printedBy: 'Admin' },
-    { id: 'PRT-001544', timestamp: '12/02/2026, 14:20:55', productName: 'Industrial Component A-4522', gtin: '00012345678936', qrCodeId: 'BC-678936-PQ6S8T', trademark: 'TechPro Industries', copies: 1, status: 'Printed', printedBy: 'Admin' },
-    { id: 'PRT-001543', timestamp: '12/02/2026, 14:15:11', productName: 'Industrial Component D-9943', gtin: '00012345678943', qrCodeId: 'BC-678943-QR7T9U', trademark: 'GlobalTech Ltd', copies: 3, status: 'Printed', printedBy: 'Admin' },
-    { id: 'PRT-001542', timestamp: '12/02/2026, 14:10:33', productName: 'Industrial Component E-2247', gtin: '00012345678950', qrCodeId: 'BC-678950-RS8U0V', trademark: 'TechPro Industries', copies: 1, status: 'Pending', printedBy: 'Admin' },
-    { id: 'PRT-001541', timestamp: '12/02/2026, 14:05:22', productName: 'Industrial Component F-3358', gtin: '00012345678967', qrCodeId: 'BC-678967-ST9V1W', trademark: 'ManuFact Corp', copies: 1, status: 'Printed', printedBy: 'Admin' },
-    { id: 'PRT-001540', timestamp: '12/02/2026, 14:00:45', productName: 'Industrial Component G-4469', gtin: '00012345678974', qrCodeId: 'BC-678974-TU0W2X', trademark: 'GlobalTech Ltd', copies: 2, status: 'Printed', printedBy: 'Admin' },
-    { id: 'PRT-001539', timestamp: '12/02/2026, 13:55:18', productName: 'Industrial Component H-5570', gtin: '00012345678981', qrCodeId: 'BC-678981-UV1X3Y', trademark: 'TechPro Industries', copies: 1, status: 'Failed', printedBy: 'Admin' },
-    { id: 'PRT-001538', timestamp: '12/02/2026, 13:50:07', productName: 'Industrial Component I-6681', gtin: '00012345678998', qrCodeId: 'BC-678998-VW2Y4Z', trademark: 'ManuFact Corp', copies: 1, status: 'Printed', printedBy: 'Admin' },
-  ];
-
   return (
     <div className="print-history-container">
       <header className="print-history-header">
@@ -115,7 +127,7 @@ const PrintHistory = () => {
               </tr>
             </thead>
             <tbody>
-              {mockRecords.map((record, index) => (
+              {records.map((record, index) => (
                 <tr key={index}>
                   <td>{record.id}</td>
                   <td>{record.timestamp}</td>
@@ -149,7 +161,7 @@ const PrintHistory = () => {
 
         <div className="pagination-container">
           <div className="pagination-info">
-            Showing 1 to 10 of 10 records
+            Showing {records.length ? 1 : 0} to {records.length} of {records.length} records
           </div>
           <div className="pagination-controls">
             <button className="page-btn" disabled>Previous</button>
@@ -112,44 +112,31 @@ export default function PrintingModule() {
 
             const mfg = formatDateToMMYYYY(formData.mfgDate);
             const exp = formatDateToMMYYYY(formData.expDate);
-            
-            const uniqueName = `PharmaLabel_${Date.now().toString().slice(-4)}`;
-            
-            const args = [
-                uniqueName,
-                '--gtin', formData.gtin,
-                '--mfg', mfg,
-                '--exp', exp,
-                '--batch', formData.batch,
-                '--sn', formData.serialNumber
-            ];
-
-            if (formData.tmdaReg) {
-                args.push('--tmda_reg', formData.tmdaReg);
-            }
 
-            // Call Python script via Electron IPC
-            const output = await window.electron.runPython('create_message/create_product_label.py', args);
-                
-            console.log('Python Output:', output);
+            // No name: the worker names the message (default_message_name, millisecond timestamp)
+            const labelData = {
+                gtin: formData.gtin,
+                mfg,
+                exp,
+                batch: formData.batch,
+                sn: formData.serialNumber,
+                tmda_reg: formData.tmdaReg || '',
+            };
 
-            // Parse message name from output: [OK] Message 'PharmaLabel_727' created (id=133)
-            const match = output.match(/Message '([^']+)' created/);
-                
-            if (match && match[1]) {
-                setCurrentMessageName(match[1]);
-                setIsGenerated(true);
-                toast.dismiss();
-                toast.success(`QR Code Generated: ${match[1]}`);
-            } else if (output.includes('[OK]')) {
-                // Fallback if regex fails but OK is present
+            // Build the label in the persistent Python print worker via Electron IPC
+            const result = await window.electron.executePython('create', JSON.stringify(labelData));
+
+            console.log('Python Result:', result);
+
+            if (result && result.success) {
+                setCurrentMessageName(result.message_name);
                 setIsGenerated(true);
                 toast.dismiss();
-                toast.success("Message created (check logs for name)");
+                toast.success(`QR Code Generated: ${result.message_name}`);
             } else {
                 toast.dismiss();
-                toast.error(`Failed to create label: ${output}`);
-                }
+                toast.error(`Failed to create label: ${result ? result.error : 'No response'}`);
+            }
         } catch (error) {
             toast.dismiss();
             toast.error(`Error: ${error.message}`);
@@ -179,29 +166,17 @@ export default function PrintingModule() {
         const loadingToast = toast.loading("Starting print job...");
         
         try {
-            // Command: run_command.py print start PharmaLabel_727
-            const args = ['print', 'start', currentMessageName];
-
-            if (window.electron && window.electron.runPython) {
-                const output = await window.electron.runPython('create_message/run_command.py', args);
-                console.log('Print Output:', output);
-                
-                try {
-                    const response = JSON.parse(output);
-                    if (response.status === 'ok') {
-                        toast.success("Print job started successfully!", { id: loadingToast });
-                    } else if (response.descript === "print engine is running") {
-                        toast.error("Print engine is already running", { id: loadingToast });
-                    } else {
-                        toast.error(`Print failed: ${response.descript || 'Unknown error'}`, { id: loadingToast });
-                    }
-                } catch (e) {
-                    // If not JSON, check for keywords
-                    if (output.toLowerCase().includes('ok') || output.toLowerCase().includes('success')) {
-                        toast.success("Print initiated", { id: loadingToast });
-                    } else {
-                        toast.error(`Print failed: ${output.slice(0, 100)}`, { id: loadingToast });
-                    }
+            if (window.electron && window.electron.executePython) {
+                const result = await window.electron.executePython('print', currentMessageName);
+                console.log('Print Result:', result);
+
+                const response = result.response || {};
+                if (result.success) {
+                    toast.success("Print job started successfully!", { id: loadingToast });
+                } else if (response.descript === "print engine is running") {
+                    toast.error("Print engine is already running", { id: loadingToast });
+                } else {
+                    toast.error(`Print failed: ${result.error || 'Unknown error'}`, { id: loadingToast });
                 }
             } else {
                 toast.success("Print initiated (Dev Mode)", { id: loadingToast });
@@ -216,21 +191,14 @@ export default function PrintingModule() {
         const loadingToast = toast.loading("Stopping print job...");
         
         try {
-            const args = ['print', 'stop'];
-
-            if (window.electron && window.electron.runPython) {
-                const output = await window.electron.runPython('create_message/run_command.py', args);
-                console.log('Stop Output:', output);
-                
-                try {
-                    const response = JSON.parse(output);
-                    if (response.status === 'ok') {
-                        toast.success("Print job stopped", { id: loadingToast });
-                    } else {
-                        toast.error(`Stop failed: ${response.descript || 'Unknown error'}`, { id: loadingToast });
-                    }
-                } catch (e) {
-                    toast.success("Stop command sent", { id: loadingToast });
+            if (window.electron && window.electron.executePython) {
+                const result = await window.electron.executePython('stop', '');
+                console.log('Stop Result:', result);
+
+                if (result.success) {
+                    toast.success("Print job stopped", { id: loadingToast });
+                } else {
+                    toast.error(`Stop failed: ${result.error || 'Unknown error'}`, { id: loadingToast });
                 }
             } else {
                 toast.success("Print stopped (Dev Mode)", { id: loadingToast });